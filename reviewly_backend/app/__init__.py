@@ -9,6 +9,7 @@ import os
 from flask_jwt_extended import JWTManager
 from flask import jsonify
 from flask_jwt_extended.exceptions import NoAuthorizationError
+from app.utils.model_loader import ModelNotReadyError, start_model_warmup
 
 
 db = SQLAlchemy()
@@ -84,6 +85,13 @@ def create_app():
     def handle_no_authorization_error(e):
         return jsonify({"message": "Missing Authorization Header"}), 401
 
+    @app.errorhandler(ModelNotReadyError)
+    def handle_model_not_ready_error(e):
+        return jsonify({"message": str(e)}), 503
+
+    if Config.MODEL_WARMUP:
+        start_model_warmup()
+
 
     from app.routes import product_routes, review_routes, chat_routes, health_routes, auth_routes, user_queries, user_routes, heatmap_routes
     api.add_namespace(product_routes.api, path=f"{API_PREFIX}/products")
@@ -9,3 +9,118 @@ class Config:
 
     PROPAGATE_EXCEPTIONS= True
 
+    EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "blevlabs/stella_en_v5")
+
+    # Carga del modelo en segundo plano al arrancar y espera máxima de los endpoints que lo usan
+    MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+    MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", 30))
+    # Espera antes de reintentar una carga fallida del modelo (se duplica en cada fallo, hasta el máximo)
+    MODEL_RETRY_BACKOFF = float(os.getenv("MODEL_RETRY_BACKOFF", 5))
+    MODEL_RETRY_BACKOFF_MAX = float(os.getenv("MODEL_RETRY_BACKOFF_MAX", 300))
+
+    # Backend de inferencia en CPU: "torch", "onnx" (requiere optimum[onnxruntime]) o "int8"
+    # (cuantización dinámica). Los alternativos se validan contra el modelo de referencia al cargar.
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+    EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", 0))
+    EMBEDDING_AGREEMENT_CHECK = os.getenv("EMBEDDING_AGREEMENT_CHECK", "true").lower() == "true"
+    EMBEDDING_MIN_AGREEMENT = float(os.getenv("EMBEDDING_MIN_AGREEMENT", 0.98))
+
+    # Número máximo de textos por pasada del modelo de embeddings
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+
+    # Micro-batching de peticiones de embedding entre hilos
+    EMBEDDING_BATCHER_ENABLED = os.getenv("EMBEDDING_BATCHER_ENABLED", "true").lower() == "true"
+    EMBEDDING_BATCHER_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCHER_MAX_BATCH_SIZE", 32))
+    EMBEDDING_BATCHER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCHER_MAX_WAIT_MS", 5))
+    EMBEDDING_BATCHER_WORKERS = int(os.getenv("EMBEDDING_BATCHER_WORKERS", 1))
+    EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", 60))
+
+    # Pool de procesos para la ingesta masiva (0 lo desactiva). Solo se usa cuando
+    # una llamada tiene al menos EMBEDDING_POOL_MIN_TEXTS textos sin embedding.
+    EMBEDDING_POOL_WORKERS = int(os.getenv("EMBEDDING_POOL_WORKERS", 0))
+    EMBEDDING_POOL_THREADS_PER_WORKER = int(os.getenv("EMBEDDING_POOL_THREADS_PER_WORKER", 1))
+    EMBEDDING_POOL_MIN_TEXTS = int(os.getenv("EMBEDDING_POOL_MIN_TEXTS", 64))
+
+    # Caché de embeddings de consultas (búsqueda de productos y reseñas)
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+    QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 3600))
+
+    # Almacén persistente de embeddings para la ingesta (SQLite)
+    EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+    EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "app/data/embedding_store.sqlite3")
+
+    # Búsqueda de reseñas por similitud: "exact" (coseno sobre el vector completo),
+    # "binary" (candidatos por distancia de Hamming y reordenación exacta) o
+    # "reduced" (columna de dimensión reducida con índice HNSW)
+    REVIEW_SEARCH_MODE = os.getenv("REVIEW_SEARCH_MODE", "exact")
+    REVIEW_BINARY_RERANK_FACTOR = int(os.getenv("REVIEW_BINARY_RERANK_FACTOR", 10))
+    REVIEW_REDUCED_DIM = int(os.getenv("REVIEW_REDUCED_DIM", 1024))
+    REVIEW_HNSW_EF_SEARCH = int(os.getenv("REVIEW_HNSW_EF_SEARCH", 40))
+    # Escaneo iterativo de HNSW ("relaxed_order" o "strict_order"; vacío lo desactiva).
+    # Solo se aplica con pgvector >= 0.8, que se comprueba en tiempo de ejecución.
+    REVIEW_HNSW_ITERATIVE_SCAN = os.getenv("REVIEW_HNSW_ITERATIVE_SCAN", "")
+    # Máximo de reseñas por petición en POST /reviews/bulk
+    REVIEW_BULK_MAX_ITEMS = int(os.getenv("REVIEW_BULK_MAX_ITEMS", 5000))
+    # Resúmenes extractivos de reseñas (python -m app.scripts.summarize_reviews)
+    REVIEW_SUMMARY_MAX_SENTENCES = int(os.getenv("REVIEW_SUMMARY_MAX_SENTENCES", 5))
+    REVIEW_SUMMARY_MAX_CHARS = int(os.getenv("REVIEW_SUMMARY_MAX_CHARS", 1000))
+    REVIEW_SUMMARY_MIN_REVIEWS = int(os.getenv("REVIEW_SUMMARY_MIN_REVIEWS", 3))
+
+    # Modo de ranking por defecto de searchProduct: "trigram", "semantic" (HNSW sobre features y detalles)
+    # "hybrid" (texto completo + HNSW sobre product_embedding, fusionados con RRF) o "inprocess"
+    # (índice vectorial mapeado en memoria, ver VECTOR_INDEX_DIR)
+    SEARCH_MODE = os.getenv("SEARCH_MODE", "trigram")
+    SEARCH_HNSW_EF_SEARCH = int(os.getenv("SEARCH_HNSW_EF_SEARCH", 100))
+    SEARCH_ANN_CANDIDATES = int(os.getenv("SEARCH_ANN_CANDIDATES", 100))
+    # Búsquedas HNSW con filtros de categoría o precio: escaneo iterativo ("relaxed_order",
+    # pgvector >= 0.8; vacío lo desactiva) o, si no se usa, ef_search ampliado por este factor
+    SEARCH_HNSW_ITERATIVE_SCAN = os.getenv("SEARCH_HNSW_ITERATIVE_SCAN", "")
+    SEARCH_ANN_FILTER_FACTOR = int(os.getenv("SEARCH_ANN_FILTER_FACTOR", 10))
+    # Parámetros de construcción de los índices HNSW (ver app/scripts/manage_vector_indexes.py)
+    HNSW_M = int(os.getenv("HNSW_M", 16))
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 64))
+
+    # Umbral de word_similarity (pg_trgm) para los candidatos de searchProduct
+    SEARCH_TRGM_THRESHOLD = float(os.getenv("SEARCH_TRGM_THRESHOLD", 0.3))
+    # Búsqueda híbrida (texto completo + ANN) fusionada con reciprocal rank fusion
+    SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", 60))
+    SEARCH_HYBRID_CANDIDATES = int(os.getenv("SEARCH_HYBRID_CANDIDATES", 50))
+
+    # Índice vectorial en proceso (modo de búsqueda "inprocess"): matriz de embeddings
+    # mapeada en memoria en VECTOR_INDEX_DIR (ver app/scripts/manage_memory_index.py).
+    # Con VECTOR_INDEX_SYNC, las altas, cambios y bajas de productos se añaden al índice.
+    VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "app/data/vector_index")
+    VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+    VECTOR_INDEX_SYNC = os.getenv("VECTOR_INDEX_SYNC", "false").lower() == "true"
+    VECTOR_INDEX_LOCK_TIMEOUT = float(os.getenv("VECTOR_INDEX_LOCK_TIMEOUT", 2))
+    # Proporción de filas obsoletas a partir de la cual `compact` reconstruye el índice
+    VECTOR_INDEX_MAX_STALE_RATIO = float(os.getenv("VECTOR_INDEX_MAX_STALE_RATIO", 0.2))
+
+    # Caché de resultados de búsqueda: "memory" (por proceso), "sqlite" (compartida entre
+    # procesos en un fichero local) o "none". Con "memory" y varios trabajadores, las
+    # invalidaciones solo llegan al trabajador que hizo la escritura: los demás pueden
+    # servir resultados obsoletos hasta SEARCH_CACHE_TTL segundos
+    SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 60))
+    SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "app/data/search_cache.sqlite3")
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+    # Paginación por cursor de searchProduct: número de candidatos que se guardan en
+    # la instantánea de cada búsqueda y su caducidad. Backend "memory" o "sqlite"
+    # (compartido entre procesos).
+    SEARCH_CURSOR_CANDIDATES = int(os.getenv("SEARCH_CURSOR_CANDIDATES", 50))
+    SEARCH_CURSOR_TTL = int(os.getenv("SEARCH_CURSOR_TTL", 600))
+    SEARCH_CURSOR_BACKEND = os.getenv("SEARCH_CURSOR_BACKEND", "memory")
+    SEARCH_CURSOR_PATH = os.getenv("SEARCH_CURSOR_PATH", "app/data/search_snapshots.sqlite3")
+    SEARCH_CURSOR_MAX_SNAPSHOTS = int(os.getenv("SEARCH_CURSOR_MAX_SNAPSHOTS", 10000))
+
+    # Búsquedas recientes sobre las que se calculan las métricas de tiempos por etapa
+    SEARCH_METRICS_WINDOW = int(os.getenv("SEARCH_METRICS_WINDOW", 1000))
+
+    # Facetas de búsqueda y listado: límites de los tramos de precio y número máximo
+    # de valores por faceta
+    FACET_PRICE_BOUNDS = [
+        float(bound) for bound in os.getenv("FACET_PRICE_BOUNDS", "25,50,100,200,500").split(",") if bound.strip()
+    ]
+    FACET_LIMIT = int(os.getenv("FACET_LIMIT", 20))
@@ -1,10 +1,38 @@
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
+import re
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import UserDefinedType
 from app.models.productdetail import ProductDetail
 from app.models.review import Review
 
 from app import db
+from app.config import Config
+
+
+# Documento de texto completo de `search_text`. El índice GIN es de expresión, así
+# que las consultas deben usar exactamente esta misma expresión para aprovecharlo.
+SEARCH_TSVECTOR = "to_tsvector('english', COALESCE(search_text, ''))"
+
+# Condición SQL de una reseña ya incluida en las valoraciones importadas del producto:
+# el agregado de Amazon (`rating_baseline_*`) y las reseñas que publica scripts/consumer.py
+# salen del mismo conjunto de datos, así que las reseñas escritas antes de importar un
+# producto con valoraciones importadas no se vuelven a sumar. Las posteriores, o las de
+# productos sin base importada, sí. Parámetros: alias de `products` y expresión de la
+# fecha de la reseña.
+RATING_BASELINE_COVERS = (
+    "({product}.rating_baseline_number > 0 AND COALESCE({reviewed_at} <= {product}.created_at, false))"
+)
+
+
+class Vector(UserDefinedType):
+    """
+    Tipo personalizado para manejar vectores en PostgreSQL usando PGVector.
+    """
+    def get_col_spec(self):
+        return "vector(1024)"
+
+
 class Product(db.Model):
     __tablename__ = 'products'
 
@@ -13,10 +41,21 @@ class Product(db.Model):
     main_category = db.Column(db.String(255), nullable=False)
     average_rating = db.Column(db.Float, nullable=True, default=0.0)
     rating_number = db.Column(db.Integer, nullable=False, default=0)
+    # Número de reseñas del producto en `reviews`, mantenido por review_service
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Valoraciones importadas con el producto (p. ej. el agregado de Amazon); incluyen las
+    # reseñas de `reviews` anteriores a la importación (ver RATING_BASELINE_COVERS)
+    rating_baseline_number = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_baseline_sum = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    # Suma de las valoraciones (importadas + reseñas no incluidas en ellas); review_service
+    # la mantiene junto a rating_number y average_rating
+    rating_sum = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
     features = db.Column(JSONB, nullable=True)
     description = db.Column(JSONB, nullable=True)
     price = db.Column(db.Float, nullable=True, default=0.0)
-    resume_review = db.Column(db.String(255), nullable=True)
+    resume_review = db.Column(db.Text, nullable=True)
+    # Huella de las reseñas con las que se generó resume_review (ver scripts/summarize_reviews)
+    resume_review_signature = db.Column(db.String(32), nullable=True)
     images = db.Column(JSONB, nullable=True)
     videos = db.Column(JSONB, nullable=True)
     store = db.Column(db.String(255), nullable=True)
@@ -27,6 +66,9 @@ class Product(db.Model):
     bought_together = db.Column(JSONB, nullable=True)
     amazon_link = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    search_text = db.Column(db.Text, nullable=True)
+    # Centroide normalizado de los embeddings del título, detalles y features
+    product_embedding = db.Column(Vector, nullable=True)
 
 
 
@@ -40,6 +82,21 @@ class Product(db.Model):
         db.CheckConstraint('average_rating >= 0 AND average_rating <= 5', name='check_average_rating'),
         db.CheckConstraint('rating_number >= 0', name='check_rating_number'),
         db.CheckConstraint('price >= 0', name='check_price'),
+        db.Index(
+            'ix_products_search_text_trgm', 'search_text',
+            postgresql_using='gin',
+            postgresql_ops={'search_text': 'gin_trgm_ops'}
+        ),
+        db.Index(
+            'ix_products_search_tsv', db.text(SEARCH_TSVECTOR),
+            postgresql_using='gin'
+        ),
+        db.Index(
+            'ix_products_product_embedding_hnsw', 'product_embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': Config.HNSW_M, 'ef_construction': Config.HNSW_EF_CONSTRUCTION},
+            postgresql_ops={'product_embedding': 'vector_cosine_ops'}
+        ),
     )
 
 
@@ -48,5 +105,53 @@ class Product(db.Model):
         if asin_to_use:
             self.amazon_link = f"https://www.amazon.com/dp/{asin_to_use}"
             
+    def embedding_texts(self):
+        """
+        Textos del producto que se codifican: título, detalles ("clave: valor") y features.
+
+        Returns:
+            tuple: (detail_texts, feature_texts)
+        """
+        detail_texts = [f"{key}: {value}" for key, value in self.details.items()] if self.details else []
+        feature_texts = list(self.features) if self.features else []
+        return detail_texts, feature_texts
+
+    def set_rating_baseline(self, average_rating, rating_number):
+        """
+        Fija las valoraciones importadas del producto (alta o edición) y recalcula los
+        agregados visibles como importadas + reseñas ya contabilizadas. Si la base pasa
+        de 0 a tener valoraciones cambia qué reseñas cubre (RATING_BASELINE_COVERS);
+        `recompute_product_ratings` concilia esos productos.
+        """
+        review_number = (self.rating_number or 0) - (self.rating_baseline_number or 0)
+        review_sum = (self.rating_sum or 0.0) - (self.rating_baseline_sum or 0.0)
+        self.rating_baseline_number = rating_number or 0
+        self.rating_baseline_sum = (average_rating or 0.0) * self.rating_baseline_number
+        self.rating_number = self.rating_baseline_number + review_number
+        self.rating_sum = self.rating_baseline_sum + review_sum
+        self.average_rating = self.rating_sum / self.rating_number if self.rating_number else 0.0
+
+    def refresh_search_text(self):
+        """
+        Recalcula el documento de búsqueda: título, descripción aplanada y tienda normalizados.
+        """
+        parts = [self.title, *_flatten_text(self.description), self.store]
+        self.search_text = _normalize_text(" ".join(p for p in parts if p))
+
     def __repr__(self):
         return f"<Product {self.title}>"
+
+
+def _flatten_text(value):
+    """Devuelve los textos contenidos en un valor JSONB (cadena, lista o diccionario)."""
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [text for v in value.values() for text in _flatten_text(v)]
+    if isinstance(value, (list, tuple)):
+        return [text for v in value for text in _flatten_text(v)]
+    return [str(value)]
+
+
+def _normalize_text(text):
+    return re.sub(r"\s+", " ", text).strip().lower()
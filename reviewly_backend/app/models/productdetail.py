@@ -1,4 +1,5 @@
 from app import db
+from app.config import Config
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import UserDefinedType
 
@@ -21,5 +22,14 @@ class ProductDetail(db.Model):
 
     product = relationship("Product", back_populates="details_list")
 
+    __table_args__ = (
+        db.Index(
+            'ix_product_details_detail_embedding_hnsw', 'detail_embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': Config.HNSW_M, 'ef_construction': Config.HNSW_EF_CONSTRUCTION},
+            postgresql_ops={'detail_embedding': 'vector_cosine_ops'}
+        ),
+    )
+
     def __repr__(self):
         return f"<ProductDetail {self.detail}>"
@@ -1,4 +1,5 @@
 from app import db
+from app.config import Config
 from sqlalchemy.types import UserDefinedType
 
 class Vector(UserDefinedType):
@@ -20,5 +21,14 @@ class ProductFeature(db.Model):
     # Relación con Product
     product = db.relationship("Product", back_populates="features_list")
 
+    __table_args__ = (
+        db.Index(
+            'ix_product_features_embedding_hnsw', 'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': Config.HNSW_M, 'ef_construction': Config.HNSW_EF_CONSTRUCTION},
+            postgresql_ops={'embedding': 'vector_cosine_ops'}
+        ),
+    )
+
     def __repr__(self):
         return f"<ProductFeature {self.feature[:30]}...>"
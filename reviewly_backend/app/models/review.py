@@ -1,9 +1,10 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, Numeric, Boolean, ForeignKey, JSON, TIMESTAMP, func
+    Column, Integer, String, Text, Numeric, Boolean, ForeignKey, JSON, TIMESTAMP, func, literal_column
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import UserDefinedType
 from app import db
+from app.config import Config
 
 class Vector(UserDefinedType):
     """
@@ -12,6 +13,20 @@ class Vector(UserDefinedType):
     def get_col_spec(self):
         return "vector(8192)"
 
+class BitVector(UserDefinedType):
+    """
+    Tipo personalizado para la versión binarizada (un bit por dimensión) del embedding.
+    """
+    def get_col_spec(self):
+        return "bit(8192)"
+
+class ReducedVector(UserDefinedType):
+    """
+    Tipo personalizado para el embedding de dimensión reducida, indexable con HNSW.
+    """
+    def get_col_spec(self):
+        return f"vector({Config.REVIEW_REDUCED_DIM})"
+
 class Review(db.Model):
     __tablename__ = 'reviews'
 
@@ -30,9 +45,19 @@ class Review(db.Model):
     asin = Column(String(255))  
     parent_asin = Column(String(255)) 
     embedding = Column(Vector, nullable=True)  
+    embedding_bits = Column(BitVector, nullable=True)
+    embedding_reduced = Column(ReducedVector, nullable=True)
 
     product = relationship("Product", back_populates="reviews", lazy=True)
 
+    __table_args__ = (
+        db.Index(
+            'ix_reviews_embedding_reduced_hnsw', 'embedding_reduced',
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding_reduced': 'vector_cosine_ops'}
+        ),
+    )
+
     def __repr__(self):
         return f"<Review(review_id={self.review_id}, product_id={self.product_id}, rating={self.rating})>"
 
@@ -56,3 +81,21 @@ class Review(db.Model):
             "asin": self.asin,  
             "parent_asin": self.parent_asin,  
         }
+
+
+# Claves de ordenación de las reseñas de un producto para la paginación por cursor.
+# Se ordena por (clave DESC, review_id DESC); COALESCE evita que los NULL rompan
+# la comparación de filas del cursor.
+REVIEW_SORT_KEYS = {
+    "recent": func.coalesce(Review.timestamp, literal_column("'epoch'::timestamp")),
+    "helpful": func.coalesce(Review.helpful_vote, literal_column("0")),
+}
+
+db.Index(
+    'ix_reviews_product_recent',
+    Review.product_id, REVIEW_SORT_KEYS["recent"].desc(), Review.review_id.desc()
+)
+db.Index(
+    'ix_reviews_product_helpful',
+    Review.product_id, REVIEW_SORT_KEYS["helpful"].desc(), Review.review_id.desc()
+)
@@ -2,6 +2,14 @@ from flask_restx import Namespace, Resource
 from sqlalchemy import text
 from app import db
 import os
+from app.utils.embedding_batcher import get_batcher
+from app.utils.query_cache import query_embedding_cache
+from app.utils.model_loader import get_model_status
+from app.utils.search_cache import get_search_cache
+from app.utils.vector_index import get_vector_index
+from app.utils.search_cursor import get_cursor_store
+from app.utils.search_profiler import search_stage_metrics
+from app.utils.jwt_utils import admin_required
 
 api = Namespace('health', description='Health check operations')
 
@@ -12,7 +20,8 @@ class HealthCheck(Resource):
             "database": False,
             "env_vars": True,
             "missing_vars": [],
-            "database_error": None
+            "database_error": None,
+            "model": get_model_status()
         }
 
         required_env_vars = ['DATABASE_URL']
@@ -30,3 +39,18 @@ class HealthCheck(Resource):
 
         status_code = 200 if health_status["database"] and health_status["env_vars"] else 500
         return health_status, status_code
+
+
+@api.route('/metrics')
+class Metrics(Resource):
+    @admin_required()
+    def get(self):
+        """Métricas internas del servicio de embeddings (solo administradores)"""
+        return {
+            "embedding_batcher": get_batcher().metrics(),
+            "query_embedding_cache": query_embedding_cache.metrics(),
+            "search_cache": get_search_cache().metrics() if get_search_cache() else None,
+            "vector_index": get_vector_index().metrics(),
+            "search_cursors": get_cursor_store().metrics(),
+            "search_stages": search_stage_metrics.metrics()
+        }, 200
@@ -5,7 +5,8 @@ from app.models.product import Product
 from app.services.product_service import (
     get_all_products, get_product_by_id, create_product, update_product, 
     delete_product, get_all_categories, searchProduct, autocomplete_products, 
-    get_product_count, get_product_favorite_count, get_most_favorited_products
+    get_product_count, get_product_favorite_count, get_most_favorited_products,
+    explain_search, SEARCH_MODES
 )
 from app.services.review_service import get_reviews_by_product
 from datetime import datetime
@@ -61,6 +62,7 @@ class ProductList(Resource):
         min_rating = request.args.get('min_rating', type=float)
         min_favorites = request.args.get('min_favorites', type=int)
         include_favorites = request.args.get('include_favorites', 'false').lower() == 'true'
+        facets = request.args.get('facets', 'false').lower() == 'true'
 
         try:
             response = get_all_products(
@@ -71,7 +73,8 @@ class ProductList(Resource):
                 store=store,
                 page=page,
                 limit=limit,
-                include_favorites=include_favorites
+                include_favorites=include_favorites,
+                facets=facets
             )
             return response, 200
         except Exception as e:
@@ -125,26 +128,97 @@ product_search_model = api.model('ProductSearch', {
     'top_n': fields.Integer(required=False, description='Number of top products to return', example=5, default=5),
     'category': fields.String(description='Main category of the product (e.g., electronics, clothing, books). Optional.'),
     'min_price': fields.Float(description='Minimum price filter for the search results. Optional.'),
-    'max_price': fields.Float(description='Maximum price filter for the search results. Optional.')
+    'max_price': fields.Float(description='Maximum price filter for the search results. Optional.'),
+    'mode': fields.String(description='Ranking mode: "trigram" (default), "semantic", "hybrid" or "inprocess". Optional.', enum=['trigram', 'semantic', 'hybrid', 'inprocess']),
+    'fusion': fields.Nested(api.model('SearchFusion', {
+        'k': fields.Integer(description='RRF constant k (score = weight / (k + rank))', example=60),
+        'fulltext_weight': fields.Float(description='Weight of the full-text ranking', example=1.0),
+        'vector_weight': fields.Float(description='Weight of the vector ranking', example=1.0),
+        'fulltext_candidates': fields.Integer(description='Top-k retrieved by the full-text search', example=50),
+        'vector_candidates': fields.Integer(description='Top-k retrieved by the vector search', example=50)
+    }), description='Reciprocal rank fusion parameters for the "hybrid" mode. Optional.'),
+    'paginate': fields.Boolean(description='Keep a snapshot of the ranked candidates and return next_cursor for the following pages. Optional.', default=False),
+    'cursor': fields.String(description='next_cursor returned by a previous search. Serves the next page of that search; query and filters are ignored. Optional.'),
+    'facets': fields.Boolean(description='Include facet counts (main_category, store, price buckets) over all filtered candidates of the search mode, not only the returned page. Optional.', default=False),
+    'explain': fields.Boolean(description='Include the rank of each result in each search of the "hybrid" mode. Optional.', default=False)
 })
 
+# Las claves de `scores` dependen del modo de ranking
+product_search_response_model = api.model('ProductSearchResponse', {
+    'query': fields.String(description='Search query'),
+    'top_products': fields.List(fields.Raw, description=(
+        'Products ordered by scores.total_score. The keys of "scores" depend on the mode: '
+        '"trigram": title_score, product_score (similarity with the precomputed product embedding, '
+        'which replaces the former detail_score and feature_score) and total_score = '
+        'title_score * 0.7 + product_score * 100 * 0.3; '
+        '"semantic" and "inprocess": product_score, detail_score, feature_score and total_score; '
+        '"hybrid": fulltext_score, vector_score and total_score.'
+    )),
+    'next_cursor': fields.String(description='Cursor of the next page (paginated searches only), or null'),
+    'facets': fields.Raw(description='Facet counts, when requested')
+})
+
+def _search_arguments(data):
+    """Valida el cuerpo de una búsqueda; devuelve (argumentos, error)."""
+    args = {
+        'query': data.get('query'),
+        'top_n': data.get('top_n', 5),
+        'category': data.get('category'),
+        'min_price': data.get('min_price'),
+        'max_price': data.get('max_price'),
+        'mode': data.get('mode'),
+        'fusion': data.get('fusion')
+    }
+
+    if not args['query'] and not data.get('cursor'):
+        return None, "Query parameter is required."
+
+    if args['mode'] and args['mode'] not in SEARCH_MODES:
+        return None, f"Invalid mode. Must be one of: {', '.join(SEARCH_MODES)}"
+
+    if args['fusion'] is not None and not isinstance(args['fusion'], dict):
+        return None, "fusion must be an object."
+
+    return args, None
+
 @api.route('/search')
 class ProductSearch(Resource):
     @api.expect(product_search_model)
+    @api.response(200, 'Success', product_search_response_model)
     @jwt_required()
     def post(self):
         """Search products by query"""
         data = request.json
-        query = data.get('query')
-        top_n = data.get('top_n', 5)
-        category = data.get('category')
-        min_price = data.get('min_price')
-        max_price = data.get('max_price')
+        args, error = _search_arguments(data)
+        if error:
+            return {"error": error}, 400
         
-        if not query:
+        try:
+            result = searchProduct(
+                **args, explain=bool(data.get('explain', False)), cursor=data.get('cursor'),
+                facets=bool(data.get('facets', False)), paginate=bool(data.get('paginate', False))
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return result, 200
+
+@api.route('/search/explain')
+class ProductSearchExplain(Resource):
+    @api.expect(product_search_model)
+    @admin_required()
+    def post(self):
+        """Profile a product search: per-stage timings, EXPLAIN (ANALYZE, BUFFERS) plans and per-CTE candidate counts (admin only)"""
+        data = request.json
+        if not data.get('query'):
             return {"error": "Query parameter is required."}, 400
-        
-        result = searchProduct(query, top_n, category, min_price, max_price)
+        args, error = _search_arguments(data)
+        if error:
+            return {"error": error}, 400
+
+        try:
+            result = explain_search(**args)
+        except ValueError as e:
+            return {"error": str(e)}, 400
         return result, 200
 
 @api.route('/categories')
@@ -173,31 +247,41 @@ class ProductFavoriteCount(Resource):
 
 @api.route('/<int:id>/reviews')
 class ProductReviews(Resource):
-    @api.param('page', 'Page number for review pagination', type=int, default=1)
+    @api.param('page', 'Page number for review pagination (ignored when cursor is given)', type=int, default=1)
     @api.param('limit', 'Number of reviews to return', type=int, default=10)
+    @api.param('cursor', 'next_cursor returned by the previous page', type=str)
+    @api.param('sort', 'Review order: "recent" (timestamp) or "helpful" (helpful_vote)', type=str, default='recent')
     @jwt_required()
     def get(self, id):
         """Get reviews for a product"""
         page = int(request.args.get('page', 1))
-        per_page = 10
+        per_page = min(max(request.args.get('limit', 10, type=int), 1), 100)
+        cursor = request.args.get('cursor')
+        sort = request.args.get('sort', 'recent')
         offset = (page - 1) * per_page
-        result = get_reviews_by_product(id, limit=per_page, offset=offset)
-        reviews, total_reviews = result
+        try:
+            reviews, total_reviews, next_cursor = get_reviews_by_product(
+                id, limit=per_page, offset=offset, cursor=cursor, sort=sort
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
 
+        # Con cursor la página no corresponde a un número de página: se omiten page y total_pages
         if not reviews:
-            return {
-                "error": "No reviews found for this product.",
-                "page": page,
-                "per_page": per_page
-            }, 404
+            response = {"error": "No reviews found for this product.", "per_page": per_page}
+            if not cursor:
+                response["page"] = page
+            return response, 404
 
-        return {
+        response = {
             "reviews": reviews,
             "total_reviews": total_reviews,
-            "page": page,
             "per_page": per_page,
-            "total_pages": (total_reviews + per_page - 1) // per_page
-        }, 200
+            "next_cursor": next_cursor
+        }
+        if not cursor:
+            response.update(page=page, total_pages=(total_reviews + per_page - 1) // per_page)
+        return response, 200
 
 @api.route('/autocomplete')
 class ProductAutocomplete(Resource):
@@ -1,8 +1,9 @@
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required
 
+from app.config import Config
 from app.services.review_service import (
-    create_review_for_product, delete_review, update_review
+    create_review_for_product, create_reviews_bulk, delete_review, update_review
 )
 
 api = Namespace('reviews', description='Review related operations')
@@ -59,6 +60,27 @@ class Reviews(Resource):
         response, status_code = create_review_for_product(data)
         return response, status_code
 
+bulk_review_model = api.model('BulkReviews', {
+    'reviews': fields.List(fields.Nested(review_model), required=True, description='Reseñas a crear (mismo formato que POST /reviews/)')
+})
+
+@api.route('/bulk')
+class BulkReviews(Resource):
+    @api.expect(bulk_review_model)
+    @jwt_required()
+    def post(self):
+        """
+        Crear muchas reseñas en una sola transacción. Devuelve el estado de cada reseña.
+        """
+        reviews = (api.payload or {}).get('reviews')
+        if not isinstance(reviews, list) or not reviews:
+            return {"error": "Se requiere una lista 'reviews' no vacía"}, 400
+        if len(reviews) > Config.REVIEW_BULK_MAX_ITEMS:
+            return {"error": f"Máximo {Config.REVIEW_BULK_MAX_ITEMS} reseñas por petición"}, 413
+
+        response, status_code = create_reviews_bulk(reviews)
+        return response, status_code
+
 @api.route('/<int:review_id>')
 class Review(Resource):
     @jwt_required()
@@ -0,0 +1,67 @@
+"""
+Prepara una base de datos existente para los agregados de valoración
+incrementales: añade `rating_baseline_number`, `rating_baseline_sum` y
+`rating_sum` a `products`.
+
+Hasta ahora `average_rating` y `rating_number` solo contenían las valoraciones
+importadas, así que se toman como base (`rating_baseline_*`) y `rating_sum` se
+siembra con `average_rating * rating_number`. Después se concilia con las
+reseñas guardadas, como hace `recompute_product_ratings`. Las reseñas
+anteriores a la importación del producto (las de scripts/consumer.py, del mismo
+conjunto de datos de Amazon) ya están en la base: solo suman a `review_count`,
+no a `rating_number` ni a la media.
+Ejecutarla de nuevo no vuelve a sembrar la base. Con --schema-only se añaden y
+siembran las columnas sin conciliar (la conciliación usa `review_count`).
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.add_rating_aggregates [--schema-only]
+"""
+import argparse
+import os
+
+# La migración no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.scripts.recompute_product_ratings import recompute
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agregados de valoración incrementales")
+    parser.add_argument("--schema-only", action="store_true", help="Solo añade y siembra las columnas, sin conciliar")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seeded = db.session.execute(text("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'products'
+              AND column_name = 'rating_baseline_number'
+        """)).scalar()
+
+        if not seeded:
+            for column, ddl in (
+                ("rating_baseline_number", "INTEGER NOT NULL DEFAULT 0"),
+                ("rating_baseline_sum", "DOUBLE PRECISION NOT NULL DEFAULT 0"),
+                ("rating_sum", "DOUBLE PRECISION NOT NULL DEFAULT 0"),
+            ):
+                db.session.execute(text(f"ALTER TABLE products ADD COLUMN IF NOT EXISTS {column} {ddl}"))
+            updated = db.session.execute(text("""
+                UPDATE products
+                SET rating_baseline_number = rating_number,
+                    rating_baseline_sum = COALESCE(average_rating, 0) * rating_number,
+                    rating_sum = COALESCE(average_rating, 0) * rating_number
+            """)).rowcount
+            db.session.commit()
+            print(f"Valoraciones importadas tomadas como base en {updated} productos.")
+        else:
+            print("Las columnas de base ya existen; no se vuelven a sembrar.")
+        if args.schema_only:
+            return
+
+        print(f"Agregados de valoración corregidos en {recompute()} productos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Añade la columna `embedding_bits` a `reviews` y la rellena para las reseñas
+existentes binarizando su embedding con `binary_quantize` de pgvector.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.add_review_binary_embeddings [--schema-only]
+"""
+import argparse
+import os
+
+# La migración no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+
+BATCH_SIZE = 5000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embeddings binarizados de reseñas")
+    parser.add_argument("--schema-only", action="store_true", help="Solo añade la columna, sin rellenarla")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS embedding_bits bit(8192)"))
+        db.session.commit()
+        print("Columna embedding_bits disponible.")
+        if args.schema_only:
+            return
+
+        total = 0
+        while True:
+            result = db.session.execute(
+                text("""
+                UPDATE reviews
+                SET embedding_bits = CAST(binary_quantize(embedding) AS bit(8192))
+                WHERE review_id IN (
+                    SELECT review_id FROM reviews
+                    WHERE embedding_bits IS NULL AND embedding IS NOT NULL
+                    LIMIT :batch_size
+                )
+                """),
+                {"batch_size": BATCH_SIZE}
+            )
+            db.session.commit()
+            if result.rowcount == 0:
+                break
+            total += result.rowcount
+            print(f"Reseñas binarizadas: {total}")
+
+        print(f"Backfill completado. {total} reseñas actualizadas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Prepara una base de datos existente para la paginación por cursor de reseñas:
+añade y rellena el contador `products.review_count` y crea los índices
+compuestos de las ordenaciones "recent" y "helpful".
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.add_review_pagination [--schema-only]
+"""
+import argparse
+import os
+
+# La migración no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from app import create_app, db
+from app.models.review import Review
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contador de reseñas e índices de la paginación por cursor")
+    parser.add_argument("--schema-only", action="store_true", help="Solo añade la columna, sin rellenarla ni crear índices")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text(
+            "ALTER TABLE products ADD COLUMN IF NOT EXISTS review_count INTEGER NOT NULL DEFAULT 0"
+        ))
+        if args.schema_only:
+            db.session.commit()
+            print("Columna review_count disponible.")
+            return
+        updated = db.session.execute(text("""
+            UPDATE products p
+            SET review_count = counts.total
+            FROM (SELECT product_id, COUNT(*) AS total FROM reviews GROUP BY product_id) counts
+            WHERE p.product_id = counts.product_id AND p.review_count <> counts.total
+        """)).rowcount
+        db.session.commit()
+        print(f"Contador review_count actualizado en {updated} productos.")
+
+        # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for index in Review.__table__.indexes:
+                if not index.name.startswith("ix_reviews_product_"):
+                    continue
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))
+                print(f"Creando índice {index.name}...")
+                conn.execute(text(ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)))
+        print("Índices creados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Añade la columna `product_embedding` a `products` y la rellena por lotes con el
+centroide normalizado de los embeddings del título, detalles y features de
+cada producto. Los textos de todo el lote se codifican juntos con `encode_texts`
+(los ya codificados salen del almacén de embeddings).
+
+Después, crear el índice HNSW con:
+    python -m app.scripts.manage_vector_indexes create
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.backfill_product_embeddings [--batch-size 200] [--all] [--schema-only]
+"""
+import argparse
+import os
+
+# El backfill carga el modelo bajo demanda; no hace falta precargarlo en segundo plano
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.models.product import Product
+from app.utils.embeddings import encode_texts, normalized_centroid
+
+
+def embedding_texts(product) -> list:
+    detail_texts, feature_texts = product.embedding_texts()
+    return [product.title, *detail_texts, *feature_texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill del embedding precalculado de productos")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--all", action="store_true",
+                        help="Recalcula también los productos que ya tienen embedding")
+    parser.add_argument("--schema-only", action="store_true", help="Solo añade la columna, sin rellenarla")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text("ALTER TABLE products ADD COLUMN IF NOT EXISTS product_embedding vector(1024)"))
+        db.session.commit()
+        print("Columna product_embedding disponible.")
+        if args.schema_only:
+            return
+
+        total = 0
+        last_id = 0
+        while True:
+            query = Product.query.filter(Product.product_id > last_id)
+            if not args.all:
+                query = query.filter(Product.product_embedding.is_(None))
+            products = query.order_by(Product.product_id).limit(args.batch_size).all()
+            if not products:
+                break
+
+            embeddings = encode_texts(item for product in products for item in embedding_texts(product))
+            for product in products:
+                product.product_embedding = normalized_centroid(
+                    embeddings.get(item) for item in embedding_texts(product)
+                )
+            db.session.commit()
+            last_id = products[-1].product_id
+            total += len(products)
+            print(f"Productos actualizados: {total}")
+
+        print(f"Backfill completado. {total} productos actualizados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Añade la columna `search_text` a `products`, la rellena por lotes con
+`Product.refresh_search_text` y crea sus índices GIN de trigramas y de texto
+completo (modo de búsqueda "hybrid").
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.backfill_product_search_text [--batch-size 1000] [--schema-only]
+"""
+import argparse
+import os
+
+# La migración no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.models.product import Product, SEARCH_TSVECTOR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill del documento de búsqueda de productos")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--schema-only", action="store_true", help="Solo añade la columna, sin rellenarla")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        db.session.execute(text("ALTER TABLE products ADD COLUMN IF NOT EXISTS search_text TEXT"))
+        db.session.commit()
+        print("Columna search_text disponible.")
+        if args.schema_only:
+            return
+
+        total = 0
+        last_id = 0
+        while True:
+            products = (
+                Product.query
+                .filter(Product.product_id > last_id)
+                .order_by(Product.product_id)
+                .limit(args.batch_size)
+                .all()
+            )
+            if not products:
+                break
+            for product in products:
+                product.refresh_search_text()
+            db.session.commit()
+            last_id = products[-1].product_id
+            total += len(products)
+            print(f"Productos actualizados: {total}")
+
+        print(f"Backfill completado. {total} productos actualizados.")
+
+        # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            print("Creando índice GIN de trigramas sobre search_text...")
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_search_text_trgm
+                ON products USING gin (search_text gin_trgm_ops)
+            """))
+            print("Creando índice GIN de texto completo sobre search_text...")
+            conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_search_tsv
+                ON products USING gin (({SEARCH_TSVECTOR}))
+            """))
+        print("Índices creados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Añade la columna `embedding_reduced` a `reviews`, la rellena por lotes a partir
+del embedding completo (primeras REVIEW_REDUCED_DIM componentes renormalizadas,
+igual que `truncate_embedding`) y crea su índice HNSW.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.backfill_review_reduced_embeddings [--batch-size 5000] [--schema-only]
+"""
+import argparse
+import os
+
+# La migración no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill de embeddings reducidos de reseñas")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--schema-only", action="store_true", help="Solo añade la columna, sin rellenarla")
+    args = parser.parse_args()
+    dim = Config.REVIEW_REDUCED_DIM
+
+    app = create_app()
+    with app.app_context():
+        db.session.execute(text(f"ALTER TABLE reviews ADD COLUMN IF NOT EXISTS embedding_reduced vector({dim})"))
+        db.session.commit()
+        print(f"Columna embedding_reduced vector({dim}) disponible.")
+        if args.schema_only:
+            return
+
+        total = 0
+        while True:
+            result = db.session.execute(
+                text("""
+                UPDATE reviews
+                SET embedding_reduced = l2_normalize(subvector(embedding, 1, :dim))
+                WHERE review_id IN (
+                    SELECT review_id FROM reviews
+                    WHERE embedding_reduced IS NULL AND embedding IS NOT NULL
+                    LIMIT :batch_size
+                )
+                """),
+                {"dim": dim, "batch_size": args.batch_size}
+            )
+            db.session.commit()
+            if result.rowcount == 0:
+                break
+            total += result.rowcount
+            print(f"Reseñas actualizadas: {total}")
+
+        print(f"Backfill completado. {total} reseñas actualizadas.")
+
+        # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            print("Creando índice HNSW sobre embedding_reduced...")
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_reviews_embedding_reduced_hnsw
+                ON reviews USING hnsw (embedding_reduced vector_cosine_ops)
+            """))
+        print("Índice creado.")
+
+
+if __name__ == "__main__":
+    main()
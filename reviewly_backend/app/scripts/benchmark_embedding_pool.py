@@ -0,0 +1,56 @@
+"""
+Mide el rendimiento de la ingesta de embeddings con el pool de procesos para
+distintos números de trabajadores, repartiendo los núcleos disponibles entre ellos.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.benchmark_embedding_pool --workers 1 2 4 --texts 2000
+"""
+import argparse
+import os
+import time
+
+# El paquete `app` exige DATABASE_URL al importarse; el benchmark no usa la base de datos
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.utils.embedding_pool import EmbeddingProcessPool
+
+
+def synthetic_texts(count):
+    templates = [
+        "Color: {}",
+        "Item Weight: {} pounds",
+        "Comfortable fit for everyday use, size {}",
+        "I have been using this product for {} weeks and it still works as described. "
+        "The build quality is good and shipping was fast.",
+    ]
+    return [templates[i % len(templates)].format(i) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pool de procesos de embeddings")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    cores = os.cpu_count() or 1
+
+    for num_workers in args.workers:
+        threads_per_worker = max(1, cores // num_workers)
+        pool = EmbeddingProcessPool(num_workers, threads_per_worker=threads_per_worker, batch_size=args.batch_size)
+        try:
+            # Carga de los modelos en todos los trabajadores fuera de la medición
+            pool.encode(texts[:args.batch_size * num_workers])
+
+            start = time.perf_counter()
+            pool.encode(texts)
+            elapsed = time.perf_counter() - start
+            print(f"[{num_workers} trabajadores x {threads_per_worker} hilos] {elapsed:.2f}s, "
+                  f"{len(texts) / elapsed:.1f} textos/s, {len(texts) / elapsed / num_workers:.1f} textos/s por trabajador")
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark del modelo de embeddings (`get_model().encode`) sobre los tipos de
+texto que genera la aplicación: consultas cortas, detalles "clave: valor",
+features de producto y cuerpos de reseña.
+
+Recorre combinaciones de tamaño de lote, longitud máxima de secuencia e hilos
+de torch y escribe un informe JSON con latencia p50/p95 por lote, frases por
+segundo y pico de memoria residente. Cada combinación se mide en un proceso
+nuevo, porque `ru_maxrss` es el pico de todo el proceso y arrastraría el de las
+combinaciones anteriores; `load_rss_mb` es el pico tras cargar el modelo. La
+forma "long_review" supera los 128 tokens, así que el recorte de
+`--seq-lengths` se nota en ella. Funciona sin red contra el modelo en la
+caché local de Hugging Face.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.benchmark_embeddings --batch-sizes 1 8 32 --seq-lengths 128 512 \
+        --threads 1 4 --output embeddings_report.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Sin acceso a red: el modelo debe estar en la caché local
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+# El paquete `app` exige DATABASE_URL al importarse; el benchmark no usa la base de datos
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.config import Config
+from app.utils.model_loader import get_model, get_model_status
+from app.utils.search_profiler import percentile
+
+# Reseña larga (varios cientos de tokens) para la comparativa de longitud máxima de secuencia
+LONG_REVIEW = (
+    "I have been using this vacuum for about three months in a two story house with two dogs and "
+    "mostly hardwood floors, plus a few area rugs in the living room and bedrooms. Out of the box "
+    "the setup took less than ten minutes and the instructions were clear. Suction is strong on hard "
+    "floors and it picks up dog hair from the rugs better than my previous corded model, although "
+    "the brush roll tangles with long hair every couple of weeks and has to be cut free with "
+    "scissors. Battery life is the weak point: on the highest setting it lasts around twelve "
+    "minutes, which is not enough to finish the whole house, so I use the medium setting for most "
+    "rooms and save the boost mode for the entryway. The dust bin is small and needs emptying once "
+    "or twice per session, and emptying it is messy because the hair wraps around the filter "
+    "screen. The charging dock is convenient and keeps the attachments organized, but the wall "
+    "mount screws it came with were too short for my drywall anchors. Customer support answered "
+    "my question about a replacement filter within a day and sent a coupon. Overall it is a good "
+    "value for the price, quieter than I expected, and light enough for my mother to use, but if "
+    "you have a large house or carpet everywhere I would look at a model with a bigger battery."
+)
+
+TEXT_SHAPES = {
+    "query": [
+        "wireless earbuds",
+        "running shoes for flat feet",
+        "cheap gaming mouse with rgb",
+        "waterproof jacket for hiking",
+    ],
+    "detail": [
+        "Color: Black",
+        "Item Weight: 1.2 pounds",
+        "Material: 100% Cotton",
+        "Manufacturer: Logitech",
+    ],
+    "feature": [
+        "Machine washable, soft and breathable cotton fabric for all-day comfort",
+        "Up to 30 hours of battery life with the charging case",
+        "Adjustable DPI from 200 to 16000 with six programmable buttons",
+        "Lightweight mesh upper with a cushioned midsole for long runs",
+    ],
+    "review": [
+        "I bought these for my son and they stopped working after two weeks. The sound was great while "
+        "it lasted, but the battery would not hold a charge and the left earbud kept disconnecting. "
+        "Customer service offered a replacement, which arrived quickly, but it had the same problem. "
+        "Would not buy again.",
+        "Fits true to size and the material is thicker than I expected. I have washed it several times "
+        "and it has not shrunk or faded. The only downside is that the sleeves are a bit long for me, "
+        "but that is easy to fix. Great value for the price and I will probably order another color.",
+    ],
+    "long_review": [LONG_REVIEW],
+}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss se expresa en KB en Linux y en bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def run_case(model, texts, batch_size, iterations):
+    batch = (texts * (batch_size // len(texts) + 1))[:batch_size]
+    model.encode(batch, batch_size=batch_size)
+
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        model.encode(batch, batch_size=batch_size)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    mean_seconds = statistics.mean(latencies) / 1000
+    return {
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "sentences_per_sec": round(batch_size / mean_seconds, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_isolated_case(shape, batch_size, seq_length, threads, iterations):
+    """Carga el modelo y mide una combinación; se ejecuta en un proceso propio."""
+    import torch
+
+    torch.set_num_threads(threads)
+    model = get_model()
+    load_rss_mb = round(peak_rss_mb(), 1)
+    model.max_seq_length = seq_length
+    result = run_case(model, TEXT_SHAPES[shape], batch_size, iterations)
+    result.update(load_rss_mb=load_rss_mb, backend=get_model_status().get("backend"))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de rendimiento del modelo de embeddings")
+    parser.add_argument("--shapes", nargs="+", default=list(TEXT_SHAPES), choices=list(TEXT_SHAPES))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seq-lengths", type=int, nargs="+", default=[128, 512])
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--output", default="embeddings_report.json")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    backend = None
+
+    for threads in args.threads:
+        for seq_length in args.seq_lengths:
+            for shape in args.shapes:
+                for batch_size in args.batch_sizes:
+                    case = {"shape": shape, "batch_size": batch_size, "seq_length": seq_length, "threads": threads}
+                    # Un proceso por combinación para que el pico de memoria sea solo el suyo
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        case.update(executor.submit(
+                            run_isolated_case, shape, batch_size, seq_length, threads, args.iterations
+                        ).result())
+                    backend = case.pop("backend")
+                    results.append(case)
+                    print(json.dumps(case))
+
+    report = {
+        "model": Config.EMBEDDING_MODEL_NAME,
+        "backend": backend,
+        "cpu_count": os.cpu_count(),
+        "iterations": args.iterations,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as outfile:
+        json.dump(report, outfile, indent=2)
+    print(f"Informe guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
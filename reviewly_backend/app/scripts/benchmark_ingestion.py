@@ -0,0 +1,105 @@
+"""
+Compara el rendimiento de la ingesta de productos codificando los detalles y
+features uno a uno (comportamiento anterior de `create_product`) frente a la
+codificación agrupada en lotes que hace `encode_texts` (textos deduplicados).
+
+Los lotes se codifican llamando directamente a `model.encode(..., batch_size=...)`:
+a través de `encode_texts`, el almacén de embeddings serviría desde la segunda
+ejecución todos los textos ya vistos y el micro-batcher volvería a partir los
+lotes mayores que EMBEDDING_BATCHER_MAX_BATCH_SIZE, así que no se mediría el
+procesamiento por lotes del modelo.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.benchmark_ingestion --products meta.jsonl --limit 50
+"""
+import argparse
+import json
+import os
+import time
+
+# El paquete `app` exige DATABASE_URL al importarse; el benchmark no usa la base de datos
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.utils.model_loader import get_model
+
+
+def load_products(products_file, limit):
+    """Carga productos desde un JSONL con el formato de metadatos de Amazon o genera productos sintéticos."""
+    if products_file:
+        products = []
+        with open(products_file, "r", encoding="utf-8") as infile:
+            for line in infile:
+                products.append(json.loads(line.strip()))
+                if len(products) >= limit:
+                    break
+        return products
+
+    return [
+        {
+            "title": f"Producto sintético {i}",
+            "details": {
+                "Brand": f"Marca {i % 7}",
+                "Color": ["Black", "White", "Red"][i % 3],
+                "Material": "Cotton",
+                "Item Weight": f"{i % 5 + 1} pounds",
+            },
+            "features": [
+                "Machine wash",
+                f"Comfortable fit for size {i % 10}",
+                "Imported",
+            ],
+        }
+        for i in range(limit)
+    ]
+
+
+def product_texts(product):
+    """Devuelve los textos de detalles y features tal y como los construye `create_product`."""
+    details = product.get("details") or {}
+    features = product.get("features") or []
+    return [f"{key}: {value}" for key, value in details.items()] + list(features)
+
+
+def run_per_item(model, products):
+    start = time.perf_counter()
+    encoded = 0
+    for product in products:
+        for text in product_texts(product):
+            model.encode([text])
+            encoded += 1
+    return time.perf_counter() - start, encoded
+
+
+def run_batched(model, products, batch_size):
+    start = time.perf_counter()
+    unique = list(dict.fromkeys(text for product in products for text in product_texts(product)))
+    model.encode(unique, batch_size=batch_size)
+    return time.perf_counter() - start, len(unique)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ingesta por elemento vs. por lotes")
+    parser.add_argument("--products", help="Fichero JSONL de productos (opcional)")
+    parser.add_argument("--limit", type=int, default=50, help="Número de productos a procesar")
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[16, 32, 64])
+    args = parser.parse_args()
+
+    products = load_products(args.products, args.limit)
+    total_texts = sum(len(product_texts(p)) for p in products)
+    print(f"Productos: {len(products)}, textos totales: {total_texts}")
+
+    model = get_model()
+    model.encode(["warm-up"])
+
+    elapsed, encoded = run_per_item(model, products)
+    print(f"[por elemento] {elapsed:.2f}s, {encoded} pasadas, "
+          f"{len(products) / elapsed:.2f} productos/s, {encoded / elapsed:.2f} textos/s")
+
+    for batch_size in args.batch_size:
+        elapsed, unique = run_batched(model, products, batch_size)
+        print(f"[lotes de {batch_size}] {elapsed:.2f}s, {unique} textos únicos, "
+              f"{len(products) / elapsed:.2f} productos/s, {total_texts / elapsed:.2f} textos/s")
+
+
+if __name__ == "__main__":
+    main()
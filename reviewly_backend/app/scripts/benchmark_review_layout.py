@@ -0,0 +1,168 @@
+"""
+Compara la búsqueda exacta por producto (`WHERE product_id = ? ORDER BY
+embedding <=> ? LIMIT k`, como el modo exacto de `get_reviews_by_embedding`)
+sobre tres disposiciones físicas de la tabla de reseñas:
+
+- heap:        orden de inserción (las reseñas de un producto repartidas por la tabla).
+- clustered:   `CLUSTER ... USING (product_id)`, lo que hace `cluster_reviews`.
+- partitioned: particionado por hash de `product_id` en N particiones.
+
+Genera un conjunto sintético (por defecto 1M reseñas con vectores aleatorios de
+256 dimensiones) en tablas `bench_reviews_*` de la base de datos configurada y
+mide latencia (p50/p95) y páginas leídas por consulta (`EXPLAIN (ANALYZE,
+BUFFERS)`). Las tablas se borran al terminar salvo con --keep.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.benchmark_review_layout --rows 1000000 --products 20000 --dim 256 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+# Solo consultas SQL sobre datos sintéticos; no necesita el modelo
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.utils.search_profiler import percentile
+
+LAYOUTS = ["heap", "clustered", "partitioned"]
+
+
+def drop_tables(conn):
+    for layout in LAYOUTS:
+        conn.execute(text(f"DROP TABLE IF EXISTS bench_reviews_{layout} CASCADE"))
+
+
+def create_tables(conn, rows, products, dim, partitions, batch_size):
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    drop_tables(conn)
+
+    conn.execute(text(f"""
+        CREATE TABLE bench_reviews_heap (
+            review_id BIGSERIAL PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            embedding vector({dim}) NOT NULL
+        )
+    """))
+    start = time.perf_counter()
+    for done in range(0, rows, batch_size):
+        # La referencia a g.i hace la subconsulta correlacionada: un vector distinto por fila
+        conn.execute(text(f"""
+            INSERT INTO bench_reviews_heap (product_id, embedding)
+            SELECT 1 + floor(random() * :products)::int,
+                   (SELECT array_agg(random() + 0 * g.i) FROM generate_series(1, {dim}))::vector
+            FROM generate_series(1, :batch) AS g(i)
+        """), {"products": products, "batch": min(batch_size, rows - done)})
+        print(f"  {min(done + batch_size, rows)}/{rows} reseñas generadas")
+    print(f"Datos generados en {time.perf_counter() - start:.1f}s")
+    conn.execute(text("CREATE INDEX ON bench_reviews_heap (product_id)"))
+
+    conn.execute(text("CREATE TABLE bench_reviews_clustered (LIKE bench_reviews_heap INCLUDING ALL)"))
+    conn.execute(text("INSERT INTO bench_reviews_clustered SELECT * FROM bench_reviews_heap"))
+    index = conn.execute(text("""
+        SELECT indexrelid::regclass::text FROM pg_index
+        WHERE indrelid = 'bench_reviews_clustered'::regclass AND NOT indisprimary
+    """)).scalar()
+    start = time.perf_counter()
+    conn.execute(text(f"CLUSTER bench_reviews_clustered USING {index}"))
+    print(f"CLUSTER en {time.perf_counter() - start:.1f}s")
+
+    conn.execute(text(f"""
+        CREATE TABLE bench_reviews_partitioned (
+            review_id BIGINT NOT NULL,
+            product_id INTEGER NOT NULL,
+            embedding vector({dim}) NOT NULL,
+            PRIMARY KEY (review_id, product_id)
+        ) PARTITION BY HASH (product_id)
+    """))
+    for remainder in range(partitions):
+        conn.execute(text(f"""
+            CREATE TABLE bench_reviews_partitioned_{remainder} PARTITION OF bench_reviews_partitioned
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})
+        """))
+    conn.execute(text("INSERT INTO bench_reviews_partitioned SELECT * FROM bench_reviews_heap"))
+    conn.execute(text("CREATE INDEX ON bench_reviews_partitioned (product_id)"))
+
+    for layout in LAYOUTS:
+        conn.execute(text(f"ANALYZE bench_reviews_{layout}"))
+
+
+def run_query(conn, layout, product_id, query_vector, top_k):
+    """Ejecuta la consulta con EXPLAIN (ANALYZE, BUFFERS); devuelve (ms, páginas leídas)."""
+    start = time.perf_counter()
+    plan = conn.execute(text(f"""
+        EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)
+        SELECT review_id FROM bench_reviews_{layout}
+        WHERE product_id = :product_id
+        ORDER BY embedding <=> CAST(:query AS vector)
+        LIMIT :top_k
+    """), {"product_id": product_id, "query": query_vector, "top_k": top_k}).scalar()
+    elapsed = (time.perf_counter() - start) * 1000
+    root = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+    return elapsed, root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de disposición física de reseñas por producto")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--reuse", action="store_true", help="Reutiliza las tablas bench_reviews_* existentes")
+    parser.add_argument("--keep", action="store_true", help="No borra las tablas al terminar")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if not args.reuse:
+                create_tables(conn, args.rows, args.products, args.dim, args.partitions, args.batch_size)
+
+            product_ids = [row[0] for row in conn.execute(text(
+                "SELECT DISTINCT product_id FROM bench_reviews_heap"
+            ))]
+            rng = random.Random(42)
+            workload = [
+                (rng.choice(product_ids), "[" + ",".join(f"{rng.random():.6f}" for _ in range(args.dim)) + "]")
+                for _ in range(args.queries)
+            ]
+            per_product = conn.execute(text("SELECT COUNT(*)::float / COUNT(DISTINCT product_id) FROM bench_reviews_heap")).scalar()
+            print(f"\n{len(product_ids)} productos, {per_product:.1f} reseñas por producto de media")
+
+            results = {}
+            for layout in LAYOUTS:
+                # Una pasada de calentamiento para comparar con caché caliente en todas las disposiciones
+                for product_id, query_vector in workload[:10]:
+                    run_query(conn, layout, product_id, query_vector, args.top_k)
+                latencies, blocks = [], []
+                for product_id, query_vector in workload:
+                    ms, pages = run_query(conn, layout, product_id, query_vector, args.top_k)
+                    latencies.append(ms)
+                    blocks.append(pages)
+                size = conn.execute(text(
+                    "SELECT pg_size_pretty(pg_total_relation_size(CAST(:table AS regclass)))"
+                ), {"table": f"bench_reviews_{layout}"}).scalar()
+                results[layout] = {
+                    "p50_ms": round(percentile(latencies, 50), 2),
+                    "p95_ms": round(percentile(latencies, 95), 2),
+                    "avg_pages": round(statistics.mean(blocks), 1),
+                    "size": size,
+                }
+
+            if not args.keep:
+                drop_tables(conn)
+
+    print(f"\n{'disposición':<12} {'p50 ms':>8} {'p95 ms':>8} {'páginas/consulta':>17} {'tamaño':>10}")
+    for layout, stats in results.items():
+        print(f"{layout:<12} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['avg_pages']:>17} {stats['size']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compara la búsqueda exacta de reseñas con los modos aproximados de
+`get_reviews_by_embedding` (binarizado + reordenación exacta, dimensión reducida
+con HNSW). Usa los títulos de reseñas existentes como consultas y mide latencia
+(p50/p95) y recall@k respecto al modo exacto.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.benchmark_review_search --products 20 --queries 5 --top-k 3 --modes binary reduced
+"""
+import argparse
+import os
+import statistics
+import time
+
+# Sin precarga al arrancar la app: el modelo se carga al codificar la primera consulta
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.services.review_service import get_reviews_by_embedding
+from app.utils.search_profiler import percentile
+
+
+def sample_queries(num_products, queries_per_product):
+    """Selecciona los productos con más reseñas y algunos títulos de reseña como consultas."""
+    rows = db.session.execute(
+        text("""
+        WITH top_products AS (
+            SELECT product_id FROM reviews
+            GROUP BY product_id
+            ORDER BY COUNT(*) DESC
+            LIMIT :num_products
+        )
+        SELECT r.product_id, r.title FROM reviews r
+        JOIN top_products tp ON tp.product_id = r.product_id
+        WHERE r.title IS NOT NULL AND r.title <> ''
+        """),
+        {"num_products": num_products}
+    ).fetchall()
+
+    queries = {}
+    for row in rows:
+        titles = queries.setdefault(row.product_id, [])
+        if len(titles) < queries_per_product:
+            titles.append(row.title)
+    return [(product_id, title) for product_id, titles in queries.items() for title in titles]
+
+
+def timed_search(query_text, product_id, top_k, mode):
+    start = time.perf_counter()
+    reviews = get_reviews_by_embedding(query_text, product_id, top_k=top_k, mode=mode) or []
+    return (time.perf_counter() - start) * 1000, [r.review_id for r in reviews]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de reseñas exacta vs. aproximada")
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=5, help="Consultas por producto")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["binary", "reduced"], choices=["binary", "reduced"])
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        queries = sample_queries(args.products, args.queries)
+        print(f"Consultas: {len(queries)}")
+
+        latencies = {mode: [] for mode in ["exact", *args.modes]}
+        recalls = {mode: [] for mode in args.modes}
+        for product_id, query_text in queries:
+            # Primera llamada fuera de la medición: calienta la caché de embeddings de consultas
+            get_reviews_by_embedding(query_text, product_id, top_k=args.top_k, mode="exact")
+
+            exact_ms, exact_ids = timed_search(query_text, product_id, args.top_k, "exact")
+            latencies["exact"].append(exact_ms)
+            for mode in args.modes:
+                elapsed_ms, ids = timed_search(query_text, product_id, args.top_k, mode)
+                latencies[mode].append(elapsed_ms)
+                if exact_ids:
+                    recalls[mode].append(len(set(exact_ids) & set(ids)) / len(exact_ids))
+
+        for mode, values in latencies.items():
+            if values:
+                line = f"[{mode}] p50={percentile(values, 50):.1f}ms p95={percentile(values, 95):.1f}ms"
+                if recalls.get(mode):
+                    line += f" recall@{args.top_k}={statistics.mean(recalls[mode]):.3f}"
+                print(line)
+
+if __name__ == "__main__":
+    main()
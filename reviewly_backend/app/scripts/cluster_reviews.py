@@ -0,0 +1,89 @@
+"""
+Agrupa físicamente las reseñas por producto (`CLUSTER reviews USING
+ix_reviews_product_recent`) para que las reseñas de un producto ocupen páginas
+contiguas: la búsqueda por similitud de `get_reviews_by_embedding`, que filtra
+por `product_id`, lee entonces unas pocas páginas consecutivas en lugar de una
+página por reseña repartida por toda la tabla (y su TOAST).
+
+CLUSTER reescribe la tabla con un bloqueo exclusivo: ejecutarlo en una ventana
+de mantenimiento. Las reseñas nuevas se añaden al final de la tabla, así que el
+agrupamiento se degrada con el tiempo; `maintain` solo reagrupa si la
+correlación física de `product_id` baja del umbral (pensado para cron).
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.cluster_reviews cluster
+    python -m app.scripts.cluster_reviews maintain [--min-correlation 0.9]
+    python -m app.scripts.cluster_reviews status
+"""
+import argparse
+import os
+import time
+
+# El mantenimiento no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from app import create_app, db
+from app.models.review import Review
+
+CLUSTER_INDEX = "ix_reviews_product_recent"
+
+
+def product_correlation(conn):
+    """Correlación entre el orden físico y `product_id` según las estadísticas de ANALYZE (1 = agrupado)."""
+    conn.execute(text("ANALYZE reviews (product_id)"))
+    return conn.execute(text("""
+        SELECT correlation FROM pg_stats
+        WHERE schemaname = current_schema() AND tablename = 'reviews' AND attname = 'product_id'
+    """)).scalar()
+
+
+def show_status(conn):
+    row = conn.execute(text("""
+        SELECT pg_size_pretty(pg_table_size('reviews')) AS table_size,
+               pg_size_pretty(pg_indexes_size('reviews')) AS indexes_size,
+               (SELECT COUNT(*) FROM reviews) AS reviews,
+               (SELECT indisclustered FROM pg_index WHERE indexrelid = to_regclass(:index)) AS clustered
+    """), {"index": CLUSTER_INDEX}).fetchone()
+    print(f"Reseñas: {row.reviews}, tabla: {row.table_size}, índices: {row.indexes_size}")
+    print(f"Índice de agrupamiento {CLUSTER_INDEX}: {'marcado' if row.clustered else 'no marcado'}")
+    print(f"Correlación física de product_id: {product_correlation(conn)}")
+
+
+def cluster(conn):
+    index = next(ix for ix in Review.__table__.indexes if ix.name == CLUSTER_INDEX)
+    conn.execute(text(str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))))
+
+    print(f"Reagrupando reviews con {CLUSTER_INDEX} (bloqueo exclusivo)...")
+    start = time.perf_counter()
+    conn.execute(text(f"CLUSTER reviews USING {CLUSTER_INDEX}"))
+    conn.execute(text("ANALYZE reviews"))
+    print(f"Tabla reagrupada en {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrupamiento físico de reseñas por producto")
+    parser.add_argument("action", choices=["cluster", "maintain", "status"])
+    parser.add_argument("--min-correlation", type=float, default=0.9)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if args.action == "status":
+                show_status(conn)
+            elif args.action == "cluster":
+                cluster(conn)
+            else:
+                correlation = product_correlation(conn)
+                if correlation is not None and abs(correlation) >= args.min_correlation:
+                    print(f"Correlación {correlation:.3f} >= {args.min_correlation}; no hace falta reagrupar")
+                else:
+                    print(f"Correlación {correlation} < {args.min_correlation}")
+                    cluster(conn)
+
+
+if __name__ == "__main__":
+    main()
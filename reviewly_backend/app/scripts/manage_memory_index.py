@@ -0,0 +1,62 @@
+"""
+Construye, compacta o muestra el índice vectorial en proceso usado por el modo
+de búsqueda "inprocess" de `searchProduct` (ver `app.utils.vector_index`).
+
+- build:   exporta todos los embeddings de productos, features y detalles a una
+           generación nueva del índice.
+- compact: reconstruye solo si la proporción de filas obsoletas (productos
+           modificados o eliminados) supera VECTOR_INDEX_MAX_STALE_RATIO.
+           Pensado para ejecutarse periódicamente (p. ej. desde cron).
+- status:  muestra las métricas del índice.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.manage_memory_index build [--dtype float16] [--batch-size 500]
+    python -m app.scripts.manage_memory_index compact [--max-stale-ratio 0.2]
+    python -m app.scripts.manage_memory_index status
+"""
+import argparse
+import json
+import os
+import time
+
+# La exportación lee los embeddings de la base de datos; no necesita el modelo
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from app import create_app
+from app.config import Config
+from app.utils.vector_index import get_vector_index
+
+
+def build(index, batch_size, dtype):
+    start = time.perf_counter()
+    manifest = index.rebuild(batch_size=batch_size, dtype=dtype)
+    print(f"Índice generación {manifest['generation']} construido en {time.perf_counter() - start:.1f}s "
+          f"({manifest['rows']} vectores, {manifest['dtype']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestión del índice vectorial en proceso")
+    parser.add_argument("action", choices=["build", "compact", "status"])
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=Config.VECTOR_INDEX_DTYPE)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-stale-ratio", type=float, default=Config.VECTOR_INDEX_MAX_STALE_RATIO)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        index = get_vector_index()
+        metrics = index.metrics()
+
+        if args.action == "status":
+            print(json.dumps(metrics, indent=2))
+        elif args.action == "build" or not metrics["available"]:
+            build(index, args.batch_size, args.dtype)
+        elif metrics["stale_ratio"] > args.max_stale_ratio:
+            print(f"Filas obsoletas: {metrics['stale_ratio']:.1%} > {args.max_stale_ratio:.1%}; reconstruyendo")
+            build(index, args.batch_size, metrics["dtype"])
+        else:
+            print(f"Filas obsoletas: {metrics['stale_ratio']:.1%}; no hace falta compactar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Crea, reconstruye o muestra los índices HNSW de los embeddings de productos
+usados por los modos de búsqueda de `searchProduct`.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.manage_vector_indexes create  [--m 16] [--ef-construction 64]
+    python -m app.scripts.manage_vector_indexes rebuild [--m 24] [--ef-construction 128] [--maintenance-work-mem 2GB]
+    python -m app.scripts.manage_vector_indexes status
+"""
+import argparse
+import os
+import time
+
+# La gestión de índices no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.config import Config
+
+# (nombre del índice, tabla, columna, clase de operadores)
+VECTOR_INDEXES = [
+    ("ix_products_product_embedding_hnsw", "products", "product_embedding", "vector_cosine_ops"),
+    ("ix_product_features_embedding_hnsw", "product_features", "embedding", "vector_cosine_ops"),
+    ("ix_product_details_detail_embedding_hnsw", "product_details", "detail_embedding", "vector_cosine_ops"),
+]
+
+
+def configure_build_session(conn, maintenance_work_mem, parallel_workers):
+    """La construcción de HNSW es mucho más rápida si el grafo cabe en maintenance_work_mem."""
+    conn.execute(text("SELECT set_config('maintenance_work_mem', :value, false)"), {"value": maintenance_work_mem})
+    conn.execute(
+        text("SELECT set_config('max_parallel_maintenance_workers', :value, false)"),
+        {"value": str(parallel_workers)}
+    )
+
+
+def create_index(conn, name, table, column, opclass, m, ef_construction):
+    start = time.perf_counter()
+    conn.execute(text(f"""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}
+        ON {table} USING hnsw ({column} {opclass})
+        WITH (m = {int(m)}, ef_construction = {int(ef_construction)})
+    """))
+    print(f"Índice {name} listo en {time.perf_counter() - start:.1f}s (m={m}, ef_construction={ef_construction})")
+
+
+def drop_index(conn, name):
+    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    print(f"Índice {name} eliminado")
+
+
+def show_status(conn):
+    for name, table, _, _ in VECTOR_INDEXES:
+        row = conn.execute(
+            text("""
+            SELECT i.indexdef, pg_size_pretty(pg_relation_size(c.oid)) AS size, ix.indisvalid
+            FROM pg_indexes i
+            JOIN pg_class c ON c.relname = i.indexname
+            JOIN pg_index ix ON ix.indexrelid = c.oid
+            WHERE i.indexname = :name
+            """),
+            {"name": name}
+        ).fetchone()
+        if row is None:
+            print(f"{name} ({table}): no existe")
+        else:
+            state = "válido" if row.indisvalid else "INVÁLIDO"
+            print(f"{name} ({table}): {row.size}, {state}\n    {row.indexdef}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestión de los índices HNSW de productos")
+    parser.add_argument("action", choices=["create", "rebuild", "status"])
+    parser.add_argument("--m", type=int, default=Config.HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=Config.HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--parallel-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        # CREATE/DROP INDEX CONCURRENTLY no pueden ejecutarse dentro de una transacción
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if args.action == "status":
+                show_status(conn)
+                return
+
+            configure_build_session(conn, args.maintenance_work_mem, args.parallel_workers)
+            for name, table, column, opclass in VECTOR_INDEXES:
+                if args.action == "rebuild":
+                    drop_index(conn, name)
+                create_index(conn, name, table, column, opclass, args.m, args.ef_construction)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Lleva una base de datos existente al esquema actual ejecutando, en orden, los
+scripts de migración de `app/scripts`. `create_app` solo crea las tablas que
+faltan (`db.create_all`), no añade columnas ni índices a las existentes, así
+que una base de datos anterior necesita estos pasos antes de arrancar la API.
+
+La migración tiene dos fases. Primero cada script añade solo sus columnas
+(`--schema-only`): los backfills cargan los productos con el ORM, que lee todas
+las columnas del modelo, así que todas deben existir antes del primero. Después
+se rellenan los datos y se crean los índices:
+
+ 1-7.   --schema-only de los scripts siguientes y de summarize_reviews
+        (add_rating_aggregates siembra además la base de valoraciones al crear sus columnas)
+ 8.     backfill_product_search_text        `products.search_text` y sus índices GIN
+ 9.     add_review_binary_embeddings        `reviews.embedding_bits`
+ 10.    backfill_review_reduced_embeddings  `reviews.embedding_reduced` y su índice HNSW
+ 11.    backfill_product_embeddings         `products.product_embedding` (usa el modelo)
+ 12.    manage_vector_indexes create        índices HNSW de productos, features y detalles
+ 13.    add_review_pagination               `products.review_count` e índices de reseñas
+ 14.    add_rating_aggregates               conciliación de las valoraciones
+
+Todos los pasos se pueden repetir: comprueban lo que ya existe y solo rellenan
+lo que falta. Cada paso se ejecuta en su propio proceso y la migración se
+detiene en el primero que falle; `--from` permite reanudarla desde él.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.migrate [--from 8] [--list]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Solo el paso backfill_product_embeddings usa el modelo, y lo carga bajo demanda
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+SCHEMA_STEPS = [
+    ("backfill_product_search_text", ["--schema-only"]),
+    ("add_review_binary_embeddings", ["--schema-only"]),
+    ("backfill_review_reduced_embeddings", ["--schema-only"]),
+    ("backfill_product_embeddings", ["--schema-only"]),
+    ("add_review_pagination", ["--schema-only"]),
+    ("add_rating_aggregates", ["--schema-only"]),
+    ("summarize_reviews", ["--schema-only"]),
+]
+
+DATA_STEPS = [
+    ("backfill_product_search_text", []),
+    ("add_review_binary_embeddings", []),
+    ("backfill_review_reduced_embeddings", []),
+    ("backfill_product_embeddings", []),
+    ("manage_vector_indexes", ["create"]),
+    ("add_review_pagination", []),
+    ("add_rating_aggregates", []),
+]
+
+STEPS = SCHEMA_STEPS + DATA_STEPS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migración ordenada de una base de datos existente")
+    parser.add_argument("--from", dest="start", type=int, default=1, choices=range(1, len(STEPS) + 1),
+                        metavar="PASO", help="Empieza en este paso (p. ej. para reanudar)")
+    parser.add_argument("--list", action="store_true", help="Muestra los pasos en orden sin ejecutarlos")
+    args = parser.parse_args()
+
+    if args.list:
+        for number, (name, step_args) in enumerate(STEPS, start=1):
+            print(f"{number}. {' '.join([name, *step_args])}")
+        return
+
+    for number, (name, step_args) in enumerate(STEPS[args.start - 1:], start=args.start):
+        command = " ".join([name, *step_args])
+        print(f"==> {number}. {command}")
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-m", f"app.scripts.{name}", *step_args])
+        if result.returncode != 0:
+            print(f"El paso {number} ({command}) ha fallado (código {result.returncode}). "
+                  f"Reanudar con: python -m app.scripts.migrate --from {number}")
+            sys.exit(result.returncode)
+        print(f"<== {number}. {command} completado en {time.perf_counter() - start:.1f}s")
+
+    print("Migración completada.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Recalcula los agregados de valoración de los productos (`review_count`,
+`rating_number`, `rating_sum` y `average_rating`), que review_service mantiene
+de forma incremental en cada alta, edición o borrado de reseñas.
+
+Los agregados son la base importada con el producto (`rating_baseline_*`) más
+las reseñas guardadas que no incluye ya: las reseñas anteriores a la importación
+de un producto con valoraciones importadas salen del mismo conjunto de datos de
+Amazon y solo cuentan en `review_count` (ver `RATING_BASELINE_COVERS`). Es la tarea de conciliación periódica: solo escribe los
+productos cuyos agregados se han desviado y muestra cuántos eran. En una base
+de datos existente, ejecutar antes `add_rating_aggregates`.
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.recompute_product_ratings [--product-ids 1 2 3] [--dry-run]
+"""
+import argparse
+import os
+
+# La conciliación no necesita el modelo de embeddings
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.models.product import RATING_BASELINE_COVERS
+
+COVERED = RATING_BASELINE_COVERS.format(product="p", reviewed_at="r.timestamp")
+
+AGGREGATES = f"""
+    SELECT p.product_id,
+           COUNT(r.review_id) AS total,
+           p.rating_baseline_number + COUNT(r.review_id) FILTER (WHERE NOT {COVERED}) AS rating_number,
+           p.rating_baseline_sum
+               + COALESCE(SUM(r.rating) FILTER (WHERE NOT {COVERED}), 0)::float8 AS rating_sum
+    FROM products p
+    LEFT JOIN reviews r ON r.product_id = p.product_id
+    {{where}}
+    GROUP BY p.product_id
+"""
+
+# Tolerancia para el error de coma flotante acumulado por los ajustes incrementales
+DRIFT = """
+    p.review_count <> a.total OR p.rating_number <> a.rating_number
+    OR abs(p.rating_sum - a.rating_sum) > 1e-6
+    OR abs(COALESCE(p.average_rating, -1)
+           - CASE WHEN a.rating_number > 0 THEN a.rating_sum / a.rating_number ELSE 0 END) > 1e-6
+"""
+
+
+def recompute(product_ids=None, dry_run=False) -> int:
+    """
+    Concilia los agregados con la base importada y las reseñas.
+
+    Returns:
+        int: Número de productos desviados (corregidos salvo con `dry_run`).
+    """
+    where = "WHERE p.product_id = ANY(:product_ids)" if product_ids else ""
+    params = {"product_ids": product_ids} if product_ids else {}
+    aggregates = AGGREGATES.format(where=where)
+
+    if dry_run:
+        drifted = db.session.execute(text(f"""
+            SELECT COUNT(*) FROM products p JOIN ({aggregates}) a ON a.product_id = p.product_id
+            WHERE {DRIFT}
+        """), params).scalar()
+        db.session.commit()
+        return drifted
+
+    # Bloquear antes los productos: las altas de reseñas concurrentes esperan al
+    # commit y aplican su incremento sobre los valores ya recalculados
+    db.session.execute(text(f"SELECT p.product_id FROM products p {where} FOR UPDATE"), params)
+    updated = db.session.execute(text(f"""
+        UPDATE products p
+        SET review_count = a.total,
+            rating_number = a.rating_number,
+            rating_sum = a.rating_sum,
+            average_rating = CASE WHEN a.rating_number > 0 THEN a.rating_sum / a.rating_number ELSE 0 END
+        FROM ({aggregates}) a
+        WHERE p.product_id = a.product_id AND ({DRIFT})
+    """), params).rowcount
+    db.session.commit()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conciliación de los agregados de valoración de productos")
+    parser.add_argument("--product-ids", type=int, nargs="+", help="Solo estos productos (por defecto, todos)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta los productos desviados")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.dry_run:
+            print(f"Productos con agregados desviados: {recompute(args.product_ids, dry_run=True)}")
+        else:
+            print(f"Agregados de valoración corregidos en {recompute(args.product_ids)} productos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Genera los resúmenes extractivos de reseñas de los productos (`resume_review`)
+con `app.utils.review_summary`: agrupa los embeddings de las reseñas de cada
+producto y elige una frase representativa por grupo. No usa ningún LLM; solo
+el modelo de embeddings local para codificar las frases candidatas.
+
+Cada resumen guarda en `resume_review_signature` una huella de las reseñas
+(identificadores y textos) con las que se generó, así que en cada ejecución
+solo se procesan los productos cuyas reseñas han cambiado desde la anterior.
+Pensado para ejecutarse periódicamente (p. ej. desde cron). La primera
+ejecución adapta también el esquema (`resume_review` a TEXT y la columna de huella);
+con --schema-only solo se adapta el esquema (lo usa `app.scripts.migrate`).
+
+Uso (desde reviewly_backend/):
+    python -m app.scripts.summarize_reviews [--product-ids 1 2 3] [--force] [--limit 1000]
+    python -m app.scripts.summarize_reviews --schema-only
+"""
+import argparse
+import json
+import os
+import time
+
+# El modelo se carga bajo demanda; no hace falta precargarlo en segundo plano
+os.environ.setdefault("MODEL_WARMUP", "false")
+
+from sqlalchemy import text
+from app import create_app, db
+from app.config import Config
+from app.utils.embeddings import encode_texts, truncate_embedding
+from app.utils.review_summary import extractive_summary
+
+# Huella de las reseñas de cada producto: cambia si se añade, borra o edita alguna
+SIGNATURES = """
+    SELECT product_id, COUNT(*) AS total,
+           md5(string_agg(review_id::text || ':' || md5(COALESCE(text, '')), ',' ORDER BY review_id)) AS signature
+    FROM reviews
+    {where}
+    GROUP BY product_id
+"""
+
+
+def pending_products(product_ids, force, min_reviews, limit):
+    """
+    Productos cuyo resumen falta o se generó con otras reseñas: los que tienen
+    suficientes reseñas y también los que ya tenían resumen aunque ahora tengan
+    menos de `min_reviews` (o ninguna), para retirarlo.
+    """
+    where = "WHERE product_id = ANY(:product_ids)" if product_ids else ""
+    product_filter = "AND p.product_id = ANY(:product_ids)" if product_ids else ""
+    stale = "" if force else "AND p.resume_review_signature IS DISTINCT FROM s.signature"
+    return db.session.execute(text(f"""
+        SELECT p.product_id, COALESCE(s.total, 0) AS total, s.signature
+        FROM products p
+        LEFT JOIN ({SIGNATURES.format(where=where)}) s ON s.product_id = p.product_id
+        WHERE (s.total >= :min_reviews OR p.resume_review_signature IS NOT NULL)
+        {product_filter} {stale}
+        ORDER BY p.product_id
+        LIMIT :limit
+    """), {"product_ids": product_ids, "min_reviews": min_reviews, "limit": limit}).fetchall()
+
+
+def product_reviews(product_id, max_reviews):
+    """Textos y embeddings (dimensión reducida) de las reseñas más útiles de un producto."""
+    rows = db.session.execute(text("""
+        SELECT text,
+               CASE WHEN embedding_reduced IS NOT NULL THEN CAST(embedding_reduced AS text)
+                    ELSE CAST(embedding AS text) END AS embedding
+        FROM reviews
+        WHERE product_id = :product_id AND text IS NOT NULL
+          AND (embedding_reduced IS NOT NULL OR embedding IS NOT NULL)
+        ORDER BY helpful_vote DESC NULLS LAST, review_id DESC
+        LIMIT :max_reviews
+    """), {"product_id": product_id, "max_reviews": max_reviews}).fetchall()
+    texts = [row.text for row in rows]
+    embeddings = [truncate_embedding(json.loads(row.embedding), Config.REVIEW_REDUCED_DIM) for row in rows]
+    return texts, embeddings
+
+
+def migrate_schema():
+    """Amplía `resume_review` a TEXT y añade la columna de huella si hace falta."""
+    columns = dict(db.session.execute(text("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'products'
+          AND column_name IN ('resume_review', 'resume_review_signature')
+    """)).fetchall())
+    # ALTER COLUMN ... TYPE bloquea la tabla en exclusiva: solo la primera vez
+    if columns.get("resume_review") != "text":
+        db.session.execute(text("ALTER TABLE products ALTER COLUMN resume_review TYPE TEXT"))
+    if "resume_review_signature" not in columns:
+        db.session.execute(text("ALTER TABLE products ADD COLUMN resume_review_signature VARCHAR(32)"))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resúmenes extractivos de reseñas por producto")
+    parser.add_argument("--product-ids", type=int, nargs="+", help="Solo estos productos (por defecto, todos)")
+    parser.add_argument("--force", action="store_true", help="Regenera aunque las reseñas no hayan cambiado")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de productos en esta ejecución")
+    parser.add_argument("--max-reviews", type=int, default=500, help="Reseñas por producto a considerar")
+    parser.add_argument("--max-sentences", type=int, default=Config.REVIEW_SUMMARY_MAX_SENTENCES)
+    parser.add_argument("--max-chars", type=int, default=Config.REVIEW_SUMMARY_MAX_CHARS)
+    parser.add_argument("--min-reviews", type=int, default=Config.REVIEW_SUMMARY_MIN_REVIEWS)
+    parser.add_argument("--schema-only", action="store_true", help="Solo adapta el esquema, sin generar resúmenes")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        migrate_schema()
+        if args.schema_only:
+            print("Esquema de resúmenes de reseñas actualizado.")
+            return
+
+        pending = pending_products(args.product_ids, args.force, args.min_reviews, args.limit)
+        print(f"Productos con reseñas nuevas o modificadas: {len(pending)}")
+
+        start = time.perf_counter()
+        summarized = 0
+        for done, (product_id, total, signature) in enumerate(pending, start=1):
+            summary = None
+            if total >= args.min_reviews:
+                texts, embeddings = product_reviews(product_id, args.max_reviews)
+                summary = extractive_summary(
+                    texts, embeddings, encode_texts,
+                    max_sentences=args.max_sentences, max_chars=args.max_chars
+                ) if texts else None
+
+            # Sin resumen se borra el anterior (ya no describe las reseñas actuales). La huella se
+            # guarda igualmente, para no reintentarlo hasta que cambien las reseñas
+            db.session.execute(text("""
+                UPDATE products
+                SET resume_review = :summary, resume_review_signature = :signature
+                WHERE product_id = :product_id
+            """), {"summary": summary, "signature": signature, "product_id": product_id})
+            db.session.commit()
+            summarized += summary is not None
+
+            if done % 50 == 0:
+                print(f"  {done}/{len(pending)} productos procesados")
+
+        print(f"{summarized} resúmenes generados en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
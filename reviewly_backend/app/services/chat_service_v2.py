@@ -70,7 +70,8 @@ class ChatService:
 
         self.tool_functions = {
             "search_product": CustomerHandlers.handle_search_product,
-            "get_reviews_by_embedding": CustomerHandlers.handle_get_reviews_by_embedding
+            "get_reviews_by_embedding": CustomerHandlers.handle_get_reviews_by_embedding,
+            "get_review_summary": CustomerHandlers.handle_get_review_summary
         }
         if self.is_admin:
             self.tool_functions.update({
@@ -131,6 +132,20 @@ class ChatService:
                         "required": ["query_text"]
                     }
                 }
+            },
+            {
+                "type": "function",
+                "function": {
+                    "name": "get_review_summary",
+                    "description": "Get the precomputed summary of what reviewers say about a product. Use it for general questions about reviews or opinions; use get_reviews_by_embedding for specific aspects. Always start the answer with 'Based on the reviews...'",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "product_name_or_description": {"type": "string", "description": "Product name or description, if it is not the product being viewed. Optional."},
+                            "query_text": {"type": "string", "description": "User question about the product. Optional."}
+                        }
+                    }
+                }
             }
         ]
 
@@ -379,6 +394,7 @@ class ChatService:
                                         status_messages = {
                                             "search_product": "Searching for products",
                                             "get_reviews_by_embedding": "Searching information in the reviews",
+                                            "get_review_summary": "Reading the review summary",
                                             "get_users": "Retrieving user list",
                                             "get_user_by_id": "Retrieving user information",
                                             "set_user_role": "Updating user role",
@@ -393,7 +409,7 @@ class ChatService:
                                             "message": status_msg
                                         })
 
-                                        if function_name == "get_reviews_by_embedding" and self.product_id:
+                                        if function_name in ("get_reviews_by_embedding", "get_review_summary") and self.product_id:
                                             try:
                                                 args = json.loads(list(tool_calls_buffer.values())[0]['arguments'])
                                                 args['product_id'] = self.product_id
@@ -68,4 +68,36 @@ class CustomerHandlers:
             "additional_data": {
                 "review_ids": review_ids
             }
-        })
\ No newline at end of file
+        })
+    
+    @staticmethod
+    def handle_get_review_summary(args):
+        product_id = args.get("product_id")
+        product_name_or_description = args.get("product_name_or_description")
+
+        app = create_app()
+        with app.app_context():
+            if not product_id and product_name_or_description:
+                product = searchProduct(product_name_or_description, top_n=1)
+                if product and product.get("top_products"):
+                    product_id = product["top_products"][0]["product_id"]
+            if not product_id:
+                return json.dumps({"error": "No se encontró el producto."})
+            product = get_product_by_id(product_id)
+
+        if not product:
+            return json.dumps({"error": "No se encontró el producto."})
+
+        # Sin resumen precalculado (pocas reseñas o aún no generado): reseñas más parecidas a la pregunta
+        if not product.get("resume_review"):
+            return CustomerHandlers.handle_get_reviews_by_embedding({
+                "query_text": args.get("query_text") or "What do reviewers think about this product?",
+                "product_id": product_id,
+            })
+
+        return json.dumps({
+            "response_text": product["resume_review"],
+            "additional_data": {
+                "product_id": product_id
+            }
+        })
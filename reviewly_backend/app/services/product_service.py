@@ -1,14 +1,22 @@
-from app.models.product import Product
+from app.models.product import Product, SEARCH_TSVECTOR
 from app import db
 from sqlalchemy import text
 from sqlalchemy.orm import joinedload
-from app.utils.model_loader import get_model
+from app.utils.embeddings import encode_texts, encode_query, normalized_centroid
 from app.models.productdetail import ProductDetail
 from app.models.productfeature import ProductFeature
 from app.models.review import Review 
 from sqlalchemy.sql import func
+from sqlalchemy import Float, cast, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from app.config import Config
+from app.utils.search_cache import get_search_cache, SearchResultCache
+from app.utils.vector_index import get_vector_index, VectorIndexUnavailableError
+from app.utils.search_cursor import get_cursor_store
+from app.utils.search_profiler import SearchProfile, search_stage_metrics
+from app.utils.pgvector_support import set_hnsw_iterative_scan
+from app.utils.model_loader import ModelNotReadyError
 
-model = get_model()
 
 def get_product_favorite_count(product_id: int) -> int:
     """
@@ -28,7 +36,76 @@ def get_product_favorite_count(product_id: int) -> int:
         print(f"Error fetching favorite count for product {product_id}: {e}")
         return 0
 
-def get_all_products(category=None, price_min=None, price_max=None, name=None, store=None, page=1, limit=43, include_favorites=False):
+def _invalidate_search_cache(*categories):
+    cache = get_search_cache()
+    if cache:
+        cache.invalidate_categories(*categories)
+
+def _sync_vector_index(*product_ids):
+    """
+    Lleva al índice vectorial en proceso los productos creados, modificados o
+    eliminados (los que ya no existen en la base de datos se marcan como eliminados).
+    """
+    if not Config.VECTOR_INDEX_SYNC:
+        return
+    try:
+        synced = get_vector_index().append_products(product_ids, lock_timeout=Config.VECTOR_INDEX_LOCK_TIMEOUT)
+    except Exception as e:
+        print(f"Error actualizando el índice vectorial: {e}")
+        return
+    if not synced:
+        print(f"Índice vectorial no disponible; los productos {list(product_ids)} se incluirán en la próxima reconstrucción")
+
+# GROUPING(main_category, store, price_bucket) de cada conjunto de agrupación de las facetas
+_FACET_GROUPINGS = {3: "main_category", 5: "store", 6: "price", 7: "total"}
+
+def _facets_from_rows(rows) -> dict:
+    """
+    Construye las facetas a partir de filas (grouping_id, main_category, store,
+    price_bucket, count) de una consulta con GROUPING SETS.
+    """
+    bounds = Config.FACET_PRICE_BOUNDS
+    facets = {"main_category": [], "store": [], "price": []}
+    for grouping_id, main_category, store, price_bucket, count in rows:
+        facet = _FACET_GROUPINGS.get(grouping_id)
+        if facet == "main_category" and main_category is not None:
+            facets["main_category"].append({"value": main_category, "count": count})
+        elif facet == "store" and store is not None:
+            facets["store"].append({"value": store, "count": count})
+        elif facet == "price" and price_bucket is not None:
+            facets["price"].append({
+                "min": bounds[price_bucket - 1] if price_bucket > 0 else None,
+                "max": bounds[price_bucket] if price_bucket < len(bounds) else None,
+                "count": count
+            })
+
+    for name in ("main_category", "store"):
+        facets[name] = sorted(facets[name], key=lambda item: (-item["count"], item["value"]))[:Config.FACET_LIMIT]
+    facets["price"].sort(key=lambda item: -1 if item["min"] is None else item["min"])
+    return facets
+
+def _facets_sql(source: str) -> str:
+    """
+    CTE `facets`: una fila con los recuentos por categoría, tienda y tramo de precio
+    de `source` (GROUPING SETS) agregados en JSON. Requiere el parámetro `:price_bounds`.
+    """
+    return f"""
+        facet_counts AS (
+            SELECT GROUPING(main_category, store, price_bucket) AS grouping_id,
+                   main_category, store, price_bucket, COUNT(*) AS count
+            FROM (
+                SELECT main_category, store,
+                       WIDTH_BUCKET(price, CAST(:price_bounds AS float8[])) AS price_bucket
+                FROM {source}
+            ) facet_source
+            GROUP BY GROUPING SETS ((main_category), (store), (price_bucket))
+        ),
+        facets AS (
+            SELECT JSON_AGG(JSON_BUILD_ARRAY(grouping_id, main_category, store, price_bucket, count)) AS facets
+            FROM facet_counts
+        )"""
+
+def get_all_products(category=None, price_min=None, price_max=None, name=None, store=None, page=1, limit=43, include_favorites=False, facets=False):
     """
     Get all products with optional filtering and favorite counts.
 
@@ -41,9 +118,12 @@ def get_all_products(category=None, price_min=None, price_max=None, name=None, s
         page (int): Page number for pagination.
         limit (int): Number of products per page.
         include_favorites (bool): Whether to include favorite count for each product.
+        facets (bool): Whether to include facet counts (main_category, store and price
+                       buckets) over the filtered products.
 
     Returns:
-        dict: Dictionary containing products, total products, total pages, and current page.
+        dict: Dictionary containing products, total products, total pages, current page
+              and, if requested, facets.
     """
     if page is None:
         page = 1
@@ -66,7 +146,23 @@ def get_all_products(category=None, price_min=None, price_max=None, name=None, s
     if price_max is not None:
         query = query.filter(Product.price <= price_max)
 
-    total_products = query.count()
+    facet_counts = None
+    if facets:
+        # El total sale del conjunto vacío () de la misma consulta de facetas
+        price_bucket = func.width_bucket(Product.price, cast(array(Config.FACET_PRICE_BOUNDS), ARRAY(Float)))
+        filtered = query.with_entities(
+            Product.main_category.label("main_category"),
+            Product.store.label("store"),
+            price_bucket.label("price_bucket")
+        ).subquery()
+        columns = (filtered.c.main_category, filtered.c.store, filtered.c.price_bucket)
+        rows = db.session.query(func.grouping(*columns), *columns, func.count()).group_by(
+            func.grouping_sets(*(tuple_(column) for column in columns), tuple_())
+        ).all()
+        total_products = next((row[-1] for row in rows if _FACET_GROUPINGS.get(row[0]) == "total"), 0)
+        facet_counts = _facets_from_rows(rows)
+    else:
+        total_products = query.count()
     total_pages = (total_products + limit - 1) // limit  
 
     offset = (page - 1) * limit
@@ -108,6 +204,8 @@ def get_all_products(category=None, price_min=None, price_max=None, name=None, s
         "total_pages": total_pages,
         "current_page": page
     }
+    if facet_counts is not None:
+        response["facets"] = facet_counts
     print("Respuesta generada correctamente.")
     return response
 
@@ -148,11 +246,56 @@ def get_product_by_id(product_id: int) -> dict:
         "amazon_link": product.amazon_link
     }
 
-def searchProduct(query: str, top_n=5, category: str = None, min_price: float = None, max_price: float = None):
-    query_embedding = model.encode([query]).tolist()[0] 
-    
+def _search_result_from_row(row, scores: dict, ranks: dict = None) -> dict:
+    """
+    Construye la respuesta de un producto de búsqueda a partir de una fila de productos
+    y sus puntuaciones. Si se indican `ranks` (modo explain) se incluyen en la respuesta.
+    """
+    large_images = [img.get("large") for img in row.images if isinstance(img, dict) and "large" in img] if row.images else []
+
+    result = {
+        "product_id": row.product_id,
+        "title": row.title,
+        "description": row.description,
+        "main_category": row.main_category,
+        "average_rating": row.average_rating,
+        "rating_number": row.rating_number,
+        "price": row.price,
+        "store": row.store,
+        "images": large_images,
+        "features": row.features or [],
+        "scores": scores
+    }
+    if ranks is not None:
+        result["ranks"] = ranks
+    return result
+
+def _hydrate_search_results(ranked: list, explain: bool = False) -> list:
+    """
+    Recupera en una sola consulta los productos de una lista de resultados cacheada
+    (product_id, puntuaciones y posiciones) y los devuelve en el mismo orden.
+    """
+    rows = db.session.execute(text("""
+        SELECT p.product_id, p.title, p.description, p.main_category, p.price,
+               p.images, p.average_rating, p.rating_number, p.store,
+               (SELECT JSON_AGG(pf.feature) FROM product_features pf
+                WHERE pf.product_id = p.product_id) AS features
+        FROM products p
+        WHERE p.product_id = ANY(:product_ids)
+        """), {'product_ids': [item["product_id"] for item in ranked]}).fetchall()
+    rows_by_id = {row.product_id: row for row in rows}
+
+    return [
+        _search_result_from_row(
+            rows_by_id[item["product_id"]], item["scores"], item.get("ranks", {}) if explain else None
+        )
+        for item in ranked if item["product_id"] in rows_by_id
+    ]
+
+def _search_filters(category: str = None, min_price: float = None, max_price: float = None):
+    """Construye los filtros SQL sobre `products` y sus parámetros."""
     filters = ""
-    params = {'query': query, 'query_embedding': query_embedding, 'top_n': top_n}
+    params = {}
     
     if category:
         filters += " AND main_category = :category"
@@ -165,94 +308,562 @@ def searchProduct(query: str, top_n=5, category: str = None, min_price: float =
     if max_price is not None:
         filters += " AND price <= :max_price"
         params['max_price'] = max_price
-    
-    combined_query = db.session.execute(
-        text(f"""
-        WITH title_matches AS (
+
+    return filters, params
+
+def _with_sql(ctes: list) -> str:
+    """Cláusula `WITH` a partir de una lista de CTE `(nombre, consulta)`; vacía si no hay ninguno."""
+    if not ctes:
+        return ""
+    return "WITH " + ",\n".join(f"{name} AS ({sql})" for name, sql in ctes)
+
+def _cte_candidate_counts(ctes: list, params: dict) -> dict:
+    """
+    Número de filas de cada CTE `(nombre, consulta)` de un modo de búsqueda: la misma
+    cláusula WITH con un COUNT(*) de cada CTE como consulta final.
+    """
+    if not ctes:
+        return {}
+
+    counts_sql = _with_sql(ctes) + "\n" + " UNION ALL ".join(
+        f"SELECT '{name}' AS cte, COUNT(*) AS candidates FROM {name}" for name, _ in ctes
+    )
+    return {row.cte: row.candidates for row in db.session.execute(text(counts_sql), params)}
+
+def _run_ranking(profile: SearchProfile, ctes: list, final_select: str, params: dict, facet_source: str = None) -> list:
+    """
+    Ejecuta la consulta de ranking de un modo de búsqueda, compuesta por sus CTE
+    `(nombre, consulta)` y la consulta final que devuelve las filas ordenadas. Si
+    `params` incluye `price_bounds` (facetas pedidas), añade a cada fila la columna
+    `facets` calculada sobre `facet_source`: una consulta (main_category, store, price)
+    con los candidatos filtrados del modo antes del LIMIT, que puede usar esos CTE. Sin
+    `facet_source` se cuentan las filas ordenadas. En modo explain guarda además su plan
+    `EXPLAIN (ANALYZE, BUFFERS)` y las filas de cada CTE, fuera de los tiempos de las etapas.
+    """
+    if 'price_bounds' in params:
+        # Facetas en la misma consulta: la consulta final pasa a ser el CTE `ranked`,
+        # junto a los del modo. Cada fila lleva el JSON de facetas
+        with_clause = _with_sql(ctes + [
+            ("ranked", final_select),
+            ("facet_source", facet_source or "SELECT main_category, store, price FROM ranked"),
+        ])
+        statement = text(f"""
+        {with_clause},
+        {_facets_sql("facet_source")}
+        SELECT ranked.*, facets.facets
+        FROM ranked CROSS JOIN facets
+        ORDER BY ranked.total_score DESC, ranked.product_id
+        """)
+    else:
+        statement = text(f"{_with_sql(ctes)}\n{final_select}")
+
+    with profile.stage("rank_sql"):
+        rows = db.session.execute(statement, params).fetchall()
+
+    # El EXPLAIN va después de la consulta real: ejecutado antes, calentaba la caché de
+    # buffers y `rank_sql` medía una ejecución en caliente. Los `shared hit` del plan
+    # incluyen por eso las páginas que acaba de leer la consulta real.
+    if profile.explain:
+        with profile.untimed():
+            profile.plans.append(db.session.execute(
+                text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement.text}"), params
+            ).scalar())
+            profile.candidate_counts.update(_cte_candidate_counts(ctes, params))
+    return rows
+
+def _rank_trigram(params: dict, filters: str, profile: SearchProfile) -> list:
+    """
+    Ranking por defecto: candidatos por trigramas sobre `search_text` y puntuación
+    combinada con la similitud de la consulta con el embedding precalculado de cada
+    candidato (`products.product_embedding`).
+    """
+    # Umbral del operador <% para la etapa de candidatos (usa el índice GIN de search_text)
+    db.session.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {'threshold': str(Config.SEARCH_TRGM_THRESHOLD)}
+    )
+
+    return _run_ranking(profile, [
+        ("title_matches", f"""
             SELECT product_id, title, description, main_category, price,
+                   images, average_rating, rating_number, store, product_embedding,
                    (SIMILARITY(title, :query) * 70 + 
-                   SIMILARITY(COALESCE(CAST(description AS TEXT), ''), :query) * 30) AS title_score
+                   SIMILARITY(search_text, :query) * 30) AS title_score
             FROM products
-            WHERE (SIMILARITY(title, :query) > 0.05
-            OR SIMILARITY(COALESCE(CAST(description AS TEXT), ''), :query) > 0.05)
+            WHERE :query <% search_text
             {filters}
             ORDER BY title_score DESC
             LIMIT 30
-        ),
-        detail_scores AS (
-            SELECT pd.product_id, 
-                   SUM(1 - (pd.detail_embedding <=> CAST(:query_embedding AS vector))) AS detail_score
-            FROM product_details pd
-            WHERE pd.product_id IN (SELECT product_id FROM title_matches)
-            GROUP BY pd.product_id
-        ),
-        feature_scores AS (
+        """),
+        ("scored_matches", """
+            SELECT tm.*,
+                   COALESCE(1 - (tm.product_embedding <=> CAST(:query_embedding AS vector)), 0) AS product_score
+            FROM title_matches tm
+        """),
+        ("product_features", """
             SELECT pf.product_id, 
-                   SUM(1 - (pf.embedding <=> CAST(:query_embedding AS vector))) AS feature_score
+                   JSON_AGG(pf.feature) AS features
             FROM product_features pf
             WHERE pf.product_id IN (SELECT product_id FROM title_matches)
             GROUP BY pf.product_id
-        ),
-        product_features AS (
+        """),
+    ], """
+        SELECT sm.product_id, sm.title, sm.description, sm.main_category, sm.price,
+               sm.images, sm.average_rating, sm.rating_number, sm.store,
+               sm.title_score, 
+               sm.product_score,
+               (sm.title_score * 0.7 + sm.product_score * 100 * 0.3) AS total_score,
+               pf.features
+        FROM scored_matches sm
+        LEFT JOIN product_features pf ON sm.product_id = pf.product_id
+        ORDER BY total_score DESC, sm.product_id
+        LIMIT :top_n
+        """,
+        params,
+        # Todas las coincidencias por trigramas, no solo las 30 que se puntúan
+        facet_source=f"""
+            SELECT main_category, store, price
+            FROM products
+            WHERE :query <% search_text
+            {filters}
+        """
+    )
+
+def _set_ann_search_options(k: int, filtered: bool):
+    """
+    Ajusta la búsqueda HNSW de la transacción actual para un top-k. HNSW aplica los
+    filtros (categoría, precio) sobre los `ef_search` vecinos que recorre, así que
+    una categoría pequeña podía quedarse sin resultados aunque los hubiera. Con
+    filtros se activa el escaneo iterativo (pgvector >= 0.8) o, si no está
+    disponible, se amplía `ef_search` en `SEARCH_ANN_FILTER_FACTOR`.
+    """
+    ef_search = max(Config.SEARCH_HNSW_EF_SEARCH, k)
+    if filtered and not set_hnsw_iterative_scan(Config.SEARCH_HNSW_ITERATIVE_SCAN):
+        ef_search = max(ef_search, k * Config.SEARCH_ANN_FILTER_FACTOR)
+    db.session.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+        # pgvector admite como máximo 1000
+        {'ef_search': str(min(ef_search, 1000))}
+    )
+
+def _rank_semantic(params: dict, filters: str, profile: SearchProfile) -> list:
+    """
+    Ranking puramente semántico: búsqueda top-k en los índices HNSW de
+    `products.product_embedding`, `product_features.embedding` y
+    `product_details.detail_embedding`, agrupando los aciertos por producto.
+    La puntuación de cada lado es la mejor similitud del producto y la total,
+    la mayor de las tres. Los filtros se aplican dentro de cada búsqueda top-k
+    (ver `_set_ann_search_options`), no sobre los candidatos globales.
+    """
+    _set_ann_search_options(Config.SEARCH_ANN_CANDIDATES, bool(filters))
+    params = dict(params, ann_k=Config.SEARCH_ANN_CANDIDATES)
+
+    return _run_ranking(profile, [
+        ("product_hits", f"""
+            SELECT p.product_id, 1 - (p.product_embedding <=> CAST(:query_embedding AS vector)) AS product_score
+            FROM products p
+            WHERE p.product_embedding IS NOT NULL
+            {filters}
+            ORDER BY p.product_embedding <=> CAST(:query_embedding AS vector)
+            LIMIT :ann_k
+        """),
+        ("feature_hits", f"""
+            SELECT pf.product_id, 1 - (pf.embedding <=> CAST(:query_embedding AS vector)) AS similarity
+            FROM product_features pf
+            JOIN products p ON p.product_id = pf.product_id
+            WHERE TRUE
+            {filters}
+            ORDER BY pf.embedding <=> CAST(:query_embedding AS vector)
+            LIMIT :ann_k
+        """),
+        ("detail_hits", f"""
+            SELECT pd.product_id, 1 - (pd.detail_embedding <=> CAST(:query_embedding AS vector)) AS similarity
+            FROM product_details pd
+            JOIN products p ON p.product_id = pd.product_id
+            WHERE TRUE
+            {filters}
+            ORDER BY pd.detail_embedding <=> CAST(:query_embedding AS vector)
+            LIMIT :ann_k
+        """),
+        ("feature_scores", """
+            SELECT product_id, MAX(similarity) AS feature_score
+            FROM feature_hits
+            GROUP BY product_id
+        """),
+        ("detail_scores", """
+            SELECT product_id, MAX(similarity) AS detail_score
+            FROM detail_hits
+            GROUP BY product_id
+        """),
+        ("semantic_matches", """
+            SELECT p.product_id, p.title, p.description, p.main_category, p.price,
+                   p.images, p.average_rating, p.rating_number, p.store,
+                   COALESCE(ph.product_score, 0) AS product_score,
+                   COALESCE(ds.detail_score, 0) AS detail_score,
+                   COALESCE(fs.feature_score, 0) AS feature_score
+            FROM feature_scores fs
+            FULL OUTER JOIN detail_scores ds ON fs.product_id = ds.product_id
+            FULL OUTER JOIN product_hits ph ON ph.product_id = COALESCE(fs.product_id, ds.product_id)
+            JOIN products p ON p.product_id = COALESCE(ph.product_id, fs.product_id, ds.product_id)
+        """),
+        ("product_features", """
             SELECT pf.product_id, 
                    JSON_AGG(pf.feature) AS features
             FROM product_features pf
-            WHERE pf.product_id IN (SELECT product_id FROM title_matches)
+            WHERE pf.product_id IN (SELECT product_id FROM semantic_matches)
             GROUP BY pf.product_id
-        )
-        SELECT tm.product_id, tm.title, tm.description, tm.main_category, tm.price,
-               tm.title_score, 
-               COALESCE(ds.detail_score, 0) AS detail_score,
-               COALESCE(fs.feature_score, 0) AS feature_score,
-               (tm.title_score * 0.7 + COALESCE(ds.detail_score, 0) * 0.2 + COALESCE(fs.feature_score, 0) * 0.1) AS total_score,
+        """),
+    ], """
+        SELECT sm.product_id, sm.title, sm.description, sm.main_category, sm.price,
+               sm.images, sm.average_rating, sm.rating_number, sm.store,
+               sm.product_score,
+               sm.detail_score,
+               sm.feature_score,
+               GREATEST(sm.product_score, sm.detail_score, sm.feature_score) AS total_score,
                pf.features
-        FROM title_matches tm
-        LEFT JOIN detail_scores ds ON tm.product_id = ds.product_id
-        LEFT JOIN feature_scores fs ON tm.product_id = fs.product_id
-        LEFT JOIN product_features pf ON tm.product_id = pf.product_id
-        ORDER BY total_score DESC
+        FROM semantic_matches sm
+        LEFT JOIN product_features pf ON sm.product_id = pf.product_id
+        ORDER BY total_score DESC, sm.product_id
         LIMIT :top_n
+        """,
+        params,
+        facet_source="SELECT main_category, store, price FROM semantic_matches"
+    )
+
+def _fusion_params(fusion: dict = None) -> dict:
+    """
+    Parámetros de la fusión RRF del modo "hybrid" con los valores por defecto de `Config`.
+
+    Args:
+        fusion (dict, optional): Valores por petición. Claves admitidas: `k`,
+            `fulltext_weight`, `vector_weight`, `fulltext_candidates` y `vector_candidates`.
+
+    Raises:
+        ValueError: Si hay claves desconocidas o valores fuera de rango.
+    """
+    params = {
+        "k": Config.SEARCH_RRF_K,
+        "fulltext_weight": 1.0,
+        "vector_weight": 1.0,
+        "fulltext_candidates": Config.SEARCH_HYBRID_CANDIDATES,
+        "vector_candidates": Config.SEARCH_HYBRID_CANDIDATES,
+    }
+    fusion = fusion or {}
+    unknown = set(fusion) - set(params)
+    if unknown:
+        raise ValueError(f"Parámetros de fusión no soportados: {', '.join(sorted(unknown))}")
+
+    for key, value in fusion.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"El parámetro de fusión '{key}' debe ser un número no negativo")
+        params[key] = value
+    for key in ("k", "fulltext_candidates", "vector_candidates"):
+        params[key] = int(params[key])
+    for key in ("fulltext_weight", "vector_weight"):
+        params[key] = float(params[key])
+    return params
+
+def _rank_hybrid(params: dict, filters: str, profile: SearchProfile) -> list:
+    """
+    Ranking híbrido: dos búsquedas independientes, cada una con su propio top-k,
+    fusionadas con reciprocal rank fusion (`peso / (k + posición)`).
+
+    - Texto completo: `websearch_to_tsquery` contra el índice GIN de `SEARCH_TSVECTOR`,
+      ordenado por `ts_rank_cd`. Recupera coincidencias exactas de tokens (p. ej. modelos).
+    - Vectorial: top-k en el índice HNSW de `products.product_embedding`.
+
+    Las columnas `fulltext_rank` y `vector_rank` indican la posición del producto en
+    cada búsqueda (NULL si no apareció en ella).
+    """
+    _set_ann_search_options(params['vector_k'], bool(filters))
+
+    return _run_ranking(profile, [
+        ("fulltext_hits", f"""
+            SELECT product_id,
+                   ROW_NUMBER() OVER (ORDER BY ts_rank_cd({SEARCH_TSVECTOR}, tsq) DESC, product_id) AS fulltext_rank
+            FROM products, websearch_to_tsquery('english', :query) AS tsq
+            WHERE {SEARCH_TSVECTOR} @@ tsq
+            {filters}
+            ORDER BY fulltext_rank
+            LIMIT :fulltext_k
         """),
-        params
-    ).fetchall()
-    
-    if not combined_query: 
+        ("vector_hits", f"""
+            SELECT product_id,
+                   ROW_NUMBER() OVER (ORDER BY product_embedding <=> CAST(:query_embedding AS vector), product_id) AS vector_rank
+            FROM (
+                SELECT product_id, product_embedding
+                FROM products
+                WHERE product_embedding IS NOT NULL
+                {filters}
+                ORDER BY product_embedding <=> CAST(:query_embedding AS vector)
+                LIMIT :vector_k
+            ) ann
+        """),
+        ("fused", """
+            SELECT COALESCE(fh.product_id, vh.product_id) AS product_id,
+                   fh.fulltext_rank,
+                   vh.vector_rank,
+                   COALESCE(CAST(:fulltext_weight AS float) / (:rrf_k + fh.fulltext_rank), 0) AS fulltext_score,
+                   COALESCE(CAST(:vector_weight AS float) / (:rrf_k + vh.vector_rank), 0) AS vector_score
+            FROM fulltext_hits fh
+            FULL OUTER JOIN vector_hits vh ON fh.product_id = vh.product_id
+        """),
+        ("top_fused", """
+            SELECT *, fulltext_score + vector_score AS total_score
+            FROM fused
+            ORDER BY total_score DESC, product_id
+            LIMIT :top_n
+        """),
+    ], """
+        SELECT p.product_id, p.title, p.description, p.main_category, p.price,
+               p.images, p.average_rating, p.rating_number, p.store,
+               tf.fulltext_score, tf.vector_score, tf.total_score,
+               tf.fulltext_rank, tf.vector_rank,
+               (SELECT JSON_AGG(pf.feature) FROM product_features pf
+                WHERE pf.product_id = p.product_id) AS features
+        FROM top_fused tf
+        JOIN products p ON p.product_id = tf.product_id
+        ORDER BY tf.total_score DESC, tf.product_id
+        """,
+        params,
+        facet_source="""
+            SELECT p.main_category, p.store, p.price
+            FROM fused f
+            JOIN products p ON p.product_id = f.product_id
+        """
+    )
+
+def _rank_inprocess(params: dict, filters: str, profile: SearchProfile) -> list:
+    """
+    Ranking semántico con el índice vectorial en proceso (`app.utils.vector_index`):
+    el top-k se calcula en NumPy sobre la matriz mapeada en memoria, con los filtros
+    de categoría y precio aplicados antes de puntuar, y Postgres solo recupera los
+    productos resultantes (y, si se piden, sus facetas). Si el índice no está
+    construido se usa el modo "semantic".
+    """
+    try:
+        with profile.stage("vector_index"):
+            ranked = get_vector_index().search(
+                params['query_embedding'], params['top_n'],
+                params.get('category'), params.get('min_price'), params.get('max_price')
+            )
+    except VectorIndexUnavailableError as e:
+        print(f"{e}; se usa el modo semantic")
+        return _rank_semantic(params, filters, profile)
+    if not ranked:
+        return []
+
+    ranking_params = {
+        'product_ids': [item["product_id"] for item in ranked],
+        'product_scores': [item["product_score"] for item in ranked],
+        'feature_scores': [item["feature_score"] for item in ranked],
+        'detail_scores': [item["detail_score"] for item in ranked],
+        'total_scores': [item["total_score"] for item in ranked]
+    }
+    if 'price_bounds' in params:
+        ranking_params['price_bounds'] = params['price_bounds']
+
+    return _run_ranking(profile, [], """
+        SELECT p.product_id, p.title, p.description, p.main_category, p.price,
+               p.images, p.average_rating, p.rating_number, p.store,
+               r.product_score, r.feature_score, r.detail_score, r.total_score,
+               (SELECT JSON_AGG(pf.feature) FROM product_features pf
+                WHERE pf.product_id = p.product_id) AS features
+        FROM UNNEST(
+            CAST(:product_ids AS integer[]), CAST(:product_scores AS float8[]),
+            CAST(:feature_scores AS float8[]), CAST(:detail_scores AS float8[]),
+            CAST(:total_scores AS float8[])
+        ) WITH ORDINALITY AS r(product_id, product_score, feature_score, detail_score, total_score, position)
+        JOIN products p ON p.product_id = r.product_id
+        ORDER BY r.position
+        """,
+        ranking_params
+    )
+
+SEARCH_MODES = {
+    "trigram": _rank_trigram,
+    "semantic": _rank_semantic,
+    "hybrid": _rank_hybrid,
+    "inprocess": _rank_inprocess,
+}
+
+def searchProduct(query: str, top_n=5, category: str = None, min_price: float = None, max_price: float = None,
+                  mode: str = None, fusion: dict = None, explain: bool = False, cursor: str = None,
+                  profile: SearchProfile = None, facets: bool = False, paginate: bool = False):
+    """
+    Busca productos por texto libre.
+
+    Con `paginate`, la búsqueda ordena hasta `Config.SEARCH_CURSOR_CANDIDATES`
+    candidatos y guarda ese orden en una instantánea con caducidad; si hay más
+    resultados que `top_n` la respuesta incluye `next_cursor`. Sin `paginate`
+    (p. ej. las búsquedas del chat) solo se ordenan `top_n` productos y no se
+    guarda instantánea. Con `cursor`, la página siguiente se sirve
+    desde la instantánea sin volver a codificar ni puntuar la consulta (los filtros
+    y el modo son los de la búsqueda original).
+
+    Los tiempos de cada etapa se acumulan en `search_stage_metrics`.
+
+    Args:
+        query (str): Texto de búsqueda. Se ignora si se indica `cursor`.
+        top_n (int): Número de productos a devolver (tamaño de página).
+        category (str, optional): Filtro por categoría principal.
+        min_price (float, optional): Precio mínimo.
+        max_price (float, optional): Precio máximo.
+        mode (str, optional): Estrategia de ranking (ver `SEARCH_MODES`). Por defecto `Config.SEARCH_MODE`.
+        fusion (dict, optional): Parámetros de la fusión RRF del modo "hybrid" (ver `_fusion_params`).
+        explain (bool): Si es True, cada producto incluye `ranks` con su posición en cada
+                        búsqueda del modo "hybrid".
+        cursor (str, optional): `next_cursor` de una respuesta anterior.
+        profile (SearchProfile, optional): Perfil donde registrar los tiempos por etapa.
+            Con `profile.explain` se omiten la caché y el cursor (ver `explain_search`).
+        facets (bool): Si es True, incluye `facets` con los recuentos por categoría,
+                       tienda y tramo de precio de todos los candidatos filtrados del
+                       modo, no solo de los devueltos (no se aplica a las páginas
+                       servidas con `cursor`). En el modo "inprocess" se cuentan los
+                       productos ordenados.
+        paginate (bool): Si es True, guarda la instantánea y devuelve `next_cursor`.
+
+    Returns:
+        dict: Consulta, productos ordenados por `total_score`, `next_cursor` (o `None`)
+              y, si se piden, `facets`.
+
+    Raises:
+        ValueError: Si el modo o los parámetros de fusión no son válidos, o si el
+                    cursor no es válido o ha caducado (`InvalidCursorError`).
+    """
+    profile = profile or SearchProfile()
+    cursor_store = get_cursor_store()
+    if cursor and not profile.explain:
+        with profile.stage("cursor_page"):
+            query, page, next_cursor = cursor_store.page(cursor, top_n)
+        with profile.stage("hydrate"):
+            top_products = _hydrate_search_results(page, explain)
+        search_stage_metrics.record(profile)
         return {
             "query": query,
-            "top_products": []
+            "top_products": top_products,
+            "next_cursor": next_cursor
         }
-    
-    product_ids = [row.product_id for row in combined_query]
-    products = Product.query.filter(Product.product_id.in_(product_ids)).all()
-    
-    result = []
-    for product in products:
-        large_images = [img.get("large") for img in product.images if isinstance(img, dict) and "large" in img] if product.images else []
-        
-        features = next((row.features for row in combined_query if row.product_id == product.product_id), [])
-        
-        result.append({
-            "product_id": product.product_id,
-            "title": product.title,
-            "description": product.description,  
-            "main_category": product.main_category,
-            "average_rating": product.average_rating,
-            "rating_number": product.rating_number,
-            "price": product.price,
-            "store": product.store,
-            "images": large_images,
-            "features": features,  
-            "scores": {
-                "title_score": next((row.title_score for row in combined_query if row.product_id == product.product_id), 0),
-                "detail_score": next((row.detail_score for row in combined_query if row.product_id == product.product_id), 0),
-                "feature_score": next((row.feature_score for row in combined_query if row.product_id == product.product_id), 0),
-                "total_score": next((row.total_score for row in combined_query if row.product_id == product.product_id), 0)
+
+    mode = mode or Config.SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Modo de búsqueda no soportado: {mode}")
+    fusion_params = _fusion_params(fusion) if mode == "hybrid" else None
+    candidate_limit = max(top_n, Config.SEARCH_CURSOR_CANDIDATES) if paginate else top_n
+
+    cache = None if profile.explain else get_search_cache()
+    cache_key = SearchResultCache.make_key(query, candidate_limit, category, min_price, max_price, mode, fusion_params)
+    if cache:
+        with profile.stage("cache_lookup"):
+            entry = cache.get_entry(cache_key, category)
+            # Una entrada guardada sin facetas no sirve a una búsqueda que las pide
+            if entry is not None and facets and entry["facets"] is None:
+                entry = None
+            cache_generation = cache.generation(category) if entry is None else None
+        if entry is not None:
+            cached = entry["results"]
+            with profile.stage("hydrate"):
+                top_products = _hydrate_search_results(cached[:top_n], explain)
+            next_cursor = None
+            if paginate:
+                with profile.stage("snapshot"):
+                    next_cursor = cursor_store.create(query, cached, top_n)
+            search_stage_metrics.record(profile)
+            response = {
+                "query": query,
+                "top_products": top_products,
+                "next_cursor": next_cursor
             }
-        })
+            if facets:
+                response["facets"] = entry["facets"]
+            return response
+
+    with profile.stage("encode"):
+        query_embedding = encode_query(query)
     
-    return {
+    filters, filter_params = _search_filters(category, min_price, max_price)
+    params = {'query': query, 'query_embedding': query_embedding, 'top_n': candidate_limit, **filter_params}
+    if fusion_params:
+        params.update(
+            rrf_k=fusion_params["k"],
+            fulltext_weight=fusion_params["fulltext_weight"],
+            vector_weight=fusion_params["vector_weight"],
+            fulltext_k=fusion_params["fulltext_candidates"],
+            vector_k=fusion_params["vector_candidates"]
+        )
+    if facets:
+        params['price_bounds'] = Config.FACET_PRICE_BOUNDS
+
+    with profile.stage("rank"):
+        combined_query = SEARCH_MODES[mode](params, filters, profile)
+    
+    # Las filas ya vienen ordenadas por total_score.
+    # Cada modo devuelve sus propias columnas de puntuación (*_score) y posición (*_rank).
+    with profile.stage("hydrate"):
+        ranked = []
+        for row in combined_query:
+            columns = row._mapping
+            ranked.append({
+                "product_id": row.product_id,
+                "scores": {key: value for key, value in columns.items() if key.endswith("_score")},
+                "ranks": {key[:-len("_rank")]: value for key, value in columns.items() if key.endswith("_rank")}
+            })
+        top_products = [
+            _search_result_from_row(row, item["scores"], item["ranks"] if explain else None)
+            for row, item in zip(combined_query[:top_n], ranked)
+        ]
+
+    profile.candidate_counts["ranked"] = len(ranked)
+    facet_counts = None
+    if facets:
+        facet_counts = _facets_from_rows(combined_query[0].facets or [] if combined_query else [])
+
+    if cache:
+        with profile.stage("cache_store"):
+            cache.set(cache_key, ranked, cache_generation, facet_counts)
+
+    next_cursor = None
+    if not profile.explain:
+        if paginate:
+            with profile.stage("snapshot"):
+                next_cursor = cursor_store.create(query, ranked, top_n)
+        search_stage_metrics.record(profile)
+
+    response = {
         "query": query,
-        "top_products": result
+        "top_products": top_products,
+        "next_cursor": next_cursor
+    }
+    if facets:
+        response["facets"] = facet_counts
+    return response
+
+def explain_search(query: str, top_n=5, category: str = None, min_price: float = None, max_price: float = None,
+                   mode: str = None, fusion: dict = None) -> dict:
+    """
+    Ejecuta `searchProduct` sin caché y devuelve su perfil: tiempos por etapa, planes
+    `EXPLAIN (ANALYZE, BUFFERS)` de las consultas de ranking y filas de cada CTE.
+
+    Las etapas `rank` incluyen `rank_sql` (la consulta de ranking) y, en el modo
+    "inprocess", `vector_index`; el tiempo del EXPLAIN no se cuenta en ninguna etapa.
+    El EXPLAIN se ejecuta después de la consulta de ranking, así que `rank_sql` mide
+    la primera ejecución y los buffers del plan aparecen ya en caché.
+
+    Returns:
+        dict: Resultado de la búsqueda junto a `stages_ms`, `candidate_counts` y `plans`.
+    """
+    profile = SearchProfile(explain=True)
+    result = searchProduct(
+        query, top_n, category, min_price, max_price,
+        mode=mode, fusion=fusion, explain=True, profile=profile
+    )
+    result.pop("next_cursor", None)
+    return {
+        "mode": mode or Config.SEARCH_MODE,
+        "stages_ms": profile.stages_ms(),
+        "candidate_counts": profile.candidate_counts,
+        "plans": profile.plans,
+        **result
     }
 
 def create_product(data: dict) -> dict:
@@ -267,6 +878,7 @@ def create_product(data: dict) -> dict:
         dict: Información sobre los productos creados.
     """
     created_products = []
+    pending_embeddings = []
 
     if isinstance(data, dict):
         data = [data]
@@ -281,8 +893,6 @@ def create_product(data: dict) -> dict:
         product = Product(
             title=product_data.get("title"),
             main_category=product_data.get("main_category"),
-            average_rating=product_data.get("average_rating"),
-            rating_number=product_data.get("rating_number", 0),
             features=product_data.get("features"),
             description=product_data.get("description"),
             price=product_data.get("price"),
@@ -298,50 +908,54 @@ def create_product(data: dict) -> dict:
         )
 
         product.generate_amazon_link()
+        product.set_rating_baseline(product_data.get("average_rating"), product_data.get("rating_number", 0))
+        product.refresh_search_text()
 
         db.session.add(product)
         db.session.flush()  
 
-        if product.details:
-            for key, value in product.details.items():
-                detail_text = f"{key}: {value}"
-                
-                try:
-                    embedding = model.encode([detail_text])[0]  
-
-                    new_detail = ProductDetail(
-                        product_id=product.product_id,
-                        detail=detail_text,
-                        detail_embedding=embedding.tolist()
-                    )
-                    db.session.add(new_detail)
-                    print(f"Detalle añadido para producto ID: {product.product_id}")
-
-                except Exception as embed_error:
-                    print(f"Error al generar embedding para producto ID: {product.product_id}, detalle: {detail_text}")
-                    print(f"Detalles del error: {embed_error}")
-                    continue  
-
-        if product.features:
-            for feature in product.features:
-                try:
-                    embedding = model.encode([feature])[0]  
-
-                    new_feature = ProductFeature(
-                        product_id=product.product_id,
-                        feature=feature,
-                        embedding=embedding.tolist()  
-                    )
-                    db.session.add(new_feature)
-                    print(f"Feature añadida para producto ID: {product.product_id}")
-
-                except Exception as embed_error:
-                    print(f"Error al generar embedding para producto ID: {product.product_id}, feature: {feature}")
-                    print(f"Detalles del error: {embed_error}")
-                    continue  
+        detail_texts, feature_texts = product.embedding_texts()
+        pending_embeddings.append((product, detail_texts, feature_texts))
 
         created_products.append(product)
 
+    # Todos los títulos, detalles y features del payload se codifican juntos en lotes
+    embeddings = encode_texts(
+        item for product, detail_texts, feature_texts in pending_embeddings
+        for item in [product.title, *detail_texts, *feature_texts]
+    )
+
+    for product, detail_texts, feature_texts in pending_embeddings:
+        product.product_embedding = normalized_centroid(
+            embeddings.get(item) for item in [product.title, *detail_texts, *feature_texts]
+        )
+
+        for detail_text in detail_texts:
+            embedding = embeddings.get(detail_text)
+            if embedding is None:
+                print(f"Error al generar embedding para producto ID: {product.product_id}, detalle: {detail_text}")
+                continue
+
+            db.session.add(ProductDetail(
+                product_id=product.product_id,
+                detail=detail_text,
+                detail_embedding=embedding
+            ))
+
+        for feature in feature_texts:
+            embedding = embeddings.get(feature)
+            if embedding is None:
+                print(f"Error al generar embedding para producto ID: {product.product_id}, feature: {feature}")
+                continue
+
+            db.session.add(ProductFeature(
+                product_id=product.product_id,
+                feature=feature,
+                embedding=embedding
+            ))
+
+        print(f"Detalles y features añadidos para producto ID: {product.product_id}")
+
     try:
         db.session.commit()
     except Exception as commit_error:
@@ -349,6 +963,9 @@ def create_product(data: dict) -> dict:
         db.session.rollback()
         return {"error": "No se pudo crear el producto."}
 
+    _invalidate_search_cache(*(p.main_category for p in created_products))
+    _sync_vector_index(*(p.product_id for p in created_products))
+
     return {
         "created_products": [
             {
@@ -362,6 +979,50 @@ def create_product(data: dict) -> dict:
         ]
     }
 
+def _refresh_product_embeddings(product, rewrite_rows: bool):
+    """
+    Recalcula los embeddings de un producto editado: el centroide `product_embedding`
+    y, con `rewrite_rows`, las filas de ProductDetail y ProductFeature, que se
+    sustituyen por las de los detalles y features actuales para que el centroide y
+    los índices de detalles y features describan el mismo producto.
+
+    Si el modelo no está listo se propaga `ModelNotReadyError` (la ruta responde 503).
+    Ante cualquier otro error de codificación se conservan los embeddings guardados,
+    en lugar de dejar el producto sin vector y fuera de la búsqueda semántica.
+
+    Args:
+        product (Product): Producto ya modificado (sin confirmar).
+        rewrite_rows (bool): Si cambiaron los detalles o las features.
+    """
+    detail_texts, feature_texts = product.embedding_texts()
+    texts = [product.title, *detail_texts, *feature_texts]
+    try:
+        embeddings = encode_texts(texts)
+    except ModelNotReadyError:
+        raise
+    except Exception as e:
+        print(f"Error al generar los embeddings del producto ID: {product.product_id}; se conservan los anteriores: {e}")
+        return
+
+    centroid = normalized_centroid(embeddings.get(t) for t in texts)
+    if centroid is None:
+        print(f"Sin embeddings para el producto ID: {product.product_id}; se conservan los anteriores")
+        return
+    product.product_embedding = centroid
+
+    if not rewrite_rows:
+        return
+    ProductDetail.query.filter_by(product_id=product.product_id).delete()
+    ProductFeature.query.filter_by(product_id=product.product_id).delete()
+    for detail_text in detail_texts:
+        embedding = embeddings.get(detail_text)
+        if embedding is not None:
+            db.session.add(ProductDetail(product_id=product.product_id, detail=detail_text, detail_embedding=embedding))
+    for feature in feature_texts:
+        embedding = embeddings.get(feature)
+        if embedding is not None:
+            db.session.add(ProductFeature(product_id=product.product_id, feature=feature, embedding=embedding))
+
 def update_product(product_id: int, data: dict) -> dict:
     """
     Actualiza un producto existente en la base de datos.
@@ -372,17 +1033,44 @@ def update_product(product_id: int, data: dict) -> dict:
 
     Returns:
         dict: Información del producto actualizado o `None` si no se encuentra.
+
+    Raises:
+        ModelNotReadyError: Si hay que recalcular los embeddings y el modelo no está
+                            listo; el producto no se modifica.
     """
     product = Product.query.get(product_id)
 
     if not product:
         return None
 
+    previous_category = product.main_category
+    # Los agregados de valoración se derivan de la base importada y las reseñas
+    rating_fields = {"average_rating", "rating_number", "rating_sum", "rating_baseline_number", "rating_baseline_sum"}
     for key, value in data.items():
-        if hasattr(product, key):
+        if hasattr(product, key) and key not in rating_fields:
             setattr(product, key, value)
 
+    if {"average_rating", "rating_number"} & data.keys():
+        baseline_number = product.rating_baseline_number
+        baseline_average = product.rating_baseline_sum / baseline_number if baseline_number else 0.0
+        product.set_rating_baseline(
+            data.get("average_rating", baseline_average),
+            data.get("rating_number", baseline_number)
+        )
+
+    if {"title", "description", "store"} & data.keys():
+        product.refresh_search_text()
+
+    if {"title", "details", "features"} & data.keys():
+        try:
+            _refresh_product_embeddings(product, rewrite_rows=bool({"details", "features"} & data.keys()))
+        except ModelNotReadyError:
+            db.session.rollback()
+            raise
+
     db.session.commit()
+    _invalidate_search_cache(previous_category, product.main_category)
+    _sync_vector_index(product.product_id)
 
     return {
         "product_id": product.product_id,
@@ -426,9 +1114,12 @@ def delete_product(product_id: int) -> bool:
 
         Review.query.filter_by(product_id=product_id).delete()
 
+        category = product.main_category
         db.session.delete(product)
 
         db.session.commit()
+        _invalidate_search_cache(category)
+        _sync_vector_index(product_id)
 
         return True
 
@@ -1,39 +1,149 @@
-from app.models.review import Review
-from app.models.product import Product
+import base64
+import json
+from app.models.review import Review, REVIEW_SORT_KEYS
+from app.models.product import Product, RATING_BASELINE_COVERS
 from datetime import datetime
 from app.models.amazonuser import AmazonUser
-from app.utils.model_loader import get_model
+from app.utils.embeddings import encode_texts, encode_query, binary_quantize, truncate_embedding
+from app.config import Config
+from app.utils.model_loader import ModelNotReadyError
+from app.utils.pgvector_support import set_hnsw_iterative_scan
 
 from app import db
 from sqlalchemy.exc import  IntegrityError
-from sqlalchemy import text
+from sqlalchemy import text, tuple_, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-model = get_model()
 
-def get_reviews_by_product(product_id, limit=10, offset=0):
+def _encode_review_cursor(sort, sort_value, review_id) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps({"s": sort, "k": sort_value, "id": review_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_review_cursor(cursor):
     try:
-        total_reviews = db.session.query(Review).filter_by(product_id=product_id).count()  
-        reviews = (
-            db.session.query(Review)
-            .filter_by(product_id=product_id)
-            .offset(offset)
-            .limit(limit)
-            .all()
-        )
-        print(f"Returning reviews: {reviews}, total_reviews: {total_reviews}")
-        
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        sort = data["s"]
+        if sort not in REVIEW_SORT_KEYS:
+            raise ValueError(sort)
+        sort_value = datetime.fromisoformat(data["k"]) if sort == "recent" else int(data["k"])
+        return sort, sort_value, int(data["id"])
+    except Exception:
+        raise ValueError("Cursor de reseñas no válido")
+
+def _adjust_review_aggregates(changes: list):
+    """
+    Actualiza en una sola sentencia los agregados de reseñas de varios productos
+    dentro de la transacción actual: `review_count`, `rating_number`, `rating_sum`
+    y `average_rating`, que se recalcula a partir de la suma y el número nuevos.
+
+    Toda reseña cuenta en `review_count`, pero las que ya incluyen las valoraciones
+    importadas del producto (RATING_BASELINE_COVERS) no suman a `rating_number` ni a
+    `rating_sum`, igual que en `recompute_product_ratings`.
+
+    Args:
+        changes (list): Tuplas (product_id, +1 alta / -1 baja, valoración, fecha de la reseña).
+    """
+    if not changes:
+        return
+    covered = RATING_BASELINE_COVERS.format(product="q", reviewed_at="d.reviewed_at")
+    db.session.execute(
+        text(f"""
+        UPDATE products p
+        SET review_count = p.review_count + a.count_delta,
+            rating_number = p.rating_number + a.rated_delta,
+            rating_sum = p.rating_sum + a.rating_delta,
+            average_rating = CASE
+                WHEN p.rating_number + a.rated_delta > 0
+                THEN (p.rating_sum + a.rating_delta) / (p.rating_number + a.rated_delta)
+                ELSE 0
+            END
+        FROM (
+            SELECT d.product_id,
+                   SUM(d.sign) AS count_delta,
+                   COALESCE(SUM(d.sign) FILTER (WHERE NOT {covered}), 0) AS rated_delta,
+                   COALESCE(SUM(d.sign * d.rating) FILTER (WHERE NOT {covered}), 0) AS rating_delta
+            FROM UNNEST(
+                CAST(:product_ids AS integer[]), CAST(:signs AS integer[]),
+                CAST(:ratings AS float8[]), CAST(:reviewed_at AS timestamp[])
+            ) AS d(product_id, sign, rating, reviewed_at)
+            JOIN products q ON q.product_id = d.product_id
+            GROUP BY d.product_id
+        ) a
+        WHERE p.product_id = a.product_id
+        """),
+        {
+            'product_ids': [product_id for product_id, _, _, _ in changes],
+            'signs': [sign for _, sign, _, _ in changes],
+            'ratings': [float(rating) for _, _, rating, _ in changes],
+            'reviewed_at': [reviewed_at for _, _, _, reviewed_at in changes],
+        }
+    )
+
+def get_reviews_by_product(product_id, limit=10, offset=0, cursor=None, sort="recent"):
+    """
+    Reseñas de un producto ordenadas por (clave de `sort` DESC, review_id DESC).
+
+    La paginación por cursor usa el índice compuesto de la ordenación y no depende
+    de la profundidad de la página; `offset` se mantiene para los clientes que
+    paginan por número de página. El total sale del contador `products.review_count`.
+
+    Args:
+        product_id (int): ID del producto.
+        limit (int): Número de reseñas por página.
+        offset (int): Desplazamiento (solo si no se indica `cursor`).
+        cursor (str, optional): `next_cursor` de una página anterior; fija también la ordenación.
+        sort (str): "recent" (timestamp) o "helpful" (helpful_vote).
+
+    Returns:
+        tuple: (reseñas, total de reseñas, next_cursor o `None`).
+
+    Raises:
+        ValueError: Si la ordenación o el cursor no son válidos.
+    """
+    if cursor:
+        sort, after_value, after_id = _decode_review_cursor(cursor)
+    elif sort not in REVIEW_SORT_KEYS:
+        raise ValueError(f"Ordenación no soportada: {sort}. Opciones: {', '.join(REVIEW_SORT_KEYS)}")
+    sort_key = REVIEW_SORT_KEYS[sort]
+
+    try:
+        total_reviews = db.session.query(Product.review_count).filter_by(product_id=product_id).scalar() or 0
+
+        query = db.session.query(Review, sort_key.label("sort_value")).filter(Review.product_id == product_id)
+        if cursor:
+            query = query.filter(tuple_(sort_key, Review.review_id) < tuple_(literal(after_value), after_id))
+        elif offset:
+            query = query.offset(offset)
+        rows = query.order_by(sort_key.desc(), Review.review_id.desc()).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_review, last_value = rows[-1]
+            next_cursor = _encode_review_cursor(sort, last_value, last_review.review_id)
+
         reviews_dict = []
-        for review in reviews:
+        for review, _ in rows:
             review_dict = review.to_dict()
             review_dict['rating'] = float(review_dict['rating'])
             reviews_dict.append(review_dict)
 
-        return reviews_dict, total_reviews 
+        return reviews_dict, total_reviews, next_cursor
     except Exception as e:
+        # Deja la sesión utilizable para el resto de la petición (p. ej. tras un error de SQL)
+        db.session.rollback()
         print(f"Error fetching reviews for product {product_id}: {e}")
-        return [], 0
+        return [], 0, None
     
 
+def _set_review_embedding(review, embedding):
+    """Asigna el embedding completo de una reseña y sus versiones binarizada y reducida."""
+    review.embedding = embedding
+    review.embedding_bits = binary_quantize(embedding)
+    review.embedding_reduced = truncate_embedding(embedding, Config.REVIEW_REDUCED_DIM)
+
 def create_review_for_product(data: dict) -> tuple:
     """
     Crea una única reseña para un producto asociado a su parent_asin.
@@ -107,8 +217,13 @@ def create_review_for_product(data: dict) -> tuple:
     # Generar el embedding para la reseña
     try:
         print("Generando embedding para la reseña")
-        review_embedding = model.encode([data['text']]).tolist()[0]
-        review.embedding = review_embedding
+        review_embedding = encode_texts([data['text']]).get(data['text'])
+        if review_embedding is None:
+            raise ValueError("el modelo no devolvió ningún embedding")
+        _set_review_embedding(review, review_embedding)
+    except ModelNotReadyError as e:
+        print(f"Modelo de embeddings no disponible: {e}")
+        return {"error": str(e)}, 503
     except Exception as e:
         print(f"Error generando el embedding: {e}")
         return {"error": "Error generando el embedding para la reseña"}, 500
@@ -117,6 +232,7 @@ def create_review_for_product(data: dict) -> tuple:
     try:
         print(f"Guardando reseña en la base de datos para producto con parent_asin '{parent_asin}'")
         db.session.add(review)
+        _adjust_review_aggregates([(product.product_id, 1, review.rating, review.timestamp)])
         db.session.commit()
         print(f"Reseña guardada: {review.to_dict()}")
         return review.to_dict(), 201
@@ -128,6 +244,168 @@ def create_review_for_product(data: dict) -> tuple:
 
 
 
+def _bulk_review_error(index, message) -> dict:
+    return {"index": index, "status": "error", "error": message}
+
+def _review_timestamp(milliseconds) -> datetime:
+    """
+    Convierte un timestamp en milisegundos de una reseña a `datetime` (UTC).
+
+    Raises:
+        ValueError: Si no es un entero o queda fuera del rango de fechas representable.
+    """
+    # bool es subclase de int: se excluye explícitamente
+    if not isinstance(milliseconds, int) or isinstance(milliseconds, bool):
+        raise ValueError("El timestamp debe ser un valor numérico en milisegundos.")
+    try:
+        return datetime.utcfromtimestamp(milliseconds / 1000)
+    except (OverflowError, OSError, ValueError):
+        raise ValueError("El timestamp está fuera del rango de fechas admitido.")
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _validate_bulk_review(data) -> str:
+    """
+    Comprueba una reseña de la carga masiva antes del INSERT conjunto, para que un
+    valor que la base de datos rechazaría no haga fallar al resto del lote.
+
+    Returns:
+        str: Mensaje de error, o `None` si la reseña es válida.
+    """
+    if not isinstance(data, dict):
+        return "La reseña debe ser un objeto"
+    parent_asin = data.get('parent_asin') or data.get('asin')
+    missing = [field for field in ('user_id', 'text', 'rating') if data.get(field) is None]
+    if not parent_asin:
+        return "No se encontró parent_asin en los datos de la reseña"
+    if missing:
+        return f"Faltan campos: {', '.join(missing)}"
+    try:
+        _review_timestamp(data.get('timestamp'))
+    except ValueError as e:
+        return str(e)
+    if not _is_number(data['rating']) or not 1 <= data['rating'] <= 5:
+        return "El rating debe ser un número entre 1 y 5"
+    if not isinstance(data['text'], str):
+        return "El texto de la reseña debe ser una cadena"
+    for field, max_length in (('user_id', 255), ('title', 255), ('parent_asin', 255), ('asin', 255), ('sentiment', 50)):
+        value = data.get(field)
+        if value is not None and (not isinstance(value, str) or len(value) > max_length):
+            return f"El campo {field} debe ser una cadena de como máximo {max_length} caracteres"
+    helpful_vote = data.get('helpful_vote')
+    if helpful_vote is not None and (not isinstance(helpful_vote, int) or isinstance(helpful_vote, bool)
+                                     or not 0 <= helpful_vote < 2 ** 31):
+        return "helpful_vote debe ser un entero no negativo"
+    if data.get('verified_purchase') is not None and not isinstance(data['verified_purchase'], bool):
+        return "verified_purchase debe ser un booleano"
+    return None
+
+def create_reviews_bulk(items: list) -> tuple:
+    """
+    Crea muchas reseñas en una sola transacción.
+
+    - Los productos de todos los parent_asin se resuelven en una única consulta.
+    - Los usuarios de Amazon se insertan con `ON CONFLICT DO NOTHING`.
+    - Los textos se codifican por lotes con `encode_texts`.
+    - Las reseñas se insertan con INSERT de varias filas y los contadores de
+      reseñas de los productos se actualizan en una sola sentencia.
+
+    Las reseñas inválidas o de productos inexistentes se descartan sin afectar al resto.
+
+    Args:
+        items (list[dict]): Reseñas con el mismo formato que `create_review_for_product`.
+
+    Returns:
+        tuple: Resumen con el estado de cada reseña (en el orden recibido) y el código HTTP.
+    """
+    statuses = [None] * len(items)
+    valid = []
+    for index, data in enumerate(items):
+        error = _validate_bulk_review(data)
+        if error:
+            statuses[index] = _bulk_review_error(index, error)
+        else:
+            valid.append((index, data.get('parent_asin') or data.get('asin'), data))
+
+    # Productos de todos los parent_asin en una sola consulta (el de menor id si hay varios)
+    products = {}
+    asins = {parent_asin for _, parent_asin, _ in valid}
+    if asins:
+        for product_id, parent_asin, asin in (
+            db.session.query(Product.product_id, Product.parent_asin, Product.asin)
+            .filter(Product.parent_asin.in_(asins))
+            .order_by(Product.product_id.desc())
+        ):
+            products[parent_asin] = (product_id, asin)
+
+    pending = []
+    for index, parent_asin, data in valid:
+        if parent_asin not in products:
+            statuses[index] = _bulk_review_error(index, f"Producto con parent_asin '{parent_asin}' no encontrado")
+        else:
+            pending.append((index, parent_asin, data))
+
+    try:
+        embeddings = encode_texts(data['text'] for _, _, data in pending)
+    except ModelNotReadyError as e:
+        print(f"Modelo de embeddings no disponible: {e}")
+        return {"error": str(e)}, 503
+
+    rows = []
+    inserted = []
+    for index, parent_asin, data in pending:
+        embedding = embeddings.get(data['text'])
+        if embedding is None:
+            statuses[index] = _bulk_review_error(index, "Error generando el embedding para la reseña")
+            continue
+        product_id, product_asin = products[parent_asin]
+        rows.append({
+            "amazon_user_id": data['user_id'],
+            "title": data.get('title'),
+            "text": data['text'],
+            "rating": data['rating'],
+            "images": data.get('images'),
+            "sentiment": data.get('sentiment', 'neutral'),
+            "helpful_vote": data.get('helpful_vote', 0),
+            "verified_purchase": data.get('verified_purchase', False),
+            "timestamp": _review_timestamp(data['timestamp']),
+            "parent_asin": parent_asin,
+            "asin": data.get('asin', product_asin),
+            "product_id": product_id,
+            "embedding": embedding,
+            "embedding_bits": binary_quantize(embedding),
+            "embedding_reduced": truncate_embedding(embedding, Config.REVIEW_REDUCED_DIM),
+        })
+        inserted.append(index)
+
+    if rows:
+        try:
+            db.session.execute(
+                pg_insert(AmazonUser).on_conflict_do_nothing(index_elements=['amazon_user_id']),
+                [{"amazon_user_id": user_id, "name": None} for user_id in {row["amazon_user_id"] for row in rows}]
+            )
+            review_ids = db.session.scalars(
+                pg_insert(Review).returning(Review.review_id, sort_by_parameter_order=True),
+                rows
+            ).all()
+
+            _adjust_review_aggregates([
+                (row["product_id"], 1, row["rating"], row["timestamp"]) for row in rows
+            ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error guardando reseñas en bloque: {e}")
+            return {"error": "No se pudieron guardar las reseñas"}, 500
+
+        for index, review_id, row in zip(inserted, review_ids, rows):
+            statuses[index] = {"index": index, "status": "created", "review_id": review_id, "product_id": row["product_id"]}
+
+    created = len(rows)
+    print(f"Reseñas en bloque: {created} creadas, {len(items) - created} con error")
+    return {"created": created, "failed": len(items) - created, "items": statuses}, 200
+
 def delete_review(review_id: int):
     """Elimina una reseña por su ID."""
     # Buscar la reseña por review_id
@@ -138,6 +416,7 @@ def delete_review(review_id: int):
     
     try:
         db.session.delete(review)
+        _adjust_review_aggregates([(review.product_id, -1, review.rating, review.timestamp)])
         db.session.commit()
         return review  
     
@@ -148,12 +427,33 @@ def delete_review(review_id: int):
 
 
 def update_review(review_id, data):
-    """Actualiza todos los campos de una reseña existente."""
+    """
+    Actualiza todos los campos de una reseña existente. Si cambia el texto se vuelve
+    a codificar y se reescriben `embedding`, `embedding_bits` y `embedding_reduced`,
+    para que la búsqueda por similitud (en sus tres modos) refleje el texto nuevo.
+
+    Raises:
+        ModelNotReadyError: Si el texto cambia y el modelo no está listo; la reseña no se modifica.
+        ValueError: Si el timestamp no es válido o el modelo no devuelve el embedding del texto nuevo.
+    """
     review = Review.query.get(review_id)
     
     if not review:
         return None
 
+    # Se valida y codifica antes de modificar la reseña: si falla, no queda a medio actualizar
+    timestamp = data.get('timestamp', review.timestamp)
+    if isinstance(timestamp, int):
+        timestamp = _review_timestamp(timestamp)
+
+    embedding = None
+    if data['text'] != review.text:
+        embedding = encode_texts([data['text']]).get(data['text'])
+        if embedding is None:
+            raise ValueError("el modelo no devolvió ningún embedding")
+
+    previous = (review.product_id, -1, review.rating, review.timestamp)
+
     # Actualizar todos los campos con los datos proporcionados
     review.amazon_user_id = data['user_id']
     review.title = data['title']
@@ -163,49 +463,104 @@ def update_review(review_id, data):
     review.sentiment = data.get('sentiment', review.sentiment)
     review.helpful_vote = data.get('helpful_vote', review.helpful_vote)
     review.verified_purchase = data.get('verified_purchase', review.verified_purchase)
-    review.timestamp = data.get('timestamp', review.timestamp)
+    review.timestamp = timestamp
     review.parent_asin = data['parent_asin']
     review.asin = data.get('asin', data['parent_asin'])
     review.product_id = data['product_id']
+    if embedding is not None:
+        _set_review_embedding(review, embedding)
+
+    # Baja de la versión anterior y alta de la nueva: cubre cambios de producto, de
+    # valoración y de fecha (que puede dejarla dentro o fuera de la base importada)
+    _adjust_review_aggregates([previous, (review.product_id, 1, review.rating, review.timestamp)])
 
     # Guardar los cambios en la base de datos
     db.session.commit()
 
     return review.to_dict()
 
-def get_reviews_by_embedding(query_text, product_id, top_k=3):
+def _set_hnsw_search_options():
+    """Ajusta los parámetros de búsqueda HNSW para la transacción actual."""
+    db.session.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+        {'ef_search': str(Config.REVIEW_HNSW_EF_SEARCH)}
+    )
+    set_hnsw_iterative_scan(Config.REVIEW_HNSW_ITERATIVE_SCAN)
+
+def get_reviews_by_embedding(query_text, product_id, top_k=3, mode=None):
     """
-    Busca las reseñas más cercanas a la pregunta del usuario usando el índice ivfflat
-    y las reseñas asociadas a un producto específico.
+    Busca las reseñas más cercanas a la pregunta del usuario
+    entre las reseñas asociadas a un producto específico.
+
+    En modo "exact" se ordena por distancia coseno sobre el embedding completo.
+    En modo "binary" se seleccionan `top_k * REVIEW_BINARY_RERANK_FACTOR` candidatas
+    por distancia de Hamming sobre `embedding_bits` y se reordenan por coseno exacto.
+    En modo "reduced" se consulta `embedding_reduced` a través de su índice HNSW.
     
     Args:
         query_text (str): El texto de la pregunta del usuario.
         product_id (int): El ID del producto para filtrar las reseñas.
         top_k (int): El número de reseñas más cercanas a devolver.
+        mode (str, optional): "exact", "binary" o "reduced". Por defecto `Config.REVIEW_SEARCH_MODE`.
     
     Returns:
         list: Las reseñas más cercanas.
     """
+    mode = mode or Config.REVIEW_SEARCH_MODE
     try:
         # Convertir el texto de la consulta en un embedding usando el modelo
-        query_embedding = model.encode([query_text]).tolist()[0]
+        query_embedding = encode_query(query_text)
         
         # Convertir el embedding a un formato compatible con PostgreSQL (ARRAY)
         query_embedding_array = "[" + ",".join(map(str, query_embedding)) + "]"
+        params = {'query_embedding': query_embedding_array, 'product_id': product_id, 'top_k': top_k}
 
-        # Realizar la búsqueda de similitud utilizando el índice ivfflat
-        result = db.session.query(Review).from_statement(
-            text("""
+        if mode == "binary":
+            params['query_bits'] = binary_quantize(query_embedding)
+            params['candidates'] = top_k * Config.REVIEW_BINARY_RERANK_FACTOR
+            statement = text("""
+            WITH candidates AS (
+                SELECT review_id FROM reviews
+                WHERE product_id = :product_id AND embedding_bits IS NOT NULL
+                ORDER BY embedding_bits <~> CAST(:query_bits AS bit(8192))
+                LIMIT :candidates
+            )
+            SELECT reviews.* FROM reviews
+            JOIN candidates ON candidates.review_id = reviews.review_id
+            ORDER BY reviews.embedding <=> CAST(:query_embedding AS vector)
+            LIMIT :top_k
+            """)
+        elif mode == "reduced":
+            reduced_embedding = truncate_embedding(query_embedding, Config.REVIEW_REDUCED_DIM)
+            params['query_reduced'] = "[" + ",".join(map(str, reduced_embedding)) + "]"
+            _set_hnsw_search_options()
+            statement = text("""
+            WITH nearest AS MATERIALIZED (
+                SELECT review_id, embedding_reduced <=> CAST(:query_reduced AS vector) AS distance
+                FROM reviews
+                WHERE product_id = :product_id AND embedding_reduced IS NOT NULL
+                ORDER BY distance
+                LIMIT :top_k
+            )
+            SELECT reviews.* FROM reviews
+            JOIN nearest ON nearest.review_id = reviews.review_id
+            ORDER BY nearest.distance
+            """)
+        else:
+            statement = text("""
             SELECT * FROM reviews
             WHERE product_id = :product_id
             ORDER BY embedding <=> :query_embedding
             LIMIT :top_k
             """)
-        ).params(query_embedding=query_embedding_array, product_id=product_id, top_k=top_k).all()
+
+        result = db.session.query(Review).from_statement(statement).params(**params).all()
 
 
         return result
 
     except Exception as e:
+        # Deja la sesión utilizable si la consulta abortó la transacción
+        db.session.rollback()
         print(f"Error while fetching closest reviews: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,153 @@
+# app/utils/embedding_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.config import Config
+from app.utils.model_loader import get_model
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa las peticiones de embedding de todos los hilos en lotes.
+
+    Cada llamada a `submit` encola un texto y devuelve un `Future`. Los hilos
+    trabajadores vacían la cola en lotes que se envían al modelo en una sola
+    pasada cuando se alcanza `max_batch_size` o cuando el primer texto del lote
+    lleva `max_wait_ms` milisegundos esperando.
+    """
+
+    def __init__(self, max_batch_size=32, max_wait_ms=5, num_workers=1):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_workers = num_workers
+
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "batches": 0,
+            "encoded": 0,
+            "failed": 0,
+            "last_batch_size": 0,
+            "max_queue_depth": 0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._run, name=f"embedding-batcher-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, text: str) -> Future:
+        """
+        Encola un texto para codificarlo.
+
+        Args:
+            text (str): Texto a codificar.
+
+        Returns:
+            Future: Se resuelve con el embedding (list[float]) o con la excepción del modelo.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return future
+
+    def encode(self, texts, timeout=None) -> list:
+        """Encola varios textos y espera a sus embeddings, en el mismo orden."""
+        futures = [self.submit(t) for t in texts]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats.update({
+            "queue_depth": self._queue.qsize(),
+            "workers": len(self._workers),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "avg_batch_size": stats["encoded"] / batches if batches else 0.0,
+            "avg_batch_fill": stats["encoded"] / (batches * self.max_batch_size) if batches else 0.0,
+        })
+        return stats
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            try:
+                model = get_model()
+            except Exception as load_error:
+                for _, future in batch:
+                    future.set_exception(load_error)
+                self._record_batch(len(batch), len(batch))
+                continue
+
+            try:
+                vectors = model.encode(texts, batch_size=len(texts)).tolist()
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+                failed = 0
+            except Exception as batch_error:
+                print(f"Error al generar embeddings para un lote de {len(texts)} textos: {batch_error}")
+                failed = self._encode_one_by_one(model, batch)
+
+            self._record_batch(len(batch), failed)
+
+    def _record_batch(self, size, failed):
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["encoded"] += size
+            self._stats["failed"] += failed
+            self._stats["last_batch_size"] = size
+
+    @staticmethod
+    def _encode_one_by_one(model, batch) -> int:
+        failed = 0
+        for text, future in batch:
+            try:
+                future.set_result(model.encode([text]).tolist()[0])
+            except Exception as embed_error:
+                future.set_exception(embed_error)
+                failed += 1
+        return failed
+
+
+_batcher_instance = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> EmbeddingBatcher:
+    global _batcher_instance
+    if _batcher_instance is None:
+        with _batcher_lock:
+            if _batcher_instance is None:
+                _batcher_instance = EmbeddingBatcher(
+                    max_batch_size=Config.EMBEDDING_BATCHER_MAX_BATCH_SIZE,
+                    max_wait_ms=Config.EMBEDDING_BATCHER_MAX_WAIT_MS,
+                    num_workers=Config.EMBEDDING_BATCHER_WORKERS
+                )
+    return _batcher_instance
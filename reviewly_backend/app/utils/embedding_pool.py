@@ -0,0 +1,119 @@
+# app/utils/embedding_pool.py
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from app.config import Config
+
+# Estado de cada proceso trabajador
+_worker_model = None
+
+
+def _init_worker(threads_per_worker):
+    global _worker_model
+    from app.utils.model_loader import get_model, set_torch_threads
+    set_torch_threads(threads_per_worker)
+    _worker_model = get_model()
+
+
+def _embedding_dim() -> int:
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _encode_into(shm_name, shape, start, texts):
+    """Codifica `texts` y escribe los vectores en las filas [start, start + len(texts)) de la memoria compartida."""
+    # El segmento pertenece al proceso principal, que lo libera con unlink(). Los trabajadores
+    # "spawn" comparten su resource tracker, así que aquí solo se cierra, sin desregistrarlo.
+    shm = SharedMemory(name=shm_name)
+    try:
+        output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        output[start:start + len(texts)] = _worker_model.encode(texts, batch_size=len(texts))
+        del output
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class EmbeddingProcessPool:
+    """
+    Pool de procesos trabajadores para la ingesta masiva de embeddings.
+
+    Cada proceso carga su propia copia del modelo con un presupuesto de
+    `threads_per_worker` hilos de torch, de forma que la codificación escala con
+    los núcleos disponibles sin competir por el GIL. Los vectores se devuelven
+    escritos directamente en un bloque de memoria compartida.
+    """
+
+    def __init__(self, num_workers, threads_per_worker=1, batch_size=32):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads_per_worker,)
+        )
+        self._dim = None
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            self._dim = self._executor.submit(_embedding_dim).result()
+        return self._dim
+
+    def encode(self, texts) -> list:
+        """
+        Codifica una lista de textos repartiendo lotes entre los procesos trabajadores.
+
+        Args:
+            texts (list[str]): Textos a codificar.
+
+        Returns:
+            list: Embeddings (list[float]) en el mismo orden que `texts`.
+        """
+        if not texts:
+            return []
+
+        shape = (len(texts), self.dim)
+        shm = SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(np.float32).itemsize)
+        try:
+            futures = [
+                self._executor.submit(_encode_into, shm.name, shape, start, texts[start:start + self.batch_size])
+                for start in range(0, len(texts), self.batch_size)
+            ]
+            for future in futures:
+                future.result()
+            output = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            vectors = output.tolist()
+            del output
+            return vectors
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool_instance = None
+_pool_lock = threading.Lock()
+
+
+def get_embedding_pool():
+    """Devuelve el pool de procesos configurado o `None` si está desactivado."""
+    global _pool_instance
+    if Config.EMBEDDING_POOL_WORKERS <= 0:
+        return None
+    if _pool_instance is None:
+        with _pool_lock:
+            if _pool_instance is None:
+                _pool_instance = EmbeddingProcessPool(
+                    num_workers=Config.EMBEDDING_POOL_WORKERS,
+                    threads_per_worker=Config.EMBEDDING_POOL_THREADS_PER_WORKER,
+                    batch_size=Config.EMBEDDING_BATCH_SIZE
+                )
+    return _pool_instance
@@ -0,0 +1,115 @@
+# app/utils/embedding_store.py
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+
+from app.config import Config
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hexadecimal del texto en UTF-8."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Almacén persistente de embeddings direccionado por contenido.
+
+    Cada vector se guarda en SQLite bajo la clave (modelo y backend, SHA-256 del texto)
+    como float32 empaquetado, de forma que reingestas, reintentos y textos
+    repetidos cuestan una consulta en lugar de una pasada del modelo.
+    """
+
+    # SQLite limita el número de parámetros por sentencia
+    _LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model_name: str, texts) -> dict:
+        """
+        Busca los embeddings guardados de varios textos.
+
+        Args:
+            model_name (str): Huella del modelo y backend (`model_fingerprint()`).
+            texts (list[str]): Textos a buscar.
+
+        Returns:
+            dict: Diccionario texto -> embedding (list[float]) con los textos encontrados.
+        """
+        hashes = {text_hash(t): t for t in texts}
+        keys = list(hashes)
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(keys), self._LOOKUP_CHUNK):
+            chunk = keys[start:start + self._LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model_name, *chunk]
+            ).fetchall()
+            for digest, blob in rows:
+                found[hashes[digest]] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model_name: str, embeddings: dict):
+        """
+        Guarda varios embeddings. Las claves ya existentes se ignoran.
+
+        Args:
+            model_name (str): Huella del modelo y backend (`model_fingerprint()`).
+            embeddings (dict): Diccionario texto -> embedding (list[float]).
+        """
+        if not embeddings:
+            return
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+            [
+                (model_name, text_hash(t), len(vector), array("f", vector).tobytes())
+                for t, vector in embeddings.items()
+            ]
+        )
+        conn.commit()
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """Devuelve el almacén de embeddings configurado o `None` si está desactivado."""
+    global _store_instance
+    if not Config.EMBEDDING_STORE_ENABLED:
+        return None
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = EmbeddingStore(Config.EMBEDDING_STORE_PATH)
+    return _store_instance
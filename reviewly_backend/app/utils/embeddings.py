@@ -0,0 +1,137 @@
+# app/utils/embeddings.py
+from app.config import Config
+from app.utils.model_loader import get_model, model_fingerprint, ModelNotReadyError
+from app.utils.embedding_batcher import get_batcher
+from app.utils.query_cache import query_embedding_cache
+from app.utils.embedding_store import get_embedding_store
+from app.utils.embedding_pool import get_embedding_pool
+
+
+def encode_text(text: str) -> list:
+    """
+    Genera el embedding de un único texto (consulta de búsqueda, reseña...).
+
+    Si el micro-batcher está activo, la petición se agrupa con las de otros hilos.
+
+    Args:
+        text (str): Texto a codificar.
+
+    Returns:
+        list: Embedding del texto (list[float]).
+    """
+    if Config.EMBEDDING_BATCHER_ENABLED:
+        return get_batcher().submit(text).result(timeout=Config.EMBEDDING_TIMEOUT)
+    return get_model().encode([text]).tolist()[0]
+
+
+def encode_query(text: str) -> list:
+    """
+    Genera el embedding de una consulta de usuario pasando por la caché de consultas,
+    con clave por `model_fingerprint()` para no mezclar vectores de distintos backends.
+
+    Args:
+        text (str): Texto de la consulta.
+
+    Returns:
+        list: Embedding de la consulta (list[float]).
+    """
+    return query_embedding_cache.get_or_compute(model_fingerprint(), text, encode_text)
+
+
+def binary_quantize(embedding) -> str:
+    """
+    Binariza un embedding por signo (1 si el componente es positivo) en el formato
+    de texto del tipo `bit(n)` de PostgreSQL, igual que `binary_quantize` de pgvector.
+    """
+    return "".join("1" if value > 0 else "0" for value in embedding)
+
+
+def truncate_embedding(embedding, dim: int) -> list:
+    """
+    Reduce un embedding a sus primeras `dim` componentes y lo renormaliza (estilo Matryoshka).
+    """
+    head = list(embedding[:dim])
+    norm = sum(value * value for value in head) ** 0.5
+    return [value / norm for value in head] if norm else head
+
+
+def normalized_centroid(vectors) -> list:
+    """
+    Media de varios embeddings normalizada a norma 1. Devuelve `None` si no hay vectores.
+    """
+    vectors = [v for v in vectors if v is not None]
+    if not vectors:
+        return None
+    centroid = [sum(values) / len(vectors) for values in zip(*vectors)]
+    norm = sum(value * value for value in centroid) ** 0.5
+    return [value / norm for value in centroid] if norm else centroid
+
+
+def _encode_batch(batch, batch_size) -> list:
+    if Config.EMBEDDING_BATCHER_ENABLED:
+        return get_batcher().encode(batch, timeout=Config.EMBEDDING_TIMEOUT)
+    return get_model().encode(batch, batch_size=batch_size).tolist()
+
+
+def encode_texts(texts, batch_size=None) -> dict:
+    """
+    Genera los embeddings de una colección de textos en lotes de tamaño acotado.
+
+    Los textos repetidos se codifican una sola vez y los que ya están en el
+    almacén persistente de embeddings no pasan por el modelo. Las llamadas
+    grandes se reparten entre el pool de procesos si está configurado. Si un lote falla,
+    sus textos se reintentan uno a uno para que un único texto problemático no
+    descarte el resto.
+
+    Args:
+        texts (iterable[str]): Textos a codificar. Puede contener duplicados.
+        batch_size (int, optional): Tamaño máximo de cada lote. Por defecto `Config.EMBEDDING_BATCH_SIZE`.
+
+    Returns:
+        dict: Diccionario texto -> embedding (list[float]). Los textos que no se
+              pudieron codificar no aparecen en el diccionario.
+    """
+    batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
+    unique_texts = list(dict.fromkeys(t for t in texts if t is not None))
+    store = get_embedding_store()
+
+    embeddings = {}
+    if store:
+        try:
+            embeddings = store.get_many(model_fingerprint(), unique_texts)
+        except Exception as store_error:
+            print(f"Error al leer embeddings del almacén: {store_error}")
+    missing = [t for t in unique_texts if t not in embeddings]
+    computed = {}
+
+    pool = get_embedding_pool() if len(missing) >= Config.EMBEDDING_POOL_MIN_TEXTS else None
+    if pool:
+        try:
+            computed.update(zip(missing, pool.encode(missing)))
+            missing = []
+        except Exception as pool_error:
+            print(f"Error en el pool de procesos de embeddings, se codifica en el proceso actual: {pool_error}")
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        try:
+            computed.update(zip(batch, _encode_batch(batch, batch_size)))
+        except ModelNotReadyError:
+            raise
+        except Exception as batch_error:
+            print(f"Error al generar embeddings para un lote de {len(batch)} textos: {batch_error}")
+            for text in batch:
+                try:
+                    computed[text] = get_model().encode([text]).tolist()[0]
+                except Exception as embed_error:
+                    print(f"Error al generar embedding para el texto: {text}")
+                    print(f"Detalles del error: {embed_error}")
+
+    if store:
+        try:
+            store.put_many(model_fingerprint(), computed)
+        except Exception as store_error:
+            print(f"Error al guardar embeddings en el almacén: {store_error}")
+
+    embeddings.update(computed)
+    return embeddings
@@ -1,10 +1,215 @@
 # app/utils/model_loader.py
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+
+from app.config import Config
 
 _model_instance = None
+_model_lock = threading.Lock()
+_model_ready = threading.Event()
+_warmup_thread = None
+# Fallos de carga consecutivos y momento (time.monotonic) a partir del que se puede reintentar
+_load_failures = 0
+_retry_at = 0.0
+_model_state = {
+    "status": "not_loaded",
+    "model_name": Config.EMBEDDING_MODEL_NAME,
+    "backend": None,
+    "agreement": None,
+    "load_seconds": None,
+    "error": None,
+}
+
+
+# Hilos de torch del modelo de este proceso; los trabajadores del pool fijan su propio presupuesto
+_torch_threads = Config.EMBEDDING_TORCH_THREADS
+
+
+def set_torch_threads(threads):
+    """Fija los hilos de torch con los que se construirá el modelo de este proceso."""
+    global _torch_threads
+    _torch_threads = threads
+
+
+class ModelNotReadyError(RuntimeError):
+    """El modelo de embeddings no terminó de cargarse dentro del tiempo de espera."""
+
+
+# Textos representativos de la aplicación para comparar cada backend con el modelo de referencia
+_AGREEMENT_PROBES = [
+    "wireless headphones with noise cancelling",
+    "Color: Black",
+    "Item Weight: 1.2 pounds",
+    "Machine washable, soft and breathable cotton fabric",
+    "I bought these for my son and they stopped working after two weeks. The sound was great "
+    "while it lasted, but the battery would not hold a charge. Would not buy again.",
+]
+
+
+def _build_reference_model():
+    # Import diferido: sentence_transformers arrastra torch y tarda en importarse
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(Config.EMBEDDING_MODEL_NAME, trust_remote_code=True)
+
+
+def _build_backend_model(backend, reference):
+    """Construye el modelo para un backend de CPU alternativo ("onnx" o "int8")."""
+    if backend == "onnx":
+        # Requiere optimum[onnxruntime]; exporta el modelo a ONNX si no hay un fichero exportado
+        from sentence_transformers import SentenceTransformer
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if Config.EMBEDDING_ONNX_FILE:
+            model_kwargs["file_name"] = Config.EMBEDDING_ONNX_FILE
+        return SentenceTransformer(
+            Config.EMBEDDING_MODEL_NAME, trust_remote_code=True, backend="onnx", model_kwargs=model_kwargs
+        )
+    if backend == "int8":
+        import torch
+        return torch.quantization.quantize_dynamic(reference, {torch.nn.Linear}, dtype=torch.qint8)
+    raise ValueError(f"Backend de embeddings no soportado: {backend}")
+
+
+def _cosine_agreement(reference, candidate) -> float:
+    """Similitud coseno mínima entre los embeddings de ambos modelos sobre los textos de prueba."""
+    expected = reference.encode(_AGREEMENT_PROBES, normalize_embeddings=True)
+    actual = candidate.encode(_AGREEMENT_PROBES, normalize_embeddings=True)
+    return float((expected * actual).sum(axis=1).min())
+
+
+def _build_model():
+    """
+    Construye el modelo según `Config.EMBEDDING_BACKEND`.
+
+    Los backends alternativos se validan contra el modelo PyTorch de referencia;
+    si fallan o su acuerdo coseno queda por debajo de `EMBEDDING_MIN_AGREEMENT`
+    se usa el modelo de referencia.
+    """
+    if _torch_threads > 0:
+        import torch
+        torch.set_num_threads(_torch_threads)
+
+    backend = Config.EMBEDDING_BACKEND
+    if backend == "torch":
+        return _build_reference_model(), backend, None
+
+    reference = None
+    try:
+        if backend == "int8" or Config.EMBEDDING_AGREEMENT_CHECK:
+            reference = _build_reference_model()
+        candidate = _build_backend_model(backend, reference)
+        if reference is None:
+            return candidate, backend, None
 
-def get_model():
-    global _model_instance
-    if _model_instance is None:
-        _model_instance = SentenceTransformer("blevlabs/stella_en_v5", trust_remote_code=True)
+        agreement = round(_cosine_agreement(reference, candidate), 4)
+        if agreement >= Config.EMBEDDING_MIN_AGREEMENT:
+            print(f"Backend de embeddings '{backend}' validado (acuerdo coseno {agreement})")
+            return candidate, backend, agreement
+        print(f"Backend de embeddings '{backend}' descartado: acuerdo coseno {agreement} "
+              f"< {Config.EMBEDDING_MIN_AGREEMENT}")
+    except Exception as e:
+        agreement = None
+        print(f"Error construyendo el backend de embeddings '{backend}': {e}")
+
+    if reference is None:
+        reference = _build_reference_model()
+    return reference, "torch", agreement
+
+
+def _load_model():
+    global _model_instance, _load_failures, _retry_at
+    with _model_lock:
+        if _model_instance is not None:
+            return _model_instance
+
+        # Los hilos que esperen en get_model() esperan a este intento, no a uno anterior fallido
+        _model_ready.clear()
+        _model_state.update(status="loading", error=None)
+        start = time.perf_counter()
+        try:
+            _model_instance, backend, agreement = _build_model()
+            _load_failures = 0
+            _model_state.update(
+                status="ready",
+                backend=backend,
+                agreement=agreement,
+                load_seconds=round(time.perf_counter() - start, 3)
+            )
+        except Exception as e:
+            _load_failures += 1
+            backoff = min(Config.MODEL_RETRY_BACKOFF * 2 ** (_load_failures - 1), Config.MODEL_RETRY_BACKOFF_MAX)
+            _retry_at = time.monotonic() + backoff
+            _model_state.update(status="failed", load_seconds=round(time.perf_counter() - start, 3), error=str(e))
+            print(f"Error cargando el modelo de embeddings (reintento en {backoff:.0f}s): {e}")
+            raise
+        finally:
+            _model_ready.set()
+        return _model_instance
+
+
+def start_model_warmup():
+    """Inicia (una sola vez) la carga del modelo en un hilo en segundo plano."""
+    global _warmup_thread
+    with _model_lock:
+        if _model_instance is not None or _warmup_thread is not None:
+            return
+        _warmup_thread = threading.Thread(target=_warmup, name="embedding-model-warmup", daemon=True)
+        _warmup_thread.start()
+
+
+def _warmup():
+    try:
+        _load_model()
+    except Exception:
+        pass
+
+
+def get_model(timeout=None):
+    """
+    Devuelve el modelo de embeddings, cargándolo si todavía no lo está.
+
+    Si la carga ya está en curso en segundo plano, espera hasta `timeout`
+    segundos (por defecto `Config.MODEL_LOAD_TIMEOUT`).
+
+    Raises:
+        ModelNotReadyError: Si el modelo no está listo dentro del tiempo de espera
+                            o si su carga falló (se reintenta tras `MODEL_RETRY_BACKOFF`,
+                            duplicando la espera en cada fallo).
+    """
+    if _model_instance is not None:
+        return _model_instance
+
+    if _model_state["status"] == "failed":
+        # Reintento con espera exponencial: un fallo puntual no deja el modelo fuera hasta reiniciar
+        if time.monotonic() < _retry_at:
+            raise ModelNotReadyError(
+                f"La carga del modelo de embeddings falló; se reintentará en {_retry_at - time.monotonic():.0f}s"
+            )
+        try:
+            return _load_model()
+        except Exception as e:
+            raise ModelNotReadyError(f"La carga del modelo de embeddings falló: {e}")
+
+    if _warmup_thread is None:
+        return _load_model()
+
+    timeout = Config.MODEL_LOAD_TIMEOUT if timeout is None else timeout
+    if not _model_ready.wait(timeout) or _model_instance is None:
+        raise ModelNotReadyError(
+            f"El modelo de embeddings no está disponible (estado: {_model_state['status']})"
+        )
     return _model_instance
+
+
+def model_fingerprint() -> str:
+    """
+    Identificador del modelo y del backend (torch, onnx, int8) que generan los embeddings,
+    para que los vectores de backends distintos no compartan caché. Antes de cargar el
+    modelo se usa el backend configurado.
+    """
+    backend = _model_state["backend"] or Config.EMBEDDING_BACKEND
+    return f"{Config.EMBEDDING_MODEL_NAME}@{backend}"
+
+
+def get_model_status() -> dict:
+    """Estado de carga del modelo de embeddings para el health check."""
+    return dict(_model_state)
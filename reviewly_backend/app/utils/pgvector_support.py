@@ -0,0 +1,40 @@
+# app/utils/pgvector_support.py
+import threading
+
+from sqlalchemy import text
+
+from app import db
+
+_version = None
+_version_lock = threading.Lock()
+
+
+def pgvector_version() -> tuple:
+    """
+    Versión de la extensión `vector` instalada (p. ej. (0, 8, 0)), consultada una vez
+    por proceso. Devuelve una tupla vacía si la extensión no está instalada.
+    """
+    global _version
+    if _version is None:
+        with _version_lock:
+            if _version is None:
+                extversion = db.session.execute(
+                    text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                ).scalar()
+                _version = tuple(int(part) for part in extversion.split(".") if part.isdigit()) if extversion else ()
+    return _version
+
+
+def set_hnsw_iterative_scan(mode) -> bool:
+    """
+    Activa `hnsw.iterative_scan` en la transacción actual si `mode` no está vacío y
+    pgvector lo soporta (>= 0.8). En versiones anteriores el parámetro no existe y
+    `set_config` abortaría la transacción.
+
+    Returns:
+        bool: True si se activó el escaneo iterativo.
+    """
+    if not mode or pgvector_version() < (0, 8):
+        return False
+    db.session.execute(text("SELECT set_config('hnsw.iterative_scan', :mode, true)"), {'mode': mode})
+    return True
@@ -0,0 +1,78 @@
+# app/utils/query_cache.py
+import re
+import threading
+
+from cachetools import TTLCache
+
+from app.config import Config
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza una consulta: minúsculas y espacios colapsados."""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+class QueryEmbeddingCache:
+    """
+    Caché LRU acotada y con caducidad de los embeddings de las consultas.
+
+    Las claves incluyen el nombre del modelo, de forma que un cambio de modelo
+    no devuelve embeddings generados por el anterior.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=3600):
+        self._cache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, model_name: str, text: str, compute) -> list:
+        """
+        Devuelve el embedding cacheado de `text` o lo calcula con `compute` sobre
+        la consulta normalizada, la misma que forma la clave.
+
+        Args:
+            model_name (str): Identificador del modelo y backend que generan el embedding (`model_fingerprint()`).
+            text (str): Texto de la consulta.
+            compute (callable): Función que genera el embedding si no está en caché.
+
+        Returns:
+            list: Embedding de la consulta.
+        """
+        normalized = normalize_query(text)
+        key = (model_name, normalized)
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self.hits += 1
+                return embedding
+            self.misses += 1
+
+        # Se codifica el texto normalizado: si no, el embedding de la primera variante
+        # ("Auriculares  BT") se serviría a todas las que comparten clave ("auriculares bt")
+        embedding = compute(normalized)
+        with self._lock:
+            self._cache[key] = embedding
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self._cache.maxsize,
+                "ttl_seconds": self._cache.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=Config.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=Config.QUERY_EMBEDDING_CACHE_TTL
+)
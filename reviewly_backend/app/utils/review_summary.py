@@ -0,0 +1,115 @@
+# app/utils/review_summary.py
+import re
+
+import numpy as np
+
+from app.utils.embeddings import truncate_embedding
+
+_HTML_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Reseñas más cercanas al centroide de las que se toman frases candidatas
+_REVIEWS_PER_CLUSTER = 3
+# Similitud a partir de la cual una frase se considera repetida respecto a otra ya elegida
+_DUPLICATE_SIMILARITY = 0.9
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def split_sentences(text, min_chars=20, max_chars=300) -> list:
+    """Divide el texto de una reseña en frases, descartando las demasiado cortas o largas."""
+    text = _HTML_BREAK.sub(" ", text or "")
+    sentences = (re.sub(r"\s+", " ", s).strip() for s in _SENTENCE_END.split(text))
+    return [s for s in sentences if min_chars <= len(s) <= max_chars]
+
+
+def spherical_kmeans(matrix, k, iterations=25, seed=0):
+    """
+    k-means por similitud coseno sobre filas normalizadas, con inicialización k-means++.
+
+    Returns:
+        tuple: (centroides normalizados, etiqueta de cluster de cada fila).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = matrix[[rng.integers(len(matrix))]]
+    while len(centroids) < k:
+        distances = np.clip(1.0 - (matrix @ centroids.T).max(axis=1), 0.0, None)
+        if distances.sum() <= 0:
+            break
+        next_row = rng.choice(len(matrix), p=distances / distances.sum())
+        centroids = np.vstack([centroids, matrix[next_row]])
+
+    for _ in range(iterations):
+        labels = (matrix @ centroids.T).argmax(axis=1)
+        updated = _normalize_rows(np.array([
+            matrix[labels == c].mean(axis=0) if np.any(labels == c) else centroids[c]
+            for c in range(len(centroids))
+        ]))
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids, (matrix @ centroids.T).argmax(axis=1)
+
+
+def extractive_summary(texts, embeddings, encode, max_sentences=5, max_chars=1000):
+    """
+    Resumen extractivo de las reseñas de un producto.
+
+    Agrupa los embeddings de las reseñas en hasta `max_sentences` clusters (las
+    opiniones recurrentes) y, de las reseñas más céntricas de cada cluster, elige
+    la frase más parecida al centroide. Las frases se ordenan por tamaño del
+    cluster, de modo que las opiniones más comunes aparecen primero.
+
+    Args:
+        texts (list[str]): Textos de las reseñas.
+        embeddings (list[list[float]]): Embedding de cada reseña (misma dimensión para todas).
+        encode (callable): Recibe una lista de frases y devuelve un diccionario frase -> embedding,
+                           como `encode_texts`. Se llama una sola vez.
+        max_sentences (int): Número máximo de frases (y de clusters).
+        max_chars (int): Longitud máxima del resumen.
+
+    Returns:
+        str: Resumen, o `None` si no hay frases utilizables.
+    """
+    matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    k = max(1, min(max_sentences, len(texts), int(round((len(texts) / 2) ** 0.5))))
+    centroids, labels = spherical_kmeans(matrix, k)
+
+    clusters = []
+    for c in np.argsort(-np.bincount(labels, minlength=len(centroids))):
+        members = np.flatnonzero(labels == c)
+        if not len(members):
+            continue
+        central = members[np.argsort(-(matrix[members] @ centroids[c]))][:_REVIEWS_PER_CLUSTER]
+        candidates = list(dict.fromkeys(s for i in central for s in split_sentences(texts[i])))
+        if candidates:
+            clusters.append((centroids[c], candidates))
+    if not clusters:
+        return None
+
+    encoded = encode([s for _, candidates in clusters for s in candidates])
+    dim = matrix.shape[1]
+
+    chosen, chosen_vectors, length = [], [], 0
+    for centroid, candidates in clusters:
+        candidates = [s for s in candidates if encoded.get(s) is not None]
+        if not candidates:
+            continue
+        vectors = _normalize_rows(np.array(
+            [truncate_embedding(encoded[s], dim) for s in candidates], dtype=np.float32
+        ))
+        for position in np.argsort(-(vectors @ centroid)):
+            sentence, vector = candidates[position], vectors[position]
+            if any(float(vector @ other) >= _DUPLICATE_SIMILARITY for other in chosen_vectors):
+                continue
+            if length + len(sentence) + 1 > max_chars:
+                continue
+            chosen.append(sentence)
+            chosen_vectors.append(vector)
+            length += len(sentence) + 1
+            break
+
+    return " ".join(chosen) if chosen else None
@@ -0,0 +1,261 @@
+# app/utils/search_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+from app.config import Config
+from app.utils.query_cache import normalize_query
+
+# Generación que cambia con cualquier invalidación; la usan las búsquedas sin filtro de categoría
+_ANY_CATEGORY = "*"
+
+
+class InProcessBackend:
+    """
+    Backend en memoria del proceso, LRU acotado por tamaño aproximado en bytes.
+
+    Las generaciones también son por proceso: una escritura de productos solo
+    invalida la caché del trabajador que la atendió. Por eso las entradas caducan
+    a los `ttl_seconds`, que acotan cuánto tiempo pueden servir resultados
+    obsoletos los demás trabajadores (el backend "sqlite" comparte las generaciones).
+    """
+
+    def __init__(self, max_bytes, ttl_seconds=60):
+        self._entries = TTLCache(maxsize=max_bytes, ttl=ttl_seconds, getsizeof=len)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            if len(value) <= self._entries.maxsize:
+                self._entries[key] = value
+
+    def generation(self, name) -> int:
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def bump_generation(self, name):
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def size(self) -> int:
+        with self._lock:
+            return self._entries.currsize
+
+
+class SQLiteBackend:
+    """
+    Backend compartido entre procesos en un fichero SQLite local.
+
+    Las entradas menos usadas recientemente se eliminan cuando el tamaño total
+    supera `max_bytes`.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_search_cache_last_access ON search_cache (last_access)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache_generations (
+                name TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        return row[0]
+
+    def set(self, key, value):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO search_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, len(value), time.time())
+        )
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        if total > self.max_bytes:
+            self._evict(conn, total - self.max_bytes)
+        conn.commit()
+
+    @staticmethod
+    def _evict(conn, bytes_to_free):
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM search_cache ORDER BY last_access"):
+            keys.append((key,))
+            freed += size
+            if freed >= bytes_to_free:
+                break
+        conn.executemany("DELETE FROM search_cache WHERE key = ?", keys)
+
+    def generation(self, name) -> int:
+        row = self._connection().execute(
+            "SELECT generation FROM search_cache_generations WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_generation(self, name):
+        conn = self._connection()
+        conn.execute("""
+            INSERT INTO search_cache_generations (name, generation) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET generation = generation + 1
+        """, (name,))
+        conn.commit()
+
+    def size(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+
+
+class SearchResultCache:
+    """
+    Caché de resultados de `searchProduct`: guarda los ids de producto ordenados, sus
+    puntuaciones y su posición en cada búsqueda del ranking, y las facetas de los
+    candidatos si la búsqueda las pidió.
+
+    Las entradas se invalidan por categoría mediante contadores de generación:
+    cada entrada recuerda la generación de su filtro de categoría al guardarse y
+    deja de ser válida cuando un producto de esa categoría se crea, modifica o elimina.
+    Las búsquedas sin filtro de categoría dependen de la generación global.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query, top_n, category=None, min_price=None, max_price=None, mode=None, options=None) -> str:
+        return json.dumps([normalize_query(query), top_n, category, min_price, max_price, mode, options],
+                          sort_keys=True)
+
+    @staticmethod
+    def _generation_name(category):
+        return f"category:{category}" if category else _ANY_CATEGORY
+
+    def get(self, key, category=None):
+        """
+        Devuelve la lista de resultados (product_id, puntuaciones y posiciones) cacheada o `None`.
+        """
+        entry = self.get_entry(key, category)
+        return entry["results"] if entry else None
+
+    def get_entry(self, key, category=None):
+        """
+        Devuelve la entrada cacheada (`results` y `facets`, `None` si se guardó sin
+        facetas) o `None`.
+        """
+        try:
+            raw = self.backend.get(key)
+            entry = json.loads(raw) if raw else None
+            if entry and entry["generation"] != self.backend.generation(self._generation_name(category)):
+                entry = None
+        except Exception as e:
+            print(f"Error leyendo la caché de búsquedas: {e}")
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"results": entry["results"], "facets": entry.get("facets")}
+
+    def generation(self, category=None):
+        """
+        Generación actual del filtro de categoría. Debe leerse antes de calcular
+        los resultados para que una invalidación concurrente no quede oculta.
+        """
+        try:
+            return self.backend.generation(self._generation_name(category))
+        except Exception as e:
+            print(f"Error leyendo la caché de búsquedas: {e}")
+            return None
+
+    def set(self, key, results, generation, facets=None):
+        if generation is None:
+            return
+        try:
+            self.backend.set(key, json.dumps({"generation": generation, "results": results, "facets": facets}))
+        except Exception as e:
+            print(f"Error guardando en la caché de búsquedas: {e}")
+
+    def invalidate_categories(self, *categories):
+        """Invalida las búsquedas filtradas por alguna de las categorías y todas las búsquedas sin filtro."""
+        try:
+            for category in {c for c in categories if c}:
+                self.backend.bump_generation(self._generation_name(category))
+            self.backend.bump_generation(_ANY_CATEGORY)
+        except Exception as e:
+            print(f"Error invalidando la caché de búsquedas: {e}")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "backend": type(self.backend).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+        try:
+            stats["size_bytes"] = self.backend.size()
+        except Exception:
+            stats["size_bytes"] = None
+        return stats
+
+
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Devuelve la caché de búsquedas configurada o `None` si está desactivada."""
+    global _cache_instance
+    if Config.SEARCH_CACHE_BACKEND == "none":
+        return None
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                if Config.SEARCH_CACHE_BACKEND == "sqlite":
+                    backend = SQLiteBackend(Config.SEARCH_CACHE_PATH, Config.SEARCH_CACHE_MAX_BYTES)
+                else:
+                    backend = InProcessBackend(Config.SEARCH_CACHE_MAX_BYTES, Config.SEARCH_CACHE_TTL)
+                _cache_instance = SearchResultCache(backend)
+    return _cache_instance
@@ -0,0 +1,198 @@
+# app/utils/search_cursor.py
+import base64
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+from app.config import Config
+
+
+class InvalidCursorError(ValueError):
+    """El cursor no es válido o su instantánea ya caducó."""
+
+
+class InProcessSnapshotBackend:
+    """Instantáneas en memoria del proceso con caducidad."""
+
+    def __init__(self, max_size, ttl_seconds):
+        self._snapshots = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(self, snapshot_id):
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    def set(self, snapshot_id, value):
+        with self._lock:
+            self._snapshots[snapshot_id] = value
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._snapshots)
+
+
+class SQLiteSnapshotBackend:
+    """Instantáneas compartidas entre procesos en un fichero SQLite local con caducidad."""
+
+    def __init__(self, path, ttl_seconds):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_snapshots (
+                snapshot_id TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_search_snapshots_expires_at ON search_snapshots (expires_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, snapshot_id):
+        row = self._connection().execute(
+            "SELECT value FROM search_snapshots WHERE snapshot_id = ? AND expires_at > ?",
+            (snapshot_id, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, snapshot_id, value):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("DELETE FROM search_snapshots WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "INSERT OR REPLACE INTO search_snapshots (snapshot_id, value, expires_at) VALUES (?, ?, ?)",
+            (snapshot_id, value, now + self.ttl_seconds)
+        )
+        conn.commit()
+
+    def size(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM search_snapshots WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+
+class SearchCursorStore:
+    """
+    Instantáneas de búsqueda para la paginación por cursor de `searchProduct`.
+
+    Una instantánea guarda el conjunto de candidatos de una búsqueda ya ordenado
+    (product_id, puntuaciones y posiciones). El cursor es un token opaco con el
+    identificador de la instantánea y la posición de la siguiente página, así que
+    las páginas siguientes se sirven sin volver a codificar ni puntuar la consulta.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.created = 0
+        self.pages_served = 0
+        self.expired = 0
+
+    @staticmethod
+    def _encode_cursor(snapshot_id, offset) -> str:
+        raw = json.dumps({"s": snapshot_id, "o": offset}).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            data = json.loads(raw)
+            snapshot_id, offset = str(data["s"]), int(data["o"])
+        except Exception:
+            raise InvalidCursorError("Cursor de búsqueda no válido")
+        if offset < 0:
+            raise InvalidCursorError("Cursor de búsqueda no válido")
+        return snapshot_id, offset
+
+    def create(self, query, results, offset):
+        """
+        Guarda una instantánea y devuelve el cursor de la página que empieza en `offset`,
+        o `None` si no quedan más resultados.
+        """
+        if offset >= len(results):
+            return None
+        snapshot_id = secrets.token_urlsafe(16)
+        try:
+            self.backend.set(snapshot_id, json.dumps({"query": query, "results": results}))
+        except Exception as e:
+            print(f"Error guardando la instantánea de búsqueda: {e}")
+            return None
+        with self._lock:
+            self.created += 1
+        return self._encode_cursor(snapshot_id, offset)
+
+    def page(self, cursor, page_size):
+        """
+        Devuelve la página del cursor.
+
+        Returns:
+            tuple: (consulta original, resultados de la página, cursor siguiente o `None`).
+
+        Raises:
+            InvalidCursorError: Si el cursor no es válido o la instantánea caducó.
+        """
+        snapshot_id, offset = self._decode_cursor(cursor)
+        raw = self.backend.get(snapshot_id)
+        if raw is None:
+            with self._lock:
+                self.expired += 1
+            raise InvalidCursorError("El cursor de búsqueda ha caducado; repite la búsqueda")
+
+        snapshot = json.loads(raw)
+        results = snapshot["results"]
+        end = offset + page_size
+        next_cursor = self._encode_cursor(snapshot_id, end) if end < len(results) else None
+        with self._lock:
+            self.pages_served += 1
+        return snapshot["query"], results[offset:end], next_cursor
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = {
+                "backend": type(self.backend).__name__,
+                "created": self.created,
+                "pages_served": self.pages_served,
+                "expired": self.expired,
+            }
+        try:
+            stats["snapshots"] = self.backend.size()
+        except Exception:
+            stats["snapshots"] = None
+        return stats
+
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_cursor_store():
+    """Devuelve el almacén de instantáneas de búsqueda configurado."""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                if Config.SEARCH_CURSOR_BACKEND == "sqlite":
+                    backend = SQLiteSnapshotBackend(Config.SEARCH_CURSOR_PATH, Config.SEARCH_CURSOR_TTL)
+                else:
+                    backend = InProcessSnapshotBackend(Config.SEARCH_CURSOR_MAX_SNAPSHOTS, Config.SEARCH_CURSOR_TTL)
+                _store_instance = SearchCursorStore(backend)
+    return _store_instance
@@ -0,0 +1,86 @@
+# app/utils/search_profiler.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from app.config import Config
+
+
+class SearchProfile:
+    """
+    Tiempos por etapa de una búsqueda (codificación, ranking, SQL, hidratación...).
+
+    Con `explain=True` la búsqueda se ejecuta sin caché ni cursor y guarda además
+    los planes `EXPLAIN (ANALYZE, BUFFERS)` de las consultas de ranking.
+    """
+
+    def __init__(self, explain=False):
+        self.explain = explain
+        self.stages = {}
+        self.plans = []
+        self.candidate_counts = {}
+        self._untimed = 0.0
+
+    @contextmanager
+    def stage(self, name):
+        """Mide una etapa; el tiempo pasado en bloques `untimed` dentro de ella no cuenta."""
+        untimed_before = self._untimed
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start - (self._untimed - untimed_before)
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed * 1000
+
+    @contextmanager
+    def untimed(self):
+        """Trabajo de diagnóstico (p. ej. EXPLAIN ANALYZE) excluido de las etapas que lo contienen."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._untimed += time.perf_counter() - start
+
+    def stages_ms(self) -> dict:
+        return {name: round(ms, 3) for name, ms in self.stages.items()}
+
+
+def percentile(values, pct):
+    """Percentil `pct` (0-100) de `values` por el método del rango más cercano."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class SearchStageMetrics:
+    """Agregado de los tiempos por etapa de las búsquedas recientes (ventana deslizante)."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._durations = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, profile):
+        with self._lock:
+            for name, ms in profile.stages.items():
+                self._durations.setdefault(name, deque(maxlen=self.window)).append(ms)
+                self._counts[name] = self._counts.get(name, 0) + 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            snapshot = {name: list(values) for name, values in self._durations.items()}
+            counts = dict(self._counts)
+        return {
+            name: {
+                "count": counts[name],
+                "avg_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+            }
+            for name, values in snapshot.items() if values
+        }
+
+
+search_stage_metrics = SearchStageMetrics(window=Config.SEARCH_METRICS_WINDOW)
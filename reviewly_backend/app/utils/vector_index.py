@@ -0,0 +1,499 @@
+# app/utils/vector_index.py
+import fcntl
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from app import db
+from app.config import Config
+
+# Tipos de fila del índice: embedding del producto, de una feature o de un detalle
+KINDS = ("product", "feature", "detail")
+
+_ROW_DTYPE = np.dtype([("product_id", "<i8"), ("kind", "i1"), ("version", "<i4")])
+_MANIFEST = "manifest.json"
+_LOCK_FILE = "index.lock"
+# Filas por bloque al calcular similitudes, para no copiar la matriz completa en memoria
+_CHUNK_ROWS = 65536
+# Lecturas del manifiesto al abrir el índice si sus ficheros desaparecen por una actualización
+_LOAD_ATTEMPTS = 3
+
+_EXPORT_SQL = """
+    SELECT p.product_id, 0 AS kind, CAST(p.product_embedding AS text) AS embedding
+    FROM products p
+    WHERE p.product_id = ANY(:product_ids) AND p.product_embedding IS NOT NULL
+    UNION ALL
+    SELECT pf.product_id, 1 AS kind, CAST(pf.embedding AS text) AS embedding
+    FROM product_features pf
+    WHERE pf.product_id = ANY(:product_ids) AND pf.embedding IS NOT NULL
+    UNION ALL
+    SELECT pd.product_id, 2 AS kind, CAST(pd.detail_embedding AS text) AS embedding
+    FROM product_details pd
+    WHERE pd.product_id = ANY(:product_ids) AND pd.detail_embedding IS NOT NULL
+"""
+
+
+class VectorIndexUnavailableError(RuntimeError):
+    """El índice en memoria no existe todavía o no se pudo leer."""
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class MemoryMappedVectorIndex:
+    """
+    Índice vectorial en proceso sobre ficheros mapeados en memoria.
+
+    Los embeddings de productos, features y detalles se exportan desde Postgres a
+    una matriz contigua (float32 o float16) en disco. Cada proceso de la aplicación
+    la mapea en modo lectura, de forma que todos comparten las mismas páginas, y
+    responde el top-k con productos escalares de NumPy sobre vectores normalizados.
+
+    Ficheros del directorio:
+        - `manifest.json`: dimensión, tipo, número de filas y nombres de los ficheros.
+        - `vectors-<gen>.bin`: matriz de embeddings (solo se añaden filas).
+        - `rows-<gen>.bin`: product_id, tipo y versión de cada fila.
+        - `products-<gen>-<seq>.npz`: product_id, categoría, precio, versión y estado
+          de cada producto; de aquí salen las máscaras de categoría y precio.
+
+    Los productos nuevos o modificados se añaden al final con una versión nueva; las
+    filas de versiones anteriores y de productos eliminados quedan obsoletas hasta
+    la siguiente reconstrucción (`rebuild`), que compacta los ficheros.
+    """
+
+    def __init__(self, directory, dtype="float32"):
+        self.directory = directory
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._state = None
+        self._state_mtime = None
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    # ------------------------------------------------------------------ lectura
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path(_MANIFEST), encoding="utf-8") as infile:
+                return json.load(infile)
+        except FileNotFoundError:
+            return None
+
+    def _open_state(self, manifest):
+        count = manifest["rows"]
+        dim = manifest["dim"]
+        dtype = np.dtype(manifest["dtype"])
+        if count:
+            vectors = np.memmap(self._path(manifest["vectors_file"]), dtype=dtype, mode="r", shape=(count, dim))
+            rows = np.memmap(self._path(manifest["rows_file"]), dtype=_ROW_DTYPE, mode="r", shape=(count,))
+        else:
+            vectors = np.empty((0, dim), dtype=dtype)
+            rows = np.empty(0, dtype=_ROW_DTYPE)
+
+        with np.load(self._path(manifest["products_file"])) as data:
+            products = {key: data[key] for key in data.files}
+
+        # Posición de cada fila en los arrays de productos y si pertenece a su versión vigente
+        row_ids = np.asarray(rows["product_id"])
+        positions = np.searchsorted(products["product_id"], row_ids)
+        positions = np.minimum(positions, max(len(products["product_id"]) - 1, 0))
+        if len(products["product_id"]):
+            current = (
+                (products["product_id"][positions] == row_ids)
+                & (products["version"][positions] == rows["version"])
+            )
+        else:
+            current = np.zeros(count, dtype=bool)
+
+        return {
+            "manifest": manifest,
+            "vectors": vectors,
+            "row_ids": row_ids,
+            "kinds": np.asarray(rows["kind"]),
+            "positions": positions,
+            "current": current,
+            "products": products,
+        }
+
+    def _load(self):
+        """Devuelve el estado mapeado, recargándolo si otro proceso cambió el manifiesto."""
+        with self._lock:
+            # Un escritor puede publicar un manifiesto nuevo y borrar los ficheros del
+            # anterior entre la lectura del manifiesto y la apertura de sus ficheros:
+            # en ese caso se vuelve a leer el manifiesto, que ya apunta a los nuevos
+            for attempt in range(_LOAD_ATTEMPTS):
+                try:
+                    mtime = os.stat(self._path(_MANIFEST)).st_mtime_ns
+                except FileNotFoundError:
+                    return None
+                if self._state is not None and mtime == self._state_mtime:
+                    return self._state
+
+                manifest = self._read_manifest()
+                if manifest is None:
+                    return None
+                try:
+                    self._state = self._open_state(manifest)
+                except FileNotFoundError:
+                    continue
+                self._state_mtime = mtime
+                return self._state
+
+            # Escritores más rápidos que los reintentos: se sigue con el estado ya mapeado
+            if self._state is not None:
+                return self._state
+            raise VectorIndexUnavailableError(f"No se pudo abrir el índice vectorial en {self.directory}")
+
+    def available(self) -> bool:
+        try:
+            return self._load() is not None
+        except VectorIndexUnavailableError:
+            return False
+
+    def search(self, query_embedding, top_n=5, category=None, min_price=None, max_price=None, candidates=None) -> list:
+        """
+        Top-k de productos por similitud coseno con la consulta.
+
+        Como el modo "semantic", toma los `candidates` mejores vectores de cada tipo
+        (producto, feature y detalle) entre los productos que cumplen los filtros,
+        puntúa cada producto con su mejor similitud por tipo y ordena por la mayor.
+
+        Args:
+            query_embedding (list): Embedding de la consulta.
+            top_n (int): Número de productos a devolver.
+            category (str, optional): Filtro por categoría principal.
+            min_price (float, optional): Precio mínimo.
+            max_price (float, optional): Precio máximo.
+            candidates (int, optional): Vectores por tipo. Por defecto `Config.SEARCH_ANN_CANDIDATES`.
+
+        Returns:
+            list: Diccionarios con `product_id` y las puntuaciones `<tipo>_score` y `total_score`.
+
+        Raises:
+            VectorIndexUnavailableError: Si el índice no se ha construido.
+        """
+        start = time.perf_counter()
+        state = self._load()
+        if state is None:
+            raise VectorIndexUnavailableError(f"No hay índice vectorial en {self.directory}")
+        candidates = candidates or Config.SEARCH_ANN_CANDIDATES
+
+        products = state["products"]
+        product_mask = products["alive"].copy()
+        if category:
+            product_mask &= products["category"] == category
+        if min_price is not None:
+            product_mask &= products["price"] >= min_price
+        if max_price is not None:
+            product_mask &= products["price"] <= max_price
+
+        row_mask = state["current"] & product_mask[state["positions"]] if len(product_mask) else state["current"]
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        vectors = state["vectors"]
+        scores = np.full(len(vectors), -np.inf, dtype=np.float32)
+        for chunk_start in range(0, len(vectors), _CHUNK_ROWS):
+            selected = np.flatnonzero(row_mask[chunk_start:chunk_start + _CHUNK_ROWS])
+            if selected.size:
+                block = vectors[chunk_start + selected].astype(np.float32, copy=False)
+                scores[chunk_start + selected] = block @ query
+
+        best = {}
+        for kind_index, _ in enumerate(KINDS):
+            rows = np.flatnonzero(row_mask & (state["kinds"] == kind_index))
+            if not rows.size:
+                continue
+            if rows.size > candidates:
+                rows = rows[np.argpartition(-scores[rows], candidates - 1)[:candidates]]
+            for product_id, score in zip(state["row_ids"][rows].tolist(), scores[rows].tolist()):
+                entry = best.setdefault(product_id, [0.0] * len(KINDS))
+                entry[kind_index] = max(entry[kind_index], score)
+
+        ranked = sorted(best.items(), key=lambda item: (-max(item[1]), item[0]))[:top_n]
+        results = []
+        for product_id, kind_scores in ranked:
+            result = {"product_id": product_id}
+            result.update({f"{kind}_score": score for kind, score in zip(KINDS, kind_scores)})
+            result["total_score"] = max(kind_scores)
+            results.append(result)
+
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += time.perf_counter() - start
+        return results
+
+    def metrics(self) -> dict:
+        try:
+            state = self._load()
+        except VectorIndexUnavailableError:
+            state = None
+        with self._lock:
+            stats = {
+                "available": state is not None,
+                "searches": self.searches,
+                "avg_search_ms": round(self.search_seconds / self.searches * 1000, 3) if self.searches else None,
+            }
+        if state is not None:
+            total_rows = len(state["row_ids"])
+            stale_rows = int(total_rows - state["current"].sum())
+            stats.update(
+                generation=state["manifest"]["generation"],
+                dtype=state["manifest"]["dtype"],
+                rows=total_rows,
+                stale_rows=stale_rows,
+                stale_ratio=round(stale_rows / total_rows, 4) if total_rows else 0.0,
+                products=int(state["products"]["alive"].sum()),
+                built_at=state["manifest"]["built_at"],
+            )
+        return stats
+
+    # ---------------------------------------------------------------- escritura
+
+    def _acquire_write_lock(self, timeout=None):
+        """Cerrojo entre procesos para las escrituras; devuelve el fichero o `None` si no se obtuvo."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(self._path(_LOCK_FILE), "w")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    lock_file.close()
+                    return None
+                time.sleep(0.05)
+
+    @staticmethod
+    def _release_write_lock(lock_file):
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+    def _write_manifest(self, manifest):
+        manifest["built_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        tmp_path = self._path(_MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as outfile:
+            json.dump(manifest, outfile)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(tmp_path, self._path(_MANIFEST))
+
+    def _write_products(self, manifest, products):
+        manifest["products_seq"] = manifest.get("products_seq", 0) + 1
+        name = f"products-{manifest['generation']}-{manifest['products_seq']}.npz"
+        order = np.argsort(products["product_id"], kind="stable")
+        np.savez(self._path(name), **{key: values[order] for key, values in products.items()})
+        manifest["products_file"] = name
+
+    @staticmethod
+    def _fetch_products(product_ids):
+        rows = db.session.execute(
+            text("SELECT product_id, main_category, price FROM products WHERE product_id = ANY(:product_ids)"),
+            {"product_ids": list(product_ids)}
+        ).fetchall()
+        return {row.product_id: (row.main_category or "", row.price) for row in rows}
+
+    @staticmethod
+    def _export_rows(product_ids, versions, dtype):
+        """Lee de Postgres los embeddings de `product_ids` y los devuelve normalizados."""
+        rows = db.session.execute(text(_EXPORT_SQL), {"product_ids": list(product_ids)}).fetchall()
+        if not rows:
+            return None, np.empty(0, dtype=_ROW_DTYPE)
+
+        matrix = _normalize_rows(np.array([json.loads(row.embedding) for row in rows], dtype=np.float32))
+        meta = np.empty(len(rows), dtype=_ROW_DTYPE)
+        meta["product_id"] = [row.product_id for row in rows]
+        meta["kind"] = [row.kind for row in rows]
+        meta["version"] = [versions[row.product_id] for row in rows]
+        return matrix.astype(dtype), meta
+
+    def _append_rows(self, manifest, matrix, meta):
+        """Añade filas tras las `manifest["rows"]` válidas (descarta restos de escrituras interrumpidas)."""
+        if matrix is None or not len(meta):
+            return
+        if not manifest["dim"]:
+            manifest["dim"] = matrix.shape[1]
+        elif matrix.shape[1] != manifest["dim"]:
+            raise ValueError(f"Dimensión {matrix.shape[1]} distinta de la del índice ({manifest['dim']})")
+
+        for name, data, row_bytes in (
+            (manifest["vectors_file"], matrix, manifest["dim"] * matrix.dtype.itemsize),
+            (manifest["rows_file"], meta, _ROW_DTYPE.itemsize),
+        ):
+            path = self._path(name)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as outfile:
+                outfile.truncate(manifest["rows"] * row_bytes)
+                outfile.seek(0, os.SEEK_END)
+                outfile.write(np.ascontiguousarray(data).tobytes())
+                outfile.flush()
+                os.fsync(outfile.fileno())
+        manifest["rows"] += len(meta)
+
+    @staticmethod
+    def _empty_products():
+        return {
+            "product_id": np.empty(0, dtype=np.int64),
+            "category": np.empty(0, dtype=str),
+            "price": np.empty(0, dtype=np.float64),
+            "version": np.empty(0, dtype=np.int32),
+            "alive": np.empty(0, dtype=bool),
+        }
+
+    def _new_manifest(self, generation):
+        return {
+            "generation": generation,
+            "dim": 0,
+            "dtype": self.dtype.name,
+            "rows": 0,
+            "vectors_file": f"vectors-{generation}.bin",
+            "rows_file": f"rows-{generation}.bin",
+        }
+
+    @staticmethod
+    def _merge_products(products, updates):
+        """Aplica {product_id: (categoría, precio, versión, vivo)} sobre los arrays de productos."""
+        by_id = {
+            product_id: (category, price, version, alive)
+            for product_id, category, price, version, alive in zip(
+                products["product_id"].tolist(), products["category"].tolist(),
+                products["price"].tolist(), products["version"].tolist(), products["alive"].tolist()
+            )
+        }
+        by_id.update(updates)
+        ids = list(by_id)
+        return {
+            "product_id": np.array(ids, dtype=np.int64),
+            "category": np.array([by_id[i][0] for i in ids], dtype=str),
+            "price": np.array([np.nan if by_id[i][1] is None else by_id[i][1] for i in ids], dtype=np.float64),
+            "version": np.array([by_id[i][2] for i in ids], dtype=np.int32),
+            "alive": np.array([by_id[i][3] for i in ids], dtype=bool),
+        }
+
+    def _current_versions(self, products, product_ids):
+        positions = {pid: i for i, pid in enumerate(products["product_id"].tolist())}
+        return {
+            pid: int(products["version"][positions[pid]]) + 1 if pid in positions else 0
+            for pid in product_ids
+        }
+
+    def rebuild(self, batch_size=500, dtype=None):
+        """
+        Reconstruye (y compacta) el índice completo a partir de Postgres en una
+        generación nueva. Los lectores siguen usando la anterior hasta que se
+        publica el manifiesto nuevo.
+        """
+        if dtype:
+            self.dtype = np.dtype(dtype)
+        lock_file = self._acquire_write_lock()
+        try:
+            previous = self._read_manifest()
+            manifest = self._new_manifest(previous["generation"] + 1 if previous else 1)
+            for name in (manifest["vectors_file"], manifest["rows_file"]):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+
+            updates = {}
+            last_id = 0
+            while True:
+                product_ids = [
+                    row.product_id for row in db.session.execute(
+                        text("SELECT product_id FROM products WHERE product_id > :last_id "
+                             "ORDER BY product_id LIMIT :limit"),
+                        {"last_id": last_id, "limit": batch_size}
+                    )
+                ]
+                if not product_ids:
+                    break
+                metadata = self._fetch_products(product_ids)
+                matrix, meta = self._export_rows(product_ids, dict.fromkeys(product_ids, 0), self.dtype)
+                self._append_rows(manifest, matrix, meta)
+                updates.update({pid: (category, price, 0, True) for pid, (category, price) in metadata.items()})
+                last_id = product_ids[-1]
+                print(f"Índice vectorial: {len(updates)} productos, {manifest['rows']} vectores")
+
+            self._write_products(manifest, self._merge_products(self._empty_products(), updates))
+            self._write_manifest(manifest)
+            self._remove_unused_files(manifest)
+            return manifest
+        finally:
+            self._release_write_lock(lock_file)
+
+    def _update(self, product_ids, removed_ids=(), lock_timeout=None) -> bool:
+        lock_file = self._acquire_write_lock(lock_timeout)
+        if lock_file is None:
+            return False
+        try:
+            manifest = self._read_manifest()
+            if manifest is None:
+                return False
+            previous_products_file = manifest["products_file"]
+            with np.load(self._path(previous_products_file)) as data:
+                products = {key: data[key] for key in data.files}
+
+            updates = {}
+            removed = set(removed_ids) | (set(product_ids) - set(self._fetch_products(product_ids)))
+            if removed:
+                versions = self._current_versions(products, removed)
+                updates.update({pid: ("", None, versions[pid], False) for pid in removed})
+
+            live_ids = [pid for pid in product_ids if pid not in removed]
+            if live_ids:
+                versions = self._current_versions(products, live_ids)
+                metadata = self._fetch_products(live_ids)
+                matrix, meta = self._export_rows(live_ids, versions, manifest["dtype"])
+                self._append_rows(manifest, matrix, meta)
+                updates.update({
+                    pid: (category, price, versions[pid], True) for pid, (category, price) in metadata.items()
+                })
+
+            self._write_products(manifest, self._merge_products(products, updates))
+            self._write_manifest(manifest)
+            os.remove(self._path(previous_products_file))
+            return True
+        finally:
+            self._release_write_lock(lock_file)
+
+    def append_products(self, product_ids, lock_timeout=None) -> bool:
+        """
+        Añade (o sustituye por una versión nueva) los vectores de los productos indicados.
+
+        Returns:
+            bool: False si el índice no existe o no se obtuvo el cerrojo a tiempo.
+        """
+        return self._update(list(product_ids), lock_timeout=lock_timeout)
+
+    def remove_products(self, product_ids, lock_timeout=None) -> bool:
+        """Marca los productos como eliminados; sus filas se descartan en la siguiente reconstrucción."""
+        return self._update([], removed_ids=list(product_ids), lock_timeout=lock_timeout)
+
+    def _remove_unused_files(self, manifest):
+        # Los procesos que aún mapean los ficheros antiguos conservan sus páginas hasta recargar
+        keep = {_MANIFEST, _LOCK_FILE, manifest["vectors_file"], manifest["rows_file"], manifest["products_file"]}
+        for name in os.listdir(self.directory):
+            if name not in keep:
+                os.remove(self._path(name))
+
+
+_index_instance = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index():
+    """Devuelve el índice vectorial en proceso del directorio configurado."""
+    global _index_instance
+    if _index_instance is None:
+        with _index_lock:
+            if _index_instance is None:
+                _index_instance = MemoryMappedVectorIndex(Config.VECTOR_INDEX_DIR, Config.VECTOR_INDEX_DTYPE)
+    return _index_instance
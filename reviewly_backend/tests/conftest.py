@@ -0,0 +1,5 @@
+import os
+
+# La aplicación exige DATABASE_URL al importarse; los tests sustituyen las consultas
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("MODEL_WARMUP", "false")
@@ -0,0 +1,42 @@
+import pytest
+
+from app.utils import model_loader
+
+
+@pytest.fixture
+def fresh_loader(monkeypatch):
+    monkeypatch.setattr(model_loader, "_model_instance", None)
+    monkeypatch.setattr(model_loader, "_warmup_thread", None)
+    monkeypatch.setattr(model_loader, "_load_failures", 0)
+    monkeypatch.setattr(model_loader, "_retry_at", 0.0)
+    monkeypatch.setattr(model_loader, "_model_state", dict(model_loader._model_state, status="not_loaded"))
+    monkeypatch.setattr(model_loader.Config, "MODEL_RETRY_BACKOFF", 0)
+
+
+def test_failed_load_is_retried(fresh_loader, monkeypatch):
+    attempts = []
+
+    def build_model():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("descarga interrumpida")
+        return "model", "torch", None
+
+    monkeypatch.setattr(model_loader, "_build_model", build_model)
+
+    with pytest.raises(OSError):
+        model_loader.get_model()
+    assert model_loader.get_model_status()["status"] == "failed"
+
+    assert model_loader.get_model() == "model"
+    assert model_loader.get_model_status()["status"] == "ready"
+
+
+def test_retry_waits_for_backoff(fresh_loader, monkeypatch):
+    monkeypatch.setattr(model_loader.Config, "MODEL_RETRY_BACKOFF", 60)
+    monkeypatch.setattr(model_loader, "_build_model", lambda: (_ for _ in ()).throw(OSError("sin red")))
+
+    with pytest.raises(OSError):
+        model_loader.get_model()
+    with pytest.raises(model_loader.ModelNotReadyError):
+        model_loader.get_model()
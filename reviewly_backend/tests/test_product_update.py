@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import product_service
+from app.utils.model_loader import ModelNotReadyError
+
+
+def _product():
+    return SimpleNamespace(
+        product_id=1, title="Wireless headphones", product_embedding=[1.0, 0.0],
+        embedding_texts=lambda: (["Color: Black"], ["Noise cancelling"])
+    )
+
+
+def test_encoder_error_keeps_the_stored_embedding(monkeypatch):
+    def failing_encode(texts):
+        raise RuntimeError("fallo del encoder")
+
+    monkeypatch.setattr(product_service, "encode_texts", failing_encode)
+    product = _product()
+
+    product_service._refresh_product_embeddings(product, rewrite_rows=True)
+
+    assert product.product_embedding == [1.0, 0.0]
+
+
+def test_model_not_ready_is_raised(monkeypatch):
+    def not_ready(texts):
+        raise ModelNotReadyError("cargando")
+
+    monkeypatch.setattr(product_service, "encode_texts", not_ready)
+    product = _product()
+
+    with pytest.raises(ModelNotReadyError):
+        product_service._refresh_product_embeddings(product, rewrite_rows=False)
+    assert product.product_embedding == [1.0, 0.0]
+
+
+def test_centroid_is_recomputed_from_the_new_texts(monkeypatch):
+    monkeypatch.setattr(
+        product_service, "encode_texts",
+        lambda texts: {text: [0.0, 1.0] for text in texts}
+    )
+    product = _product()
+
+    product_service._refresh_product_embeddings(product, rewrite_rows=False)
+
+    assert product.product_embedding == [0.0, 1.0]
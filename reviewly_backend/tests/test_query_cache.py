@@ -0,0 +1,34 @@
+from app.utils.query_cache import QueryEmbeddingCache
+
+
+def test_variants_share_the_embedding_of_the_normalized_query():
+    cache = QueryEmbeddingCache(max_size=10, ttl_seconds=60)
+    computed = []
+
+    def compute(text):
+        computed.append(text)
+        return [float(len(text))]
+
+    first = cache.get_or_compute("model", "  Wireless   Headphones ", compute)
+    second = cache.get_or_compute("model", "wireless headphones", compute)
+
+    assert computed == ["wireless headphones"]
+    assert first == second
+    assert cache.hits == 1 and cache.misses == 1
+
+
+def test_encode_query_keeps_backends_apart(monkeypatch):
+    from app.utils import embeddings, model_loader
+
+    cache = QueryEmbeddingCache(max_size=10, ttl_seconds=60)
+    monkeypatch.setattr(embeddings, "query_embedding_cache", cache)
+    computed = []
+    monkeypatch.setattr(embeddings, "encode_text", lambda text: computed.append(text) or [float(len(computed))])
+
+    monkeypatch.setitem(model_loader._model_state, "backend", "torch")
+    torch_embedding = embeddings.encode_query("wireless headphones")
+    monkeypatch.setitem(model_loader._model_state, "backend", "onnx")
+    onnx_embedding = embeddings.encode_query("wireless headphones")
+
+    assert computed == ["wireless headphones", "wireless headphones"]
+    assert torch_embedding != onnx_embedding
@@ -0,0 +1,30 @@
+import pytest
+
+from app.services.review_service import _validate_bulk_review
+
+VALID = {"parent_asin": "B000TEST", "user_id": "AUSER", "text": "Works great", "rating": 4.5, "timestamp": 1700000000000}
+
+
+def test_valid_review_passes():
+    assert _validate_bulk_review(VALID) is None
+
+
+@pytest.mark.parametrize("change", [
+    {"rating": 10},
+    {"rating": True},
+    {"rating": "5"},
+    {"text": 42},
+    {"user_id": "x" * 256},
+    {"title": "t" * 256},
+    {"timestamp": True},
+    {"timestamp": "1700000000000"},
+    {"timestamp": 10 ** 20},
+    {"timestamp": -(10 ** 20)},
+    {"helpful_vote": -1},
+])
+def test_invalid_fields_are_reported_per_item(change):
+    assert _validate_bulk_review({**VALID, **change})
+
+
+def test_non_object_item_is_rejected():
+    assert _validate_bulk_review(["not", "a", "review"])
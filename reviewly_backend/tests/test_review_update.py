@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import review_service
+from app.utils.model_loader import ModelNotReadyError
+
+
+class _Review(SimpleNamespace):
+    def to_dict(self):
+        return {"review_id": self.review_id, "text": self.text}
+
+
+@pytest.fixture
+def stored_review(monkeypatch):
+    review = _Review(
+        review_id=7, product_id=1, text="Old text", rating=4, timestamp=None, sentiment="neutral",
+        helpful_vote=0, verified_purchase=False, embedding=[1.0, 0.0], embedding_bits="10", embedding_reduced=[1.0]
+    )
+    monkeypatch.setattr(review_service, "Review", SimpleNamespace(query=SimpleNamespace(get=lambda review_id: review)))
+    monkeypatch.setattr(review_service, "_adjust_review_aggregates", lambda changes: None)
+    monkeypatch.setattr(review_service.db.session, "commit", lambda: None)
+    monkeypatch.setattr(review_service.Config, "REVIEW_REDUCED_DIM", 1)
+    return review
+
+
+def _payload(text):
+    return {"user_id": "AUSER", "title": "Title", "text": text, "rating": 4, "images": [],
+            "parent_asin": "B000TEST", "product_id": 1}
+
+
+def test_changed_text_refreshes_all_embedding_columns(stored_review, monkeypatch):
+    monkeypatch.setattr(review_service, "encode_texts", lambda texts: {text: [0.0, 1.0] for text in texts})
+
+    review_service.update_review(7, _payload("New text"))
+
+    assert stored_review.embedding == [0.0, 1.0]
+    assert stored_review.embedding_bits == review_service.binary_quantize([0.0, 1.0])
+    assert stored_review.embedding_reduced == review_service.truncate_embedding([0.0, 1.0], 1)
+
+
+def test_unchanged_text_is_not_reencoded(stored_review, monkeypatch):
+    def encode(texts):
+        raise AssertionError("no debería codificarse")
+
+    monkeypatch.setattr(review_service, "encode_texts", encode)
+
+    review_service.update_review(7, _payload("Old text"))
+
+    assert stored_review.embedding == [1.0, 0.0]
+
+
+def test_model_not_ready_leaves_the_review_untouched(stored_review, monkeypatch):
+    def not_ready(texts):
+        raise ModelNotReadyError("cargando")
+
+    monkeypatch.setattr(review_service, "encode_texts", not_ready)
+
+    with pytest.raises(ModelNotReadyError):
+        review_service.update_review(7, _payload("New text"))
+    assert stored_review.text == "Old text"
+
+
+def test_update_moves_the_review_between_aggregates(stored_review, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(review_service, "_adjust_review_aggregates", recorded.extend)
+    payload = dict(_payload("Old text"), rating=2, product_id=3, timestamp=1474996253000)
+
+    review_service.update_review(7, payload)
+
+    reviewed_at = review_service._review_timestamp(1474996253000)
+    assert recorded == [(1, -1, 4, None), (3, 1, 2, reviewed_at)]
+    assert stored_review.timestamp == reviewed_at
+
+
+def test_aggregates_skip_reviews_covered_by_the_imported_baseline(monkeypatch):
+    executed = []
+    monkeypatch.setattr(review_service.db.session, "execute", lambda statement, params: executed.append((str(statement), params)))
+
+    review_service._adjust_review_aggregates([(1, -1, 4, None), (1, 1, 5, None)])
+
+    sql, params = executed[0]
+    covered = review_service.RATING_BASELINE_COVERS.format(product="q", reviewed_at="d.reviewed_at")
+    assert f"FILTER (WHERE NOT {covered})" in sql
+    assert params["signs"] == [-1, 1] and params["ratings"] == [4.0, 5.0]
@@ -0,0 +1,14 @@
+import time
+
+from app.utils.search_cache import InProcessBackend, SearchResultCache
+
+
+def test_memory_entries_expire_after_the_ttl():
+    cache = SearchResultCache(InProcessBackend(max_bytes=1024 * 1024, ttl_seconds=0.05))
+    key = SearchResultCache.make_key("headphones", 5)
+
+    cache.set(key, [{"product_id": 1}], cache.generation())
+    assert cache.get(key) == [{"product_id": 1}]
+
+    time.sleep(0.1)
+    assert cache.get(key) is None
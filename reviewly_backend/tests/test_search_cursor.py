@@ -0,0 +1,33 @@
+import base64
+import json
+
+import pytest
+
+from app.utils.search_cursor import InProcessSnapshotBackend, InvalidCursorError, SearchCursorStore
+
+
+def _results(count):
+    return [{"product_id": i, "scores": {"total_score": 1 - i / 100}} for i in range(count)]
+
+
+def test_pages_follow_snapshot_order():
+    store = SearchCursorStore(InProcessSnapshotBackend(max_size=10, ttl_seconds=60))
+    cursor = store.create("headphones", _results(7), 3)
+
+    query, page, cursor = store.page(cursor, 3)
+    assert query == "headphones"
+    assert [item["product_id"] for item in page] == [3, 4, 5]
+
+    _, page, cursor = store.page(cursor, 3)
+    assert [item["product_id"] for item in page] == [6]
+    assert cursor is None
+
+
+def test_negative_offset_is_rejected():
+    store = SearchCursorStore(InProcessSnapshotBackend(max_size=10, ttl_seconds=60))
+    cursor = store.create("headphones", _results(7), 3)
+    snapshot_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["s"]
+    crafted = base64.urlsafe_b64encode(json.dumps({"s": snapshot_id, "o": -2}).encode()).decode().rstrip("=")
+
+    with pytest.raises(InvalidCursorError):
+        store.page(crafted, 3)
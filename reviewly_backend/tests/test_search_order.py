@@ -0,0 +1,149 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import product_service
+
+
+def _ranked(scores):
+    """Resultados como los guarda la caché: ya ordenados por total_score DESC, product_id."""
+    items = [
+        {"product_id": product_id, "scores": {"total_score": score}, "ranks": {}}
+        for product_id, score in scores.items()
+    ]
+    return sorted(items, key=lambda item: (-item["scores"]["total_score"], item["product_id"]))
+
+
+def _product_row(product_id):
+    return SimpleNamespace(
+        product_id=product_id, title=f"Product {product_id}", description=None, main_category="Electronics",
+        price=10.0, images=[], average_rating=4.0, rating_number=10, store=None, features=None
+    )
+
+
+@pytest.fixture
+def shuffled_products(monkeypatch):
+    """Sustituye db.session.execute: devuelve las filas de productos en orden aleatorio."""
+    def execute(statement, params=None):
+        rows = [_product_row(product_id) for product_id in params["product_ids"]]
+        random.Random(7).shuffle(rows)
+        return SimpleNamespace(fetchall=lambda: rows)
+
+    monkeypatch.setattr(product_service.db.session, "execute", execute)
+
+
+def _assert_total_score_order(products):
+    keys = [(-p["scores"]["total_score"], p["product_id"]) for p in products]
+    assert keys == sorted(keys)
+
+
+def test_hydrate_keeps_total_score_order(shuffled_products):
+    ranked = _ranked({3: 0.4, 8: 0.9, 1: 0.9, 5: 0.1, 2: 0.7, 9: 0.4})
+
+    results = product_service._hydrate_search_results(ranked)
+
+    assert [r["product_id"] for r in results] == [1, 8, 2, 3, 9, 5]
+    _assert_total_score_order(results)
+
+
+def test_cached_search_returns_total_score_order(shuffled_products, monkeypatch):
+    ranked = _ranked({product_id: round(random.Random(product_id).random(), 3) for product_id in range(1, 21)})
+    cache = SimpleNamespace(
+        get_entry=lambda key, category: {"results": ranked, "facets": None}, generation=lambda category: 0
+    )
+    monkeypatch.setattr(product_service, "get_search_cache", lambda: cache)
+    monkeypatch.setattr(product_service, "get_cursor_store", lambda: SimpleNamespace(create=lambda *args: None))
+
+    response = product_service.searchProduct("wireless headphones", top_n=10)
+
+    assert [p["product_id"] for p in response["top_products"]] == [item["product_id"] for item in ranked[:10]]
+    _assert_total_score_order(response["top_products"])
+
+
+def test_cached_search_returns_candidate_facets(shuffled_products, monkeypatch):
+    ranked = _ranked({1: 0.9, 2: 0.8, 3: 0.7})
+    facets = {"main_category": [{"value": "Electronics", "count": 120}], "store": [], "price": []}
+    cache = SimpleNamespace(
+        get_entry=lambda key, category: {"results": ranked, "facets": facets}, generation=lambda category: 0
+    )
+    monkeypatch.setattr(product_service, "get_search_cache", lambda: cache)
+
+    response = product_service.searchProduct("wireless headphones", top_n=2, facets=True)
+
+    assert response["facets"] == facets
+    assert len(response["top_products"]) == 2
+
+
+def test_facet_source_sees_the_mode_ctes(monkeypatch):
+    executed = []
+    monkeypatch.setattr(
+        product_service.db.session, "execute",
+        lambda statement, params: executed.append(statement.text) or SimpleNamespace(fetchall=lambda: [])
+    )
+    ctes = [("matches", "SELECT product_id, main_category, store, price FROM products WHERE title <> ')SELECT('")]
+
+    product_service._run_ranking(
+        product_service.SearchProfile(), ctes,
+        "SELECT product_id, 1.0 AS total_score FROM matches ORDER BY total_score DESC LIMIT :top_n",
+        {"top_n": 5, "price_bounds": [10.0]},
+        facet_source="SELECT main_category, store, price FROM matches"
+    )
+
+    sql = executed[0]
+    # Los CTE se componen por partes: un literal con ")" o "SELECT" no altera la consulta
+    assert sql.index("matches AS (") < sql.index("ranked AS (") < sql.index("facet_source AS (")
+    assert "WHERE title <> ')SELECT('" in sql
+    assert "LIMIT :top_n" in sql.split("facet_source AS")[0]
+
+
+def test_explain_runs_after_the_timed_ranking_query(monkeypatch):
+    executed = []
+
+    def execute(statement, params):
+        executed.append(statement.text.strip().split()[0])
+        return SimpleNamespace(fetchall=lambda: [], scalar=lambda: [{"Plan": {}}])
+
+    monkeypatch.setattr(product_service.db.session, "execute", execute)
+    profile = product_service.SearchProfile(explain=True)
+
+    product_service._run_ranking(profile, [], "SELECT 1 AS total_score", {})
+
+    assert executed[:2] == ["SELECT", "EXPLAIN"]
+    assert profile.plans == [[{"Plan": {}}]]
+
+
+class _RankedRow(SimpleNamespace):
+    @property
+    def _mapping(self):
+        return vars(self)
+
+
+def test_inprocess_search_returns_facets(monkeypatch):
+    ranked = [
+        {"product_id": 2, "product_score": 0.9, "feature_score": 0.1, "detail_score": 0.2, "total_score": 0.9},
+        {"product_id": 1, "product_score": 0.5, "feature_score": 0.6, "detail_score": 0.3, "total_score": 0.6},
+    ]
+    facet_rows = [[3, "Electronics", None, None, 2]]
+    executed = []
+
+    def execute(statement, params):
+        executed.append(params)
+        rows = [
+            _RankedRow(**vars(_product_row(item["product_id"])), total_score=item["total_score"], facets=facet_rows)
+            for item in ranked
+        ]
+        return SimpleNamespace(fetchall=lambda: rows)
+
+    monkeypatch.setattr(product_service.db.session, "execute", execute)
+    monkeypatch.setattr(product_service, "get_search_cache", lambda: None)
+    monkeypatch.setattr(product_service, "encode_query", lambda query: [1.0, 0.0])
+    monkeypatch.setattr(
+        product_service, "get_vector_index", lambda: SimpleNamespace(search=lambda *args: ranked)
+    )
+
+    response = product_service.searchProduct("wireless headphones", top_n=2, mode="inprocess", facets=True)
+
+    assert "price_bounds" in executed[0]
+    assert response["facets"]["main_category"] == [{"value": "Electronics", "count": 2}]
+    assert [p["product_id"] for p in response["top_products"]] == [2, 1]
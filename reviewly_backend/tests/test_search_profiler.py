@@ -0,0 +1,21 @@
+from app.utils.search_profiler import SearchStageMetrics, percentile
+
+
+def test_percentile_uses_nearest_rank_on_unsorted_values():
+    values = [9, 1, 5, 3, 7]
+
+    assert percentile(values, 0) == 1
+    assert percentile(values, 50) == 5
+    assert percentile(values, 100) == 9
+
+
+def test_stage_metrics_report_percentiles_per_stage():
+    metrics = SearchStageMetrics(window=10)
+    for ms in (4.0, 1.0, 3.0, 2.0):
+        metrics.record(type("Profile", (), {"stages": {"encode": ms}})())
+
+    encode = metrics.metrics()["encode"]
+
+    assert encode["count"] == 4
+    assert encode["p50_ms"] == 3.0
+    assert encode["p95_ms"] == 4.0
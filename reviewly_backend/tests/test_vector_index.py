@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app.utils import vector_index
+from app.utils.vector_index import MemoryMappedVectorIndex, VectorIndexUnavailableError
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = MemoryMappedVectorIndex(str(tmp_path))
+    manifest = index._new_manifest(1)
+    index._append_rows(
+        manifest,
+        np.eye(2, dtype=np.float32),
+        np.array([(1, 0, 1), (2, 0, 1)], dtype=vector_index._ROW_DTYPE)
+    )
+    products = index._merge_products(index._empty_products(), {
+        1: ("Books", 10.0, 1, True),
+        2: ("Books", 20.0, 1, True),
+    })
+    index._write_products(manifest, products)
+    index._write_manifest(manifest)
+    return index
+
+
+def test_load_rereads_the_manifest_when_its_files_were_replaced(index, monkeypatch):
+    open_state = index._open_state
+    calls = []
+
+    def racing_open_state(manifest):
+        calls.append(manifest["products_file"])
+        if len(calls) == 1:
+            raise FileNotFoundError(manifest["products_file"])
+        return open_state(manifest)
+
+    monkeypatch.setattr(index, "_open_state", racing_open_state)
+
+    results = index.search([1.0, 0.0], top_n=1)
+
+    assert len(calls) == 2
+    assert results[0]["product_id"] == 1
+
+
+def test_load_reports_unavailable_when_the_files_keep_disappearing(index, monkeypatch):
+    def missing(manifest):
+        raise FileNotFoundError(manifest["products_file"])
+
+    monkeypatch.setattr(index, "_open_state", missing)
+
+    with pytest.raises(VectorIndexUnavailableError):
+        index.search([1.0, 0.0], top_n=1)
+    assert index.available() is False